@@ -50,3 +50,15 @@ class CloudValidationTest(nmanager.OfficialClientTest):
         except Exception:
             LOG.debug(traceback.format_exc())
             self.fail("%s command failed." % cmd)
+
+    def _run_ssh_cmd_on_hosts(self, secs, hosts, cmd, step, err_msg, action,
+                              check_exit_status=False):
+        """Execute command on hosts concurrently. Fail if it can not
+        be executed on some of them or, if check_exit_status is true,
+        returns nonzero exit status there.
+        """
+        return self.verify_on_hosts(secs, hosts, cmd, step, err_msg, action,
+                                    check_exit_status=check_exit_status,
+                                    username=self.usr, password=self.pwd,
+                                    key_filename=self.key,
+                                    timeout=self.timeout)
@@ -0,0 +1,47 @@
+# Copyright 2015 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Format of snapshot of cluster data of nailgun. Snapshot is written
+by fuel_plugin.ostf_adapter.cluster_snapshot and is read by
+fuel_health.config.NailgunConfig, both take its version and urls
+of nailgun API from here.
+"""
+
+# snapshots of other versions are ignored by tests
+SNAPSHOT_VERSION = 1
+
+
+def cluster_api_urls(cluster_id):
+    """Returns urls of nailgun API with data of cluster which
+    can be requested at once.
+    """
+    cluster_url = '/api/clusters/{0}'.format(cluster_id)
+    return [
+        cluster_url,
+        cluster_url + '/attributes',
+        cluster_url + '/generated',
+        '/api/nodes?cluster_id={0}'.format(cluster_id),
+    ]
+
+
+def cluster_dependent_api_urls(cluster_id, cluster_data):
+    """Returns urls of nailgun API which are built from
+    response of cluster url.
+    """
+    return [
+        '/api/releases/{0}'.format(
+            cluster_data.get('release_id', 'failed to get id')),
+        '/api/clusters/{0}/network_configuration/{1}'.format(
+            cluster_id, cluster_data.get('net_provider', 'nova_network')),
+    ]
@@ -15,10 +15,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
+import glob
 import logging
 import os
+import Queue
 import select
 import socket
+import StringIO
+import tarfile
+import threading
 import time
 import traceback
 import warnings
@@ -32,30 +39,338 @@ with warnings.catch_warnings():
     import paramiko
 
 
+# time in seconds after which unused connection of pool is closed
+POOL_IDLE_TIMEOUT = 300
+
+# authenticated connections shared by clients of process:
+# {(host, username, password, key, key_filename, look_for_keys):
+#     _PooledConnection}
+_POOL = {}
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+# transports to instances tunneled through pooled connections:
+# {(pool key of jump host, vm, user, password):
+#     (paramiko.Transport, paramiko.SSHClient of jump host)}
+_VM_TRANSPORTS = {}
+
+# private keys parsed from files by path
+_KEYS = {}
+
+# size of chunks output of commands is read in
+DEFAULT_BUF_SIZE = 32768
+
+# max number of hosts commands are executed on at once by exec_on_hosts
+MAX_FAN_OUT = 16
+
+# time in seconds reserved for sending output of batch after its
+# unfinished commands are killed on deadline
+BATCH_OUTPUT_TIME = 2
+
+# result of command executed by Client.exec_batch
+CommandResult = collections.namedtuple(
+    'CommandResult', ['exit_status', 'stdout', 'stderr'])
+
+# result of command executed on host by exec_on_hosts, exit_status
+# is None if command could not be executed (error contains reason)
+HostResult = collections.namedtuple(
+    'HostResult', ['exit_status', 'stdout', 'stderr', 'latency', 'error'])
+
+
+class OutputBuffer(object):
+    """Collects output stream of command.
+
+    Chunks of output (or whole lines if lines is true) are passed to
+    callback as soon as they are received. If tail is given only last
+    tail bytes of output are retained, so memory use does not depend
+    on size of output.
+    """
+
+    def __init__(self, callback=None, lines=False, tail=None):
+        self.callback = callback
+        self.lines = lines
+        self.tail = tail
+        self._chunks = collections.deque()
+        self._size = 0
+        self._partial_line = ''
+
+    def write(self, chunk):
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        if self.tail is not None:
+            while self._chunks and \
+                    self._size - len(self._chunks[0]) >= self.tail:
+                self._size -= len(self._chunks.popleft())
+
+        if self.callback is None:
+            return
+        if not self.lines:
+            self.callback(chunk)
+            return
+
+        end = chunk.rfind('\n') + 1
+        if not end:
+            self._partial_line += chunk
+            return
+        data = self._partial_line + chunk[:end]
+        self._partial_line = chunk[end:]
+        for line in data.split('\n')[:-1]:
+            self.callback(line + '\n')
+
+    def close(self):
+        """Passes last line which is not terminated with newline
+        to callback.
+        """
+        if self._partial_line:
+            self.callback(self._partial_line)
+            self._partial_line = ''
+
+    def getvalue(self):
+        if self.tail == 0:
+            return ''
+        data = ''.join(self._chunks)
+        if self.tail is not None:
+            data = data[-self.tail:]
+        return data
+
+
+def _batch_script(commands, parallel, timeout=None):
+    """Returns shell script which executes commands saving their
+    output and exit status to files <index>.out, <index>.err and
+    <index>.rc of temporary directory and writes gzipped tar archive
+    of the directory to stdout. Commands which are not finished in
+    timeout seconds are killed, no exit status is saved for them.
+    """
+    lines = ['d=$(mktemp -d) || exit 1',
+             'trap \'rm -rf "$d"\' EXIT',
+             'pids=']
+    if timeout is not None:
+        lines.extend([
+            'trap \'expired=1; kill $pids 2>/dev/null\' USR1',
+            '(sleep {0:.1f}; kill -USR1 $$) >/dev/null 2>&1 </dev/null &'
+            .format(timeout),
+            'w=$!'])
+    for index, cmd in enumerate(commands):
+        lines.append(
+            '[ -z "$expired" ] && {{ ('
+            'trap \'kill $p 2>/dev/null; exit\' TERM; '
+            '(\n{1}\n) >"$d/{0}.out" 2>"$d/{0}.err" </dev/null & '
+            'p=$!; wait $p; echo $? >"$d/{0}.rc") & pids="$pids $!"; }}'
+            .format(index, cmd))
+        if not parallel:
+            lines.append('[ -z "$expired" ] && wait $!')
+    if commands:
+        # wait is interrupted by trap of deadline
+        lines.append('wait $pids; [ -n "$expired" ] && wait $pids')
+    if timeout is not None:
+        lines.append('kill $w 2>/dev/null')
+    lines.append('cd "$d" && tar czf - .')
+    return '\n'.join(lines)
+
+
+def _parse_batch_output(names, data):
+    """Returns OrderedDict of CommandResult by name of command from
+    archive written by batch script.
+    """
+    files = {}
+    with tarfile.open(fileobj=StringIO.StringIO(data), mode='r:gz') as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                files[os.path.basename(member.name)] = \
+                    tar.extractfile(member).read()
+
+    results = collections.OrderedDict()
+    for index, name in enumerate(names):
+        exit_status = files.get('{0}.rc'.format(index), '').strip()
+        results[name] = CommandResult(
+            int(exit_status) if exit_status.isdigit() else None,
+            files.get('{0}.out'.format(index), ''),
+            files.get('{0}.err'.format(index), ''))
+    return results
+
+
+def _load_key(path):
+    """Returns RSA key read from file. Path may contain '~',
+    environment variables and wildcards (first match is used).
+    """
+    if path not in _KEYS:
+        expanded = os.path.expandvars(os.path.expanduser(path))
+        f_path = (sorted(glob.glob(expanded)) or [expanded])[0]
+        with open(f_path, 'r') as file_key:
+            _KEYS[path] = paramiko.RSAKey.from_private_key(file_key)
+    return _KEYS[path]
+
+
+class _PooledConnection(object):
+    """Connection of pool with number of its users (open channels
+    and tunnels to instances) and time it was last used at.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.users = 0
+        self.last_used = time.time()
+
+
+def _is_alive(connection):
+    transport = connection.get_transport()
+    return transport is not None and transport.is_active()
+
+
+def _pool():
+    """Returns pool of current process. Connections inherited from
+    parent process are dropped without closing as their sockets
+    belong to parent.
+    """
+    global _POOL_PID
+
+    if _POOL_PID != os.getpid():
+        _POOL.clear()
+        _VM_TRANSPORTS.clear()
+        _POOL_PID = os.getpid()
+    return _POOL
+
+
+def _evict_idle():
+    """Closes broken connections and connections which are not
+    used by anyone for POOL_IDLE_TIMEOUT seconds.
+    """
+    now = time.time()
+    with _POOL_LOCK:
+        pool = _pool()
+        evicted = [key for key, entry in pool.items()
+                   if not _is_alive(entry.connection) or
+                   (entry.users == 0 and
+                    now - entry.last_used > POOL_IDLE_TIMEOUT)]
+        connections = [pool.pop(key).connection for key in evicted]
+
+    for connection in connections:
+        connection.close()
+
+
+def _release_connection(key, connection):
+    """Marks that connection of pool is not used by one of its users."""
+    with _POOL_LOCK:
+        entry = _pool().get(key)
+        # connection may be already replaced or evicted
+        if entry is not None and entry.connection is connection:
+            entry.users -= 1
+            entry.last_used = time.time()
+
+
+def _close_vm_transport(pool_key, transport, connection):
+    transport.close()
+    _release_connection(pool_key, connection)
+
+
+def close_vm_tunnels():
+    """Closes transports to instances of current process."""
+    with _POOL_LOCK:
+        _pool()
+        tunnels = _VM_TRANSPORTS.items()
+        _VM_TRANSPORTS.clear()
+
+    for key, (transport, connection) in tunnels:
+        _close_vm_transport(key[0], transport, connection)
+
+
+def close_pooled_connections():
+    """Closes all connections of pool of current process."""
+    with _POOL_LOCK:
+        connections = [entry.connection for entry in _pool().values()]
+        _POOL.clear()
+
+    for connection in connections:
+        connection.close()
+
+
 class Client(object):
 
     def __init__(self, host, username, password=None, timeout=300, pkey=None,
-                 channel_timeout=70, look_for_keys=False, key_filename=None):
+                 channel_timeout=70, look_for_keys=False, key_filename=None,
+                 buf_size=DEFAULT_BUF_SIZE):
         self.host = host
         self.username = username
         self.password = password
         if isinstance(pkey, basestring):
-            if pkey:
-                pkey_file = self._get_key_from_file(pkey)
-                pkey = paramiko.RSAKey.from_private_key(pkey_file)
-            else:
-                pkey = None
+            pkey = _load_key(pkey) if pkey else None
         self.pkey = pkey
         self.look_for_keys = look_for_keys
         self.key_filename = key_filename
         self.timeout = int(timeout)
         self.channel_timeout = float(channel_timeout)
-        self.buf_size = 1024
+        self.buf_size = buf_size
+
+    @property
+    def _pool_key(self):
+        key_filename = self.key_filename
+        if isinstance(key_filename, list):
+            key_filename = tuple(key_filename)
+        pkey = self.pkey.get_base64() if self.pkey is not None else None
+        return (self.host, self.username, self.password, pkey,
+                key_filename, self.look_for_keys)
+
+    def _acquire_connection(self, fresh=False):
+        """Returns authenticated connection to the host shared with
+        other clients of process. New one is opened if there is no
+        alive connection in pool or if fresh is true. Connection
+        is not evicted until it is released with _release_connection.
+        """
+        _evict_idle()
+        key = self._pool_key
+
+        with _POOL_LOCK:
+            entry = _pool().get(key)
+            if entry is not None and not fresh \
+                    and _is_alive(entry.connection):
+                entry.users += 1
+                entry.last_used = time.time()
+                return entry.connection
+            stale = entry.connection if entry is not None else None
+
+        connection = self._get_ssh_connection()
+        with _POOL_LOCK:
+            entry = _pool().get(key)
+            if entry is not None and entry.connection is not stale \
+                    and _is_alive(entry.connection):
+                # concurrent client has already opened connection
+                connection.close()
+            else:
+                entry = _PooledConnection(connection)
+                _POOL[key] = entry
+            entry.users += 1
+            entry.last_used = time.time()
 
-    def _get_key_from_file(self, path):
-        f_path = os.popen('ls %s' % path, 'r').read().strip('\n')
-        file_key = file(f_path, 'r')
-        return file_key
+        if stale is not None:
+            stale.close()
+        return entry.connection
+
+    @contextlib.contextmanager
+    def _session(self):
+        """Yields channel opened on pooled connection, connection is
+        used until channel is closed on exit. Connection which
+        is broken though looks alive is replaced once.
+        """
+        key = self._pool_key
+        connection = self._acquire_connection()
+        try:
+            channel = connection.get_transport().open_session()
+        except (paramiko.SSHException, EOFError, socket.error):
+            LOG.debug(traceback.format_exc())
+            _release_connection(key, connection)
+            connection = self._acquire_connection(fresh=True)
+            try:
+                channel = connection.get_transport().open_session()
+            except Exception:
+                _release_connection(key, connection)
+                raise
+
+        try:
+            yield channel
+        finally:
+            # channel is closed, connection is kept in pool
+            channel.close()
+            _release_connection(key, connection)
 
     def _get_ssh_connection(self, sleep=1.5, backoff=1.01):
         """Returns an ssh connection to the specified host."""
@@ -96,11 +411,10 @@ class Client(object):
 
         :returns: data read from standard output of the command.
         """
-        s = self._get_ssh_connection()
-        _, stdout, stderr = s.exec_command(cmd)
-        res = stdout.read()
-        err_res = stderr.read()
-        s.close()
+        with self._session() as channel:
+            channel.exec_command(cmd)
+            res = channel.makefile('rb', -1).read()
+            err_res = channel.makefile_stderr('rb', -1).read()
         return res, err_res
 
     def _is_timed_out(self, timeout, start_time):
@@ -121,62 +435,184 @@ class Client(object):
             LOG.debug(traceback.format_exc())
             return
 
-    def exec_command(self, cmd):
-        """Execute the specified command on the server.
-
-        Note that this method is reading whole command outputs to memory, thus
-        shouldn't be used for large outputs.
+    def _read_channel(self, channel, cmd, stdout, stderr, deadline=None):
+        """Reads output of command from channel into OutputBuffers
+        until channel is closed.
 
-        :returns: data read from standard output of the command.
-        :raises: SSHExecCommandFailed if command returns nonzero
-                 status. The exception contains command status stderr content.
+        :raises: TimeoutException if there is no output for
+                 channel_timeout seconds or deadline (timestamp)
+                 is reached.
         """
-        ssh = self._get_ssh_connection()
-        transport = ssh.get_transport()
-        channel = transport.open_session()
-        channel.get_pty()
-        channel.fileno()  # Register event pipe
-        channel.exec_command(cmd)
-        channel.shutdown_write()
-        out_data = []
-        err_data = []
-
-        select_params = [channel], [], [], self.channel_timeout
+        timeout_exc = exceptions.TimeoutException(
+            "Command: '{0}' executed on host '{1}'.".format(cmd, self.host))
         while True:
-            ready = select.select(*select_params)
+            wait = self.channel_timeout
+            if deadline is not None:
+                # command which keeps writing output is stopped as well
+                wait = deadline - time.time()
+                if wait <= 0:
+                    raise timeout_exc
+                wait = min(wait, self.channel_timeout)
+            ready = select.select([channel], [], [], wait)
             if not any(ready):
-                raise exceptions.TimeoutException(
-                    "Command: '{0}' executed on host '{1}'.".format(
-                        cmd, self.host))
+                raise timeout_exc
             if not ready[0]:        # If there is nothing to read.
                 continue
             out_chunk = err_chunk = None
             if channel.recv_ready():
                 out_chunk = channel.recv(self.buf_size)
-                out_data += out_chunk,
+                stdout.write(out_chunk)
             if channel.recv_stderr_ready():
                 err_chunk = channel.recv_stderr(self.buf_size)
-                err_data += err_chunk,
+                stderr.write(err_chunk)
             if channel.closed and not err_chunk and not out_chunk:
                 break
-        exit_status = channel.recv_exit_status()
+        stdout.close()
+        stderr.close()
+
+    def stream_command(self, cmd, on_stdout=None, on_stderr=None,
+                       lines=False, tail=None, get_pty=False, deadline=None):
+        """Execute the specified command on the server passing its
+        output to callbacks as soon as it is received. See OutputBuffer
+        for meaning of lines and tail.
+
+        :returns: tuple of exit status, retained stdout and stderr data.
+        :raises: TimeoutException if there is no output for
+                 channel_timeout seconds or deadline (timestamp)
+                 is reached.
+        """
+        stdout = OutputBuffer(on_stdout, lines=lines, tail=tail)
+        stderr = OutputBuffer(on_stderr, lines=lines, tail=tail)
+        with self._session() as channel:
+            if get_pty:
+                channel.get_pty()
+            channel.fileno()  # Register event pipe
+            channel.exec_command(cmd)
+            channel.shutdown_write()
+            self._read_channel(channel, cmd, stdout, stderr, deadline)
+            exit_status = channel.recv_exit_status()
+        return exit_status, stdout.getvalue(), stderr.getvalue()
+
+    def exec_command(self, cmd, on_output=None, lines=False, tail=None):
+        """Execute the specified command on the server.
+
+        Whole output is read to memory unless tail is given, see
+        stream_command for handling of large outputs.
+
+        :returns: data read from standard output of the command.
+        :raises: SSHExecCommandFailed if command returns nonzero
+                 status. The exception contains command status stderr content.
+        """
+        exit_status, out_data, err_data = self.stream_command(
+            cmd, on_stdout=on_output, lines=lines, tail=tail, get_pty=True)
         if 0 != exit_status:
             raise exceptions.SSHExecCommandFailed(
                 command=cmd, exit_status=exit_status,
-                strerror=''.join(err_data).join(out_data))
-        return ''.join(out_data)
+                strerror=err_data + out_data)
+        return out_data
+
+    def run_command(self, cmd, get_pty=False, deadline=None):
+        """Execute the specified command on the server. Unlike
+        exec_command nonzero exit status is not an error and stdout
+        and stderr are separated unless pty is requested.
+
+        :returns: tuple of exit status, stdout and stderr data.
+        """
+        return self.stream_command(cmd, get_pty=get_pty, deadline=deadline)
+
+    def exec_batch(self, commands, parallel=True, deadline=None):
+        """Execute named commands on the server in one round trip.
+        Commands are shipped as one script, their output is returned
+        in one gzipped archive.
+
+        :param commands: list of (name, command) pairs or OrderedDict.
+        :param parallel: whether commands are executed concurrently.
+        :param deadline: timestamp commands which are not finished by
+                         are killed at, BATCH_OUTPUT_TIME seconds before
+                         it (half of remaining time if it is shorter).
+        :returns: OrderedDict of CommandResult by name, exit_status is
+                  None if command was not finished, output written
+                  by then is returned.
+        :raises: SSHExecCommandFailed if the batch could not be executed.
+                 TimeoutException if output is not received by deadline.
+        """
+        if isinstance(commands, dict):
+            commands = commands.items()
+        names = [name for name, _ in commands]
+        timeout = None
+        if deadline is not None:
+            remaining = max(deadline - time.time(), 0)
+            timeout = remaining - min(BATCH_OUTPUT_TIME, remaining / 2)
+        script = _batch_script([cmd for _, cmd in commands], parallel,
+                               timeout)
+
+        exit_status, out_data, err_data = self.stream_command(
+            script, deadline=deadline)
+        try:
+            return _parse_batch_output(names, out_data)
+        except (tarfile.TarError, IOError, EOFError):
+            LOG.debug(traceback.format_exc())
+            raise exceptions.SSHExecCommandFailed(
+                command=script, exit_status=exit_status, strerror=err_data)
 
     def test_connection_auth(self):
         """Returns true if ssh can connect to server."""
         try:
-            connection = self._get_ssh_connection()
-            connection.close()
+            connection = self._acquire_connection()
         except paramiko.AuthenticationException:
             LOG.debug(traceback.format_exc())
             return False
 
+        _release_connection(self._pool_key, connection)
         return True
 
+    def _get_vm_transport(self, user, password, vm, fresh=False):
+        """Returns authenticated transport to the instance tunneled
+        through pooled connection to the host. Transport is kept
+        until close_vm_tunnels is called, so commands executed on
+        the instance cost only opening of channel. Connection to the
+        host is used by the transport until it is closed.
+        """
+        pool_key = self._pool_key
+        key = (pool_key, vm, user, password)
+        with _POOL_LOCK:
+            pool = _pool()
+            cached = _VM_TRANSPORTS.get(key)
+            if cached is not None and not fresh and cached[0].is_active():
+                entry = pool.get(pool_key)
+                if entry is not None and entry.connection is cached[1]:
+                    entry.last_used = time.time()
+                return cached[0]
+
+        connection = self._acquire_connection()
+        transport = None
+        try:
+            _intermediate_channel = connection.get_transport()\
+                .open_channel('direct-tcpip', (vm, 22), (self.host, 0))
+            transport = paramiko.Transport(_intermediate_channel)
+            transport.start_client()
+            transport.auth_password(user, password)
+        except Exception:
+            if transport is not None:
+                transport.close()
+            _release_connection(pool_key, connection)
+            raise
+
+        with _POOL_LOCK:
+            current = _VM_TRANSPORTS.get(key)
+            if current is not None and current is not cached \
+                    and current[0].is_active():
+                # concurrent client has already opened transport
+                closed = (transport, connection)
+                transport = current[0]
+            else:
+                closed = cached
+                _VM_TRANSPORTS[key] = (transport, connection)
+
+        if closed is not None:
+            _close_vm_transport(pool_key, *closed)
+        return transport
+
     def exec_command_on_vm(self, command, user, password, vm):
         """Execute the specified command on the instance.
 
@@ -187,50 +623,87 @@ class Client(object):
         :raises: SSHExecCommandFailed if command returns nonzero
             status. The exception contains command status stderr content.
         """
-        ssh = self._get_ssh_connection()
-        _intermediate_transport = ssh.get_transport()
-        _intermediate_channel = \
-            _intermediate_transport.open_channel('direct-tcpip',
-                                                 (vm, 22),
-                                                 (self.host, 0))
-        transport = paramiko.Transport(_intermediate_channel)
-        transport.start_client()
-        transport.auth_password(user, password)
-        channel = transport.open_session()
-        channel.exec_command(command)
-        exit_status = channel.recv_exit_status()
-        channel.shutdown_write()
-        out_data = []
-        err_data = []
-        LOG.debug("Run cmd {0} on vm {1}".format(command, vm))
-        select_params = [channel], [], [], self.channel_timeout
-        while True:
-            ready = select.select(*select_params)
-            if not any(ready):
-                raise exceptions.TimeoutException(
-                    "Command: '{0}' executed on host '{1}'.".format(
-                        command, self.host))
-            if not ready[0]:        # If there is nothing to read.
-                continue
-            out_chunk = err_chunk = None
-            if channel.recv_ready():
-                out_chunk = channel.recv(self.buf_size)
-                out_data += out_chunk,
-            if channel.recv_stderr_ready():
-                err_chunk = channel.recv_stderr(self.buf_size)
-                err_data += err_chunk,
-            if channel.closed and not err_chunk and not out_chunk:
-                break
+        try:
+            channel = self._get_vm_transport(user, password, vm)\
+                .open_session()
+        except (paramiko.SSHException, EOFError, socket.error):
+            LOG.debug(traceback.format_exc())
+            channel = self._get_vm_transport(user, password, vm,
+                                             fresh=True).open_session()
+        stdout = OutputBuffer()
+        stderr = OutputBuffer()
+        try:
+            channel.fileno()  # Register event pipe
+            channel.exec_command(command)
+            channel.shutdown_write()
+            LOG.debug("Run cmd {0} on vm {1}".format(command, vm))
+            # output is read before waiting for exit status, otherwise
+            # command with large output is blocked by window of channel
+            self._read_channel(channel, command, stdout, stderr)
+            exit_status = channel.recv_exit_status()
+        finally:
+            # channel is closed, transport to instance is kept
+            channel.close()
+        out_data = stdout.getvalue()
+        err_data = stderr.getvalue()
         if 0 != exit_status:
             LOG.warning(
                 'Command {0} finishes with non-zero exit code {1}'.format(
                     command, exit_status))
             raise exceptions.SSHExecCommandFailed(
                 command=command, exit_status=exit_status,
-                strerror=''.join(err_data).join(out_data))
+                strerror=err_data + out_data)
         LOG.debug('Current result {0} {1} {2}'.format(
             command, err_data, out_data))
-        return ''.join(out_data)
+        return out_data
 
     def close_ssh_connection(self, connection):
         connection.close()
+
+
+def exec_on_hosts(hosts, cmd, username, deadline=60, get_pty=False,
+                  max_workers=MAX_FAN_OUT, **kwargs):
+    """Executes command on hosts concurrently, on at most max_workers
+    hosts at once. Execution on each host (connection included) takes
+    at most deadline seconds. Rest of arguments are passed to Client.
+
+    :returns: OrderedDict of HostResult by host in order of hosts.
+    """
+    hosts = list(hosts)
+    kwargs['timeout'] = min(kwargs.get('timeout', deadline), deadline)
+    tasks = Queue.Queue()
+    for host in hosts:
+        tasks.put(host)
+    results = {}
+
+    def run(host):
+        start = time.time()
+        try:
+            client = Client(host, username, **kwargs)
+            exit_status, out, err = client.run_command(
+                cmd, get_pty=get_pty, deadline=start + deadline)
+            error = None
+        except Exception as e:
+            LOG.debug(traceback.format_exc())
+            exit_status = out = err = None
+            error = str(e) or e.__class__.__name__
+        results[host] = HostResult(exit_status, out, err,
+                                   time.time() - start, error)
+
+    def worker():
+        while True:
+            try:
+                host = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            run(host)
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(max_workers, len(hosts)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return collections.OrderedDict((host, results[host]) for host in hosts)
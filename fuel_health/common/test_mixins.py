@@ -18,6 +18,7 @@ import signal
 import traceback
 
 from fuel_health.common import log as logging
+from fuel_health.common import ssh
 
 LOG = logging.getLogger(__name__)
 
@@ -184,6 +185,37 @@ class FuelTestAssertMixin(object):
         else:
             return result
 
+    def verify_on_hosts(self, secs, hosts, cmd, step='', msg='', action='',
+                        check_exit_status=True, **kwargs):
+        """Executes command on hosts concurrently with ssh.exec_on_hosts.
+        Arguments:
+        :secs: timeout time of command on each host;
+        :hosts: hosts command is executed on;
+        :cmd: command to be executed;
+        :step: number of test step;
+        :msg: message that will be displayed if command can not be
+              executed or returns nonzero exit status on some hosts;
+        :action: action that is performed by the command.
+        Rest of arguments are passed to ssh.Client.
+
+        :returns: OrderedDict of ssh.HostResult by host.
+        """
+        LOG.info("STEP:{0}, verify action: '{1}' on {2}".format(
+            step, action, ', '.join(hosts)))
+        results = ssh.exec_on_hosts(hosts, cmd, deadline=secs, **kwargs)
+
+        failed = []
+        for host, result in results.items():
+            LOG.debug('{0} on {1}: {2}'.format(cmd, host, result))
+            if result.error is not None or \
+                    check_exit_status and result.exit_status != 0:
+                failed.append(host)
+        if failed:
+            self.fail("Step %s failed: " % step + msg +
+                      " Failed on host(s): %s." % ', '.join(failed) +
+                      " Please refer to OpenStack logs for more details.")
+        return results
+
 
 class TimeOutError(Exception):
     def __init__(self):
@@ -17,12 +17,21 @@
 #    under the License.
 from __future__ import print_function
 
+import errno
+import fcntl
+import json
 import os
+import Queue
+import stat
 import sys
+import tempfile
+import threading
+import time
 import traceback
 import unittest2
 
 import keystoneclient
+from keystoneclient import session as keystone_session
 try:
     from oslo.config import cfg
 except ImportError:
@@ -30,6 +39,7 @@ except ImportError:
 import requests
 
 from fuel_health.common import log as logging
+from fuel_health.common import nailgun_snapshot
 from fuel_health import exceptions
 
 
@@ -152,6 +162,11 @@ ComputeGroup = [
                default=20,
                help="Timeout in seconds to wait for output from ssh "
                     "channel."),
+    cfg.IntOpt('proxy_cache_ttl',
+               default=60,
+               help="Time in seconds for which proxy of controller found "
+                    "by one test process is reused by other test processes "
+                    "of cluster. Set 0 to check proxies in every process."),
     cfg.IntOpt('ip_version_for_ssh',
                default=4,
                help="IP version used for SSH connections."),
@@ -584,11 +599,22 @@ class NailgunConfig(object):
         self.req_session.trust_env = False
         if token:
             self.req_session.headers.update({'X-Auth-Token': token})
+        # decoded responses of nailgun API by url
+        self._responses = self._load_snapshot()
         if parse:
             self.prepare_config()
 
     def prepare_config(self, *args, **kwargs):
         try:
+            # independent requests are issued concurrently beforehand,
+            # parsers take their responses from memo
+            self._prefetch(
+                *nailgun_snapshot.cluster_api_urls(self.cluster_id))
+            cluster_data = self._get_json(
+                '/api/clusters/%s' % self.cluster_id)
+            self._prefetch(*nailgun_snapshot.cluster_dependent_api_urls(
+                self.cluster_id, cluster_data))
+
             self._parse_meta()
             LOG.info('parse meta successful')
             self._parse_cluster_attributes()
@@ -611,11 +637,66 @@ class NailgunConfig(object):
             LOG.warning('Something wrong with endpoints')
             LOG.debug(traceback.format_exc())
 
+    def _load_snapshot(self):
+        """Returns responses of nailgun API from snapshot of cluster
+        built by adapter for current test run. Missing, stale or
+        foreign snapshot is ignored and data is requested from nailgun.
+        """
+        path = os.environ.get('NAILGUN_SNAPSHOT')
+        if not path:
+            return {}
+
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (IOError, ValueError):
+            LOG.warning('Snapshot %s can not be read' % path)
+            return {}
+
+        if snapshot.get('version') != nailgun_snapshot.SNAPSHOT_VERSION \
+                or snapshot.get('nailgun_url') != self.nailgun_url \
+                or snapshot.get('cluster_id') != str(self.cluster_id) \
+                or snapshot.get('expires_at', 0) < time.time():
+            LOG.info('Snapshot %s is not valid for cluster %s'
+                     % (path, self.cluster_id))
+            return {}
+
+        LOG.info('Using snapshot %s' % path)
+        return dict(snapshot.get('responses', {}))
+
+    def _get_json(self, api_url):
+        """Returns decoded response of nailgun API. Each url is
+        requested only once per config.
+        """
+        if api_url not in self._responses:
+            response = self.req_session.get(self.nailgun_url + api_url)
+            LOG.info('RESPONSE %s STATUS %s' % (api_url,
+                                                response.status_code))
+            self._responses[api_url] = response.json()
+        return self._responses[api_url]
+
+    def _prefetch(self, *api_urls):
+        """Requests given urls of nailgun API concurrently. Failed
+        requests are repeated by parsers to report their errors.
+        """
+        def fetch(api_url):
+            try:
+                self._get_json(api_url)
+            except Exception:
+                LOG.debug(traceback.format_exc())
+
+        threads = [threading.Thread(target=fetch, args=(api_url,))
+                   for api_url in set(api_urls)
+                   if api_url not in self._responses]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
     def _parse_cluster_attributes(self):
         api_url = '/api/clusters/%s/attributes' % self.cluster_id
-        response = self.req_session.get(self.nailgun_url + api_url)
-        LOG.info('RESPONSE %s STATUS %s' % (api_url, response.status_code))
-        data = response.json()
+        data = self._get_json(api_url)
         LOG.info('RESPONSE FROM %s - %s' % (api_url, data))
         access_data = data['editable']['access']
         common_data = data['editable']['common']
@@ -641,15 +722,14 @@ class NailgunConfig(object):
             'auto_assign_floating_ip']['value']
 
         api_url = '/api/clusters/%s' % self.cluster_id
-        cluster_data = self.req_session.get(self.nailgun_url + api_url).json()
+        cluster_data = self._get_json(api_url)
         network_provider = cluster_data.get('net_provider', 'nova_network')
         self.network.network_provider = network_provider
         release_id = cluster_data.get('release_id', 'failed to get id')
         self.fuel.fuel_version = cluster_data.get(
             'fuel_version', 'failed to get fuel version')
         LOG.info('Release id is {0}'.format(release_id))
-        release_data = self.req_session.get(
-            self.nailgun_url + '/api/releases/{0}'.format(release_id)).json()
+        release_data = self._get_json('/api/releases/{0}'.format(release_id))
         deployment_os = release_data.get(
             'operating_system', 'failed to get os')
         LOG.info('Deployment os is {0}'.format(deployment_os))
@@ -664,9 +744,7 @@ class NailgunConfig(object):
 
     def _parse_nodes_cluster_id(self):
         api_url = '/api/nodes?cluster_id=%s' % self.cluster_id
-        response = self.req_session.get(self.nailgun_url + api_url)
-        LOG.info('RESPONSE %s STATUS %s' % (api_url, response.status_code))
-        data = response.json()
+        data = self._get_json(api_url)
         # to make backward compatible
         if 'objects' in data:
             data = data['objects']
@@ -739,13 +817,12 @@ class NailgunConfig(object):
 
     def _parse_meta(self):
         api_url = '/api/clusters/%s' % self.cluster_id
-        data = self.req_session.get(self.nailgun_url + api_url).json()
+        data = self._get_json(api_url)
         self.mode = data['mode']
         self.compute.deployment_mode = self.mode
         release_id = data.get('release_id', 'failed to get id')
         LOG.info('Release id is {0}'.format(release_id))
-        release_data = self.req_session.get(
-            self.nailgun_url + '/api/releases/{0}'.format(release_id)).json()
+        release_data = self._get_json('/api/releases/{0}'.format(release_id))
         self.compute.deployment_os = release_data.get(
             'operating_system', 'failed to get os')
         self.compute.release_version = release_data.get(
@@ -754,7 +831,7 @@ class NailgunConfig(object):
     def _parse_networks_configuration(self):
         api_url = '/api/clusters/{0}/network_configuration/{1}'.format(
             self.cluster_id, self.network.network_provider)
-        data = self.req_session.get(self.nailgun_url + api_url).json()
+        data = self._get_json(api_url)
         self.network.raw_data = data
         net_params = self.network.raw_data.get('networking_parameters')
         self.network.private_net = net_params.get(
@@ -764,7 +841,7 @@ class NailgunConfig(object):
 
     def _parse_cluster_generated_data(self):
         api_url = '/api/clusters/%s/generated' % self.cluster_id
-        data = self.req_session.get(self.nailgun_url + api_url).json()
+        data = self._get_json(api_url)
         self.generated_data = data
         amqp_data = data['rabbit']
         self.amqp_pwd = amqp_data['password']
@@ -774,15 +851,14 @@ class NailgunConfig(object):
 
     def _parse_ostf_api(self):
         api_url = '/api/ostf/%s' % self.cluster_id
-        response = self.req_session.get(self.nailgun_url + api_url)
-        data = response.json()
+        data = self._get_json(api_url)
         self.identity.url = data['horizon_url'] + 'dashboard'
         self.identity.uri = data['keystone_url'] + 'v2.0/'
 
     def _parse_vmware_attributes(self):
         if self.volume.cinder_vmware_node_exist:
             api_url = '/api/clusters/%s/vmware_attributes' % self.cluster_id
-            data = self.req_session.get(self.nailgun_url + api_url).json()
+            data = self._get_json(api_url)
             az = data['editable']['value']['availability_zones'][0]['az_name']
             self.volume.cinder_vmware_storage_az = "{0}-cinder".format(az)
 
@@ -799,8 +875,12 @@ class NailgunConfig(object):
 
     def check_proxy_auth(self, proxy_ip, proxy_port, keystone_vip):
         auth_url = 'http://{0}:{1}/{2}/'.format(keystone_vip, 5000, 'v2.0')
-        os.environ['http_proxy'] = 'http://{0}:{1}'.format(proxy_ip,
-                                                           proxy_port)
+        # proxy is set for this request only, so proxies can be
+        # checked concurrently
+        req_session = requests.Session()
+        req_session.trust_env = False
+        req_session.proxies = {
+            'http': 'http://{0}:{1}'.format(proxy_ip, proxy_port)}
         try:
             LOG.debug('Trying to authenticate at "{0}" using HTTP proxy "http:'
                       '//{1}:{2}" ...'.format(auth_url, proxy_ip, proxy_port))
@@ -809,8 +889,10 @@ class NailgunConfig(object):
                 password=self.identity.admin_password,
                 tenant_name=self.identity.admin_tenant_name,
                 auth_url=auth_url,
-                insecure=False,
-                timeout=10)
+                session=keystone_session.Session(session=req_session,
+                                                 verify=True,
+                                                 timeout=10)
+            ).authenticate()
             return True
         except keystoneclient.exceptions.Unauthorized:
             LOG.warning('Authorization failed at "{0}" using HTTP proxy "http:'
@@ -818,23 +900,128 @@ class NailgunConfig(object):
             return False
 
     def find_proxy(self, proxy_ips, proxy_port, keystone_vip):
-        online_proxies = []
-        for proxy_ip in proxy_ips:
+        """Checks proxies on given ips concurrently. Returns as soon
+        as authentication through one of them passes.
+        """
+        results = Queue.Queue()
+
+        def check(proxy_ip):
             try:
                 LOG.info('Try to check proxy on {0}'.format(proxy_ip))
-                if self.check_proxy_auth(proxy_ip, proxy_port, keystone_vip):
-                    online_proxies.append({'ip': proxy_ip,
-                                           'auth_passed': True})
-                else:
-                    online_proxies.append({'ip': proxy_ip,
-                                           'auth_passed': False})
+                results.put({'ip': proxy_ip,
+                             'auth_passed': self.check_proxy_auth(
+                                 proxy_ip, proxy_port, keystone_vip)})
             except Exception as e:
                 LOG.warning('Can not connect to Keystone '
                             'with proxy on {0}, error: {1}'
                             .format(proxy_ip, e))
                 LOG.debug(traceback.format_exc())
+                results.put(None)
+
+        for proxy_ip in proxy_ips:
+            thread = threading.Thread(target=check, args=(proxy_ip,))
+            thread.daemon = True
+            thread.start()
+
+        online_proxies = []
+        for _ in proxy_ips:
+            proxy = results.get()
+            if proxy is None:
+                continue
+            online_proxies.append(proxy)
+            if proxy['auth_passed']:
+                break
         return online_proxies
 
+    def _proxy_cache_path(self):
+        """Returns path of file where proxy of cluster is cached. File
+        is kept in directory of temporary dir which is accessible only
+        by current user. Returns None if the directory can not be used.
+        """
+        cache_dir = os.path.join(tempfile.gettempdir(),
+                                 'ostf-{0}'.format(os.getuid()))
+        try:
+            os.mkdir(cache_dir, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                LOG.warning('Can not create {0}: {1}'.format(cache_dir, e))
+                return None
+
+        # directory (or symlink) planted by other user is not trusted
+        st = os.lstat(cache_dir)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() \
+                or stat.S_IMODE(st.st_mode) & 0o077:
+            LOG.warning('{0} is not private, proxy is not cached'.format(
+                cache_dir))
+            return None
+
+        return os.path.join(cache_dir,
+                            'proxy_{0}.json'.format(self.cluster_id))
+
+    def _get_cached_proxy(self, path, keystone_vip):
+        """Returns ip of proxy found by any test process of cluster
+        less than proxy_cache_ttl seconds ago.
+        """
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, IOError, ValueError):
+            return None
+
+        if cached.get('keystone_vip') != keystone_vip \
+                or cached.get('expires_at', 0) < time.time() \
+                or cached.get('ip') not in self.compute.online_controllers:
+            return None
+        return cached['ip']
+
+    def _cache_proxy(self, path, proxy_ip, keystone_vip):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'ip': proxy_ip,
+                           'keystone_vip': keystone_vip,
+                           'expires_at':
+                           time.time() + self.compute.proxy_cache_ttl}, f)
+            os.rename(tmp_path, path)
+        except (OSError, IOError) as e:
+            LOG.warning('Can not cache proxy in {0}: {1}'.format(path, e))
+
+    def _find_auth_proxy(self, proxy_port, keystone_vip):
+        proxies = self.find_proxy(self.compute.online_controllers,
+                                  proxy_port,
+                                  keystone_vip)
+        if not proxies:
+            raise exceptions.SetProxy()
+        for proxy in proxies:
+            if proxy['auth_passed']:
+                return proxy['ip']
+        raise exceptions.InvalidCredentials
+
+    def _find_cached_auth_proxy(self, path, proxy_port, keystone_vip):
+        """Test processes of cluster wait for the one which checks
+        proxies and take its result from cache.
+        """
+        try:
+            lock_fd = os.open(path + '.lock',
+                              os.O_WRONLY | os.O_CREAT | os.O_NOFOLLOW,
+                              0o600)
+        except OSError as e:
+            LOG.warning('Can not lock {0}: {1}'.format(path, e))
+            return self._find_auth_proxy(proxy_port, keystone_vip)
+
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            proxy_ip = self._get_cached_proxy(path, keystone_vip)
+            if proxy_ip is not None:
+                LOG.info('Using cached proxy on {0}'.format(proxy_ip))
+                return proxy_ip
+
+            proxy_ip = self._find_auth_proxy(proxy_port, keystone_vip)
+            self._cache_proxy(path, proxy_ip, keystone_vip)
+            return proxy_ip
+        finally:
+            os.close(lock_fd)
+
     def set_proxy(self):
         """Sets environment property for http_proxy:
             To behave properly - method must be called after all nailgun params
@@ -845,17 +1032,18 @@ class NailgunConfig(object):
         keystone_vip = self.get_keystone_vip()
         proxy_port = 8888
         LOG.debug('Keystone VIP is: {0}'.format(keystone_vip))
-        proxies = self.find_proxy(self.compute.online_controllers,
-                                  proxy_port,
-                                  keystone_vip)
-        if not proxies:
-            raise exceptions.SetProxy()
-        for proxy in proxies:
-            if proxy['auth_passed']:
-                os.environ['http_proxy'] = 'http://{0}:{1}'.format(proxy['ip'],
-                                                                   proxy_port)
-                return
-        raise exceptions.InvalidCredentials
+
+        path = None
+        if self.compute.proxy_cache_ttl > 0:
+            path = self._proxy_cache_path()
+        if path is None:
+            proxy_ip = self._find_auth_proxy(proxy_port, keystone_vip)
+        else:
+            proxy_ip = self._find_cached_auth_proxy(path, proxy_port,
+                                                    keystone_vip)
+
+        os.environ['http_proxy'] = 'http://{0}:{1}'.format(proxy_ip,
+                                                           proxy_port)
 
     def set_endpoints(self):
         # NOTE(dshulyak) this is hacky convention to allow granular deployment
@@ -26,6 +26,37 @@ from fuel_health.test import BaseTestCase
 
 LOG = logging.getLogger(__name__)
 
+# number of last bytes of large command outputs which are kept for logs
+OUTPUT_TAIL = 65536
+
+
+def _hiera_cmd(hiera_hash, hash_key=None, conf_path="/etc/hiera.yaml",
+               json_parse=False):
+    if hash_key is not None:
+        lookup_cmd = ('value = hiera.lookup("{0}", {{}}, '
+                      '{{}}, nil, :hash)["{1}"]').format(hiera_hash,
+                                                         hash_key)
+    else:
+        lookup_cmd = ('value = hiera.lookup("{0}", {{}},'
+                      ' {{}}, nil, :hash)').format(hiera_hash)
+    if json_parse:
+        print_cmd = 'require "json"; puts JSON.dump(value)'
+    else:
+        print_cmd = 'puts value'
+
+    return ('ruby -e \'require "hiera"; '
+            'hiera = Hiera.new(:config => "{0}"); '
+            '{1}; {2};\'').format(conf_path, lookup_cmd, print_cmd)
+
+
+# facts of cluster which are read from hiera of controller in one batch
+HIERA_FACTS = [
+    ('password', _hiera_cmd('rabbit_hash', 'password')),
+    ('user', _hiera_cmd('rabbit_hash', 'user')),
+    ('nodes', _hiera_cmd('network_metadata', 'nodes', json_parse=True)),
+    ('amqp_hosts', 'hiera amqp_hosts'),
+]
+
 
 class RabbitSanityClass(BaseTestCase):
     """TestClass contains RabbitMQ sanity checks."""
@@ -41,6 +72,7 @@ class RabbitSanityClass(BaseTestCase):
         cls._ssh_timeout = cls.config.compute.ssh_timeout
         cls._password = None
         cls._userid = None
+        cls._facts = None
         cls.messages = []
         cls.queues = []
         cls.release_version = \
@@ -54,10 +86,7 @@ class RabbitSanityClass(BaseTestCase):
             return self._password
 
         if self._password is None:
-            self._password = self.get_hiera_values(
-                hiera_hash='rabbit_hash',
-                hash_key='password'
-            )
+            self._password = self.get_fact('password')
         return self._password
 
     @property
@@ -69,9 +98,7 @@ class RabbitSanityClass(BaseTestCase):
                 amqp_hosts_name[controller_ip] = [controller_ip, '5673']
             return amqp_hosts_name
 
-        nodes = self.get_hiera_values(hiera_hash='network_metadata',
-                                      hash_key='nodes',
-                                      json_parse=True)
+        nodes = self.get_fact('nodes', json_parse=True)
         for ip, port in self.get_amqp_hosts():
             for node in nodes:
                 ips = [nodes[node]['network_roles'][role]
@@ -92,10 +119,7 @@ class RabbitSanityClass(BaseTestCase):
             return self._userid
 
         if self._userid is None:
-            self._userid = self.get_hiera_values(
-                hiera_hash='rabbit_hash',
-                hash_key='user'
-            )
+            self._userid = self.get_fact('user')
         return self._userid
 
     def get_ssh_connection_to_controller(self, controller):
@@ -147,7 +171,9 @@ class RabbitSanityClass(BaseTestCase):
         remote = \
             self.get_ssh_connection_to_controller(
                 self.amqp_hosts_name.keys()[0])
-        output = remote.exec_command("rabbitmqctl list_channels")
+        # list of channels of big cluster is large and is only logged
+        output = remote.exec_command("rabbitmqctl list_channels",
+                                     tail=OUTPUT_TAIL)
 
         LOG.debug('Result of executing command rabbitmqctl'
                   ' list_channels is {0}'.format(output))
@@ -157,22 +183,7 @@ class RabbitSanityClass(BaseTestCase):
                          hash_key=None,
                          conf_path="/etc/hiera.yaml",
                          json_parse=False):
-
-        if hash_key is not None:
-            lookup_cmd = ('value = hiera.lookup("{0}", {{}}, '
-                          '{{}}, nil, :hash)["{1}"]').format(hiera_hash,
-                                                             hash_key)
-        else:
-            lookup_cmd = ('value = hiera.lookup("{0}", {{}},'
-                          ' {{}}, nil, :hash)').format(hiera_hash)
-        if json_parse:
-            print_cmd = 'require "json"; puts JSON.dump(value)'
-        else:
-            print_cmd = 'puts value'
-
-        cmd = ('ruby -e \'require "hiera"; '
-               'hiera = Hiera.new(:config => "{0}"); '
-               '{1}; {2};\'').format(conf_path, lookup_cmd, print_cmd)
+        cmd = _hiera_cmd(hiera_hash, hash_key, conf_path, json_parse)
 
         LOG.debug("Try to execute cmd {0}".format(cmd))
         remote = self.get_ssh_connection_to_controller(self._controllers[0])
@@ -186,6 +197,38 @@ class RabbitSanityClass(BaseTestCase):
             LOG.debug(traceback.format_exc())
             self.fail("Fail to get data from Hiera DB!")
 
+    def get_fact(self, name, json_parse=False):
+        """Returns fact of HIERA_FACTS. All facts are read from the first
+        controller at once and are cached for the test class until any
+        of them fails to be read.
+        """
+        cls = type(self)
+        if cls._facts is None:
+            if not self._controllers:
+                self.fail('There are no online controllers')
+            remote = self.get_ssh_connection_to_controller(
+                self._controllers[0])
+            try:
+                cls._facts = remote.exec_batch(HIERA_FACTS)
+            except Exception:
+                LOG.debug(traceback.format_exc())
+                self.fail("Fail to get data from Hiera DB!")
+
+        result = cls._facts[name]
+        LOG.debug("Fact {0} is {1}".format(name, result))
+        if result.exit_status != 0:
+            # facts are requested again by the next test
+            cls._facts = None
+            self.fail("Fail to get data from Hiera DB!")
+        if json_parse:
+            try:
+                return json.loads(result.stdout.strip())
+            except ValueError:
+                LOG.debug(traceback.format_exc())
+                cls._facts = None
+                self.fail("Fail to get data from Hiera DB!")
+        return result.stdout.strip()
+
     def get_conf_values(self, variable="rabbit_password",
                         sections="DEFAULT",
                         conf_path="/etc/nova/nova.conf"):
@@ -205,14 +248,7 @@ class RabbitSanityClass(BaseTestCase):
             self.fail("Fail to get data from config")
 
     def get_amqp_hosts(self):
-        if not self._controllers:
-            self.fail('There are no online controllers')
-        remote = self.get_ssh_connection_to_controller(self._controllers[0])
-        cmd = 'hiera amqp_hosts'
-        LOG.debug("Try to execute cmd '{0}' on controller...".format(cmd))
-        result = remote.exec_command(cmd)
-        LOG.debug("Result: {0}".format(result))
-        hosts = result.strip().split(',')
+        hosts = self.get_fact('amqp_hosts').split(',')
         return [host.lstrip().split(':')[0:2] for host in hosts]
 
     def check_rabbit_connections(self):
@@ -23,6 +23,34 @@ import fuel_health.config
 LOG = logging.getLogger(__name__)
 
 
+class LazyClient(object):
+    """Client attribute of manager which is created by manager's
+    getter method on first access and then kept by manager.
+    """
+
+    def __init__(self, getter_name, **kwargs):
+        self.getter_name = getter_name
+        self.kwargs = kwargs
+        self.name = None
+
+    def _find_name(self, cls):
+        for klass in cls.__mro__:
+            for name, value in vars(klass).items():
+                if value is self:
+                    return name
+
+    def __get__(self, manager, cls):
+        if manager is None:
+            return self
+        if self.name is None:
+            self.name = self._find_name(cls)
+
+        client = getattr(manager, self.getter_name)(**self.kwargs)
+        # instance attribute shadows this descriptor from now on
+        manager.__dict__[self.name] = client
+        return client
+
+
 class Manager(object):
     """Base manager class
 
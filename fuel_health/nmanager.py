@@ -14,6 +14,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import importlib
 import logging
 import os
 import socket
@@ -24,42 +25,9 @@ import fuel_health.common.utils.data_utils as data_utils
 
 LOG = logging.getLogger(__name__)
 
-# Default client libs
-try:
-    import heatclient.v1.client
-except Exception:
-    LOG.warning('Heatclient could not be imported.')
-try:
-    import muranoclient.v1.client
-except Exception:
-    LOG.debug(traceback.format_exc())
-    LOG.warning('Muranoclient could not be imported.')
-try:
-    import saharaclient.client
-except Exception:
-    LOG.debug(traceback.format_exc())
-    LOG.warning('Sahara client could not be imported.')
-try:
-    import ceilometerclient.v2.client
-except Exception:
-    LOG.warning('Ceilometer client could not be imported.')
-try:
-    import neutronclient.neutron.client
-except Exception:
-    LOG.warning('Neutron client could not be imported.')
-try:
-    import glanceclient
-except Exception:
-    LOG.warning('Glance client could not be imported')
-try:
-    import ironicclient
-except Exception:
-    LOG.warning('Ironic client could not be imported')
-
-import cinderclient.client
-import glanceclient.client
+# client libraries are imported by getters of clients on first use,
+# see OfficialClientManager
 import keystoneclient
-import novaclient.client
 import novaclient.exceptions as nova_exc
 
 from fuel_health.common.ssh import Client as SSHClient
@@ -67,9 +35,15 @@ from fuel_health.common.utils.data_utils import rand_int_id
 from fuel_health.common.utils.data_utils import rand_name
 from fuel_health import exceptions
 import fuel_health.manager
+from fuel_health.manager import LazyClient
 import fuel_health.test
 
 
+# authenticated keystone clients keyed by process, version
+# and credentials, see OfficialClientManager._get_identity_client
+_IDENTITY_CLIENTS = {}
+
+
 class OfficialClientManager(fuel_health.manager.Manager):
     """Manager that provides access to the official python clients for
     calling various OpenStack APIs.
@@ -78,15 +52,28 @@ class OfficialClientManager(fuel_health.manager.Manager):
     NOVACLIENT_VERSION = '2'
     CINDERCLIENT_VERSION = '2'
 
+    compute_client = LazyClient('_get_compute_client')
+    identity_client = LazyClient('_get_identity_client')
+    identity_v3_client = LazyClient('_get_identity_client', version=3)
+    glance_client = LazyClient('_get_glance_client')
+    glance_client_v1 = LazyClient('_get_glance_client', version=1)
+    volume_client = LazyClient('_get_volume_client')
+    heat_client = LazyClient('_get_heat_client')
+    murano_client = LazyClient('_get_murano_client')
+    sahara_client = LazyClient('_get_sahara_client')
+    ceilometer_client = LazyClient('_get_ceilometer_client')
+    neutron_client = LazyClient('_get_neutron_client')
+    ironic_client = LazyClient('_get_ironic_client')
+
     def __init__(self):
         super(OfficialClientManager, self).__init__()
         self.clients_initialized = False
         self.traceback = ''
         self.keystone_error_message = None
-        self.compute_client = self._get_compute_client()
         try:
-            self.identity_client = self._get_identity_client()
-            self.identity_v3_client = self._get_identity_client(version=3)
+            # only authentication is checked here, clients are
+            # created on first access to them
+            self.identity_client
             self.clients_initialized = True
         except (keystoneclient.exceptions.AuthorizationFailure,
                 keystoneclient.exceptions.Unauthorized):
@@ -101,15 +88,6 @@ class OfficialClientManager(fuel_health.manager.Manager):
             self.traceback = traceback.format_exc()
 
         if self.clients_initialized:
-            self.glance_client = self._get_glance_client()
-            self.volume_client = self._get_volume_client()
-            self.heat_client = self._get_heat_client()
-            self.murano_client = self._get_murano_client()
-            self.sahara_client = self._get_sahara_client()
-            self.ceilometer_client = self._get_ceilometer_client()
-            self.neutron_client = self._get_neutron_client()
-            self.glance_client_v1 = self._get_glance_client(version=1)
-            self.ironic_client = self._get_ironic_client()
             self.client_attr_names = [
                 'compute_client',
                 'identity_client',
@@ -150,12 +128,13 @@ class OfficialClientManager(fuel_health.manager.Manager):
 
         # Create our default Nova client to use in testing
         service_type = self.config.compute.catalog_type
-        return novaclient.client.Client(self.NOVACLIENT_VERSION,
-                                        *client_args,
-                                        service_type=service_type,
-                                        no_cache=True,
-                                        insecure=dscv,
-                                        endpoint_type='internalURL')
+        novaclient = importlib.import_module('novaclient.client')
+        return novaclient.Client(self.NOVACLIENT_VERSION,
+                                 *client_args,
+                                 service_type=service_type,
+                                 no_cache=True,
+                                 insecure=dscv,
+                                 endpoint_type='internalURL')
 
     def _get_glance_client(self, version=2, username=None, password=None,
                            tenant_name=None):
@@ -174,8 +153,9 @@ class OfficialClientManager(fuel_health.manager.Manager):
         except keystoneclient.exceptions.EndpointNotFound:
             LOG.warning('Can not initialize glance client')
             return None
-        return glanceclient.client.Client(version, endpoint=endpoint,
-                                          token=keystone.auth_token)
+        glanceclient = importlib.import_module('glanceclient.client')
+        return glanceclient.Client(version, endpoint=endpoint,
+                                   token=keystone.auth_token)
 
     def _get_volume_client(self, username=None, password=None,
                            tenant_name=None):
@@ -187,12 +167,13 @@ class OfficialClientManager(fuel_health.manager.Manager):
             tenant_name = self.config.identity.admin_tenant_name
 
         auth_url = self.config.identity.uri
-        return cinderclient.client.Client(self.CINDERCLIENT_VERSION,
-                                          username,
-                                          password,
-                                          tenant_name,
-                                          auth_url,
-                                          endpoint_type='internalURL')
+        cinderclient = importlib.import_module('cinderclient.client')
+        return cinderclient.Client(self.CINDERCLIENT_VERSION,
+                                   username,
+                                   password,
+                                   tenant_name,
+                                   auth_url,
+                                   endpoint_type='internalURL')
 
     def _get_identity_client(self, username=None, password=None,
                              tenant_name=None, version=None):
@@ -215,25 +196,39 @@ class OfficialClientManager(fuel_health.manager.Manager):
         auth_url = self.config.identity.uri
         dscv = self.config.identity.disable_ssl_certificate_validation
 
+        # authenticated client is shared by all managers of process,
+        # it gets new token by itself when token is about to expire
+        key = (os.getpid(), version or 2, auth_url, username, password,
+               tenant_name, dscv)
+        client = _IDENTITY_CLIENTS.get(key)
+        if client is not None:
+            return client
+
         if not version or version == 2:
-            return keystoneclient.v2_0.client.Client(username=username,
-                                                     password=password,
-                                                     tenant_name=tenant_name,
-                                                     auth_url=auth_url,
-                                                     insecure=dscv)
+            client = keystoneclient.v2_0.client.Client(
+                username=username,
+                password=password,
+                tenant_name=tenant_name,
+                auth_url=auth_url,
+                insecure=dscv)
         elif version == 3:
             helper_list = auth_url.rstrip("/").split("/")
             helper_list[-1] = "v3/"
             auth_url = "/".join(helper_list)
 
-            return keystoneclient.v3.client.Client(username=username,
-                                                   password=password,
-                                                   project_name=tenant_name,
-                                                   auth_url=auth_url,
-                                                   insecure=dscv)
+            client = keystoneclient.v3.client.Client(
+                username=username,
+                password=password,
+                project_name=tenant_name,
+                auth_url=auth_url,
+                insecure=dscv)
         else:
             LOG.warning("Version:{0} for keystoneclient is not "
                         "supported with OSTF".format(version))
+            return None
+
+        _IDENTITY_CLIENTS[key] = client
+        return client
 
     def _get_heat_client(self, username=None, password=None,
                          tenant_name=None):
@@ -254,9 +249,10 @@ class OfficialClientManager(fuel_health.manager.Manager):
             LOG.warning('Can not initialize heat client, endpoint not found')
             return None
         else:
-            return heatclient.v1.client.Client(endpoint=endpoint,
-                                               token=token,
-                                               insecure=dscv)
+            heatclient = importlib.import_module('heatclient.v1.client')
+            return heatclient.Client(endpoint=endpoint,
+                                     token=token,
+                                     insecure=dscv)
 
     def _get_murano_client(self):
         """This method returns Murano API client
@@ -267,8 +263,9 @@ class OfficialClientManager(fuel_health.manager.Manager):
             self.config.identity.admin_password,
             self.config.identity.admin_tenant_name).auth_token
 
+        muranoclient = importlib.import_module('muranoclient.v1.client')
         try:
-            return muranoclient.v1.client.Client(
+            return muranoclient.Client(
                 endpoint=self.config.murano.api_url,
                 token=self.token_id,
                 insecure=self.config.murano.insecure,
@@ -290,9 +287,10 @@ class OfficialClientManager(fuel_health.manager.Manager):
             return
         auth_token = keystone.auth_token
 
-        return saharaclient.client.Client(sahara_api_version,
-                                          sahara_url=sahara_url,
-                                          input_auth_token=auth_token)
+        saharaclient = importlib.import_module('saharaclient.client')
+        return saharaclient.Client(sahara_api_version,
+                                   sahara_url=sahara_url,
+                                   input_auth_token=auth_token)
 
     def _get_ceilometer_client(self):
         keystone = self._get_identity_client()
@@ -304,8 +302,9 @@ class OfficialClientManager(fuel_health.manager.Manager):
             LOG.warning('Can not initialize ceilometer client')
             return None
 
-        return ceilometerclient.v2.Client(endpoint=endpoint,
-                                          token=lambda: keystone.auth_token)
+        ceilometerclient = importlib.import_module('ceilometerclient.v2')
+        return ceilometerclient.Client(endpoint=endpoint,
+                                       token=lambda: keystone.auth_token)
 
     def _get_neutron_client(self, version='2.0'):
         keystone = self._get_identity_client()
@@ -318,9 +317,11 @@ class OfficialClientManager(fuel_health.manager.Manager):
             LOG.warning('Can not initialize neutron client')
             return None
 
-        return neutronclient.neutron.client.Client(version,
-                                                   token=keystone.auth_token,
-                                                   endpoint_url=endpoint)
+        neutronclient = importlib.import_module(
+            'neutronclient.neutron.client')
+        return neutronclient.Client(version,
+                                    token=keystone.auth_token,
+                                    endpoint_url=endpoint)
 
     def _get_ironic_client(self, version='1'):
         keystone = self._get_identity_client()
@@ -332,7 +333,8 @@ class OfficialClientManager(fuel_health.manager.Manager):
             LOG.warning('Can not initialize ironic client')
             return None
 
-        return ironicclient.client.get_client(
+        ironicclient = importlib.import_module('ironicclient.client')
+        return ironicclient.get_client(
             version,
             os_auth_token=keystone.auth_token,
             ironic_url=endpoint)
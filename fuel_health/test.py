@@ -23,6 +23,7 @@ import testresources
 import unittest2
 
 from fuel_health.common import log as logging
+from fuel_health.common import ssh
 from fuel_health.common.ssh import Client as SSHClient
 from fuel_health.common.test_mixins import FuelTestAssertMixin
 from fuel_health import config
@@ -35,6 +36,10 @@ class BaseTestCase(unittest2.TestCase,
                    testresources.ResourcedTestCase,
                    FuelTestAssertMixin):
 
+    # set True for classes which must not run in parallel
+    # with other classes of test set
+    serial = False
+
     def __init__(self, *args, **kwargs):
         super(BaseTestCase, self).__init__(*args, **kwargs)
 
@@ -44,6 +49,11 @@ class BaseTestCase(unittest2.TestCase,
             super(BaseTestCase, cls).setUpClass()
         cls.config = config.FuelConfig()
 
+    def setUp(self):
+        super(BaseTestCase, self).setUp()
+        # transports to instances are kept only for duration of test
+        self.addCleanup(ssh.close_vm_tunnels)
+
 
 def call_until_true(func, duration, sleep_for, *args):
     """Call the given function until it returns True (and return True) or
@@ -70,6 +80,26 @@ def call_until_true(func, duration, sleep_for, *args):
     return False
 
 
+def _class_attribute(cls, name):
+    """Looks up attribute in class dicts without calling descriptors."""
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return vars(klass)[name]
+    return None
+
+
+class ManagerClient(object):
+    """Class attribute of test case which gives client of its manager,
+    so that client is created only when test case uses it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, test, cls):
+        return getattr(cls.manager, self.name)
+
+
 class TestCase(BaseTestCase):
     """Base test case class for all tests
 
@@ -85,9 +115,9 @@ class TestCase(BaseTestCase):
         for attr_name in cls.manager.client_attr_names:
             # Ensure that pre-existing class attributes won't be
             # accidentally overriden.
-            assert not hasattr(cls, attr_name)
-            client = getattr(cls.manager, attr_name)
-            setattr(cls, attr_name, client)
+            assert isinstance(_class_attribute(cls, attr_name),
+                              (ManagerClient, type(None)))
+            setattr(cls, attr_name, ManagerClient(attr_name))
         cls.resource_keys = {}
         cls.os_resources = []
 
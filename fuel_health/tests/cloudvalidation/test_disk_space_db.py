@@ -18,28 +18,32 @@ from fuel_health import cloudvalidation
 class DBSpaceTest(cloudvalidation.CloudValidationTest):
     """Cloud Validation Test class for free space for DB."""
 
-    def _check_db_disk_expectation_warning(self, host):
+    def _check_db_disk_expectation_warning(self):
         """Checks whether DB expects less free space than actually
-        is presented on the controller node
+        is presented on the controller nodes. Returns hosts where it does.
         """
         scheduler_log = 'nova-scheduler.log'
 
         if self.config.compute.deployment_os.lower() == 'centos':
             scheduler_log = 'scheduler.log'
 
-        err_msg = "Cannot check {scheduler_log} at {host}".format(
-            host=host, scheduler_log=scheduler_log)
+        err_msg = "Cannot check {scheduler_log}.".format(
+            scheduler_log=scheduler_log)
 
         warning_msg = "Host has more disk space than database expected"
         cmd = "fgrep '{msg}' -q /var/log/nova/{scheduler_log}".format(
             msg=warning_msg, scheduler_log=scheduler_log)
 
-        out, err = self.verify(5, self._run_ssh_cmd, 1, err_msg,
-                               'check nova-scheduler.log', host, cmd)
+        results = self._run_ssh_cmd_on_hosts(
+            5, self.controllers, cmd, 1, err_msg,
+            'check nova-scheduler.log')
 
-        self.verify_response_true(not err, err_msg, 1)
+        failed = [host for host, result in results.items() if result.stderr]
+        self.verify_response_true(
+            not failed, "{0} Host(s): {1}".format(err_msg, ', '.join(failed)),
+            1)
 
-        return out
+        return [host for host, result in results.items() if result.stdout]
 
     def test_db_expectation_free_space(self):
         """Check disk space allocation for databases on controller nodes
@@ -55,8 +59,7 @@ class DBSpaceTest(cloudvalidation.CloudValidationTest):
         Available since release: 2014.2-6.1
         """
 
-        hosts = filter(self._check_db_disk_expectation_warning,
-                       self.controllers)
+        hosts = self._check_db_disk_expectation_warning()
 
         self.verify_response_true(not hosts,
                                   ("Free disk space cannot be used "
@@ -20,15 +20,10 @@ USED_SPACE_LIMIT_PERCENTS = 90
 class DiskSpaceTest(cloudvalidation.CloudValidationTest):
     """Cloud Validation Test class for disk space checks."""
 
-    def _check_host_used_space(self, host):
-        """Returns used disk space in percentage on host."""
-
-        cmd = 'df --output=pcent | grep "[0-9]"'
-        err_msg = "Cannot check free space on host {host}".format(host=host)
-
-        out, err = self.verify(5, self._run_ssh_cmd, 1, err_msg,
-                               'check free space on host', host, cmd)
-
+    def _get_overused_partitions(self, out):
+        """Returns used disk space in percentage of partitions
+        which are nearly full.
+        """
         partitions = [float(percent[:-1]) for percent in out.split()]
         partitions = filter(lambda perc: perc >= USED_SPACE_LIMIT_PERCENTS,
                             partitions)
@@ -45,8 +40,13 @@ class DiskSpaceTest(cloudvalidation.CloudValidationTest):
 
         Available since release: 2014.2-6.1
         """
-        usages = filter(self._check_host_used_space,
-                        self.computes + self.controllers)
+        cmd = 'df --output=pcent | grep "[0-9]"'
+        results = self._run_ssh_cmd_on_hosts(
+            5, self.computes + self.controllers, cmd, 1,
+            "Cannot check free space.", 'check free space on host')
+
+        usages = [host for host, result in results.items()
+                  if self._get_overused_partitions(result.stdout)]
 
         err_msg = "Nearly disk outage state detected on host(s): %s" % usages
 
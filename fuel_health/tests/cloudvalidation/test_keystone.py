@@ -27,19 +27,22 @@ class KeystoneTest(cloudvalidation.CloudValidationTest):
         if self.config.identity.disable_ssl_certificate_validation:
             self.skipTest('SSL certificate validation is disabled')
 
-    def _check_ssl_issue(self, host):
-        """Check SSL issue on controller node."""
+    def _check_ssl_issue(self):
+        """Check SSL issue on controller nodes. Returns hosts
+        where it is found.
+        """
 
         cmd = 'grep -E "{pattern}" "{logfile}"'.format(
             pattern=self.PATTERN_SSL,
             logfile=self.LOGFILE)
 
-        err_msg = "Cannot check Keystone logs on host {host}".format(host=host)
+        err_msg = "Cannot check Keystone logs."
 
-        out, err = self.verify(5, self._run_ssh_cmd, 1, err_msg,
-                               'check ssl certificate on host', host, cmd)
+        results = self._run_ssh_cmd_on_hosts(
+            5, self.controllers, cmd, 1, err_msg,
+            'check ssl certificate on host')
 
-        return bool(out)
+        return [host for host, result in results.items() if result.stdout]
 
     def test_keystone_ssl_certificate(self):
         """Check Keystone SSL certificate
@@ -53,8 +56,7 @@ class KeystoneTest(cloudvalidation.CloudValidationTest):
         Available since release: 2015.1.0-8.0
         """
 
-        hosts = filter(self._check_ssl_issue,
-                       self.controllers)
+        hosts = self._check_ssl_issue()
 
         err_msg = "Keystone SSL issue found on host(s): %s" % hosts
 
@@ -38,16 +38,7 @@ class LogRotationTest(cloudvalidation.CloudValidationTest):
             " | xargs grep -qP '^[^#]*logrotate'"
         )
 
-        fail_msg = 'Logrotate is not configured on node(s) %s'
-        failed = set()
-        for host in self.controllers + self.computes:
-            try:
-                self.verify(
-                    5, self.run_ssh_cmd_with_exit_code,
-                    1, fail_msg % host,
-                    'checking logrotate', host, cmd)
-            except AssertionError:
-                failed.add(host)
-
-        failed_hosts = ', '.join(failed)
-        self.verify_response_true(len(failed) == 0, fail_msg % failed_hosts, 1)
+        fail_msg = 'Logrotate is not configured.'
+        self._run_ssh_cmd_on_hosts(
+            5, self.controllers + self.computes, cmd, 1, fail_msg,
+            'checking logrotate', check_exit_status=True)
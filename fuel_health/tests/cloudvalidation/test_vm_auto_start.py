@@ -18,15 +18,14 @@ from fuel_health import cloudvalidation
 class VMBootTest(cloudvalidation.CloudValidationTest):
     """Cloud Validation Test class for VMs."""
 
-    def _check_host_boot(self, host):
-        """Test resume_guest_state_on_host_boot option on compute node.
+    def _check_host_boot(self, hosts):
+        """Test resume_guest_state_on_host_boot option on compute nodes.
             By default, this option is set to False.
         """
 
         err_msg = ('The option "resume_guest_state_on_host_boot" '
-                   'is set to True at compute node {host}, so it can be '
-                   'broken down by the paused VMs after host boot.'
-                   ).format(host=host)
+                   'is set to True at compute node(s) {hosts}, so it can be '
+                   'broken down by the paused VMs after host boot.')
 
         cmd = ('grep ^[^#]*\s*resume_guests_state_on_host_boot\s*=\s*True '
                '/etc/nova/nova.conf')
@@ -35,11 +34,16 @@ class VMBootTest(cloudvalidation.CloudValidationTest):
         step = 1
         action = 'check host boot option'
 
-        out, err = self.verify(cmd_timeout, self._run_ssh_cmd, step, err_msg,
-                               action, host, cmd)
+        results = self._run_ssh_cmd_on_hosts(
+            cmd_timeout, hosts, cmd, step,
+            'Cannot check host boot option.', action)
 
-        auto_host_boot_disabled = not out and not err
-        self.verify_response_true(auto_host_boot_disabled, err_msg, 1)
+        auto_host_boot_enabled = [
+            host for host, result in results.items()
+            if result.stdout or result.stderr]
+        self.verify_response_true(
+            not auto_host_boot_enabled,
+            err_msg.format(hosts=', '.join(auto_host_boot_enabled)), 1)
 
     def test_guests_state_on_host_boot(self):
         """Check host boot configuration on compute nodes
@@ -55,5 +59,4 @@ class VMBootTest(cloudvalidation.CloudValidationTest):
         Available since release: 2015.1.0-8.0
         """
 
-        for host in self.computes:
-            self._check_host_boot(host)
+        self._check_host_boot(self.computes)
@@ -14,7 +14,6 @@
 
 import logging
 
-from fuel_health.common.ssh import Client as SSHClient
 from fuel_health import test
 
 
@@ -35,19 +34,18 @@ class HAProxyCheck(test.BaseTestCase):
         if not self.controllers:
             self.skipTest('There are no controller nodes')
 
-    def _check_haproxy_backend(self, remote,
-                               services=None, nodes=None,
-                               ignore_services=None, ignore_nodes=None):
-        """Check DOWN state of HAProxy backends. Define names of service or
-        nodes if need check some specific service or node. Use ignore_services
-        for ignore service status on all nodes. Use ignore_nodes for ignore all
-        services on all nodes. Ignoring has a bigger priority.
-        :param remote: SSHClient
+    def _haproxy_backend_cmd(self, services=None, nodes=None,
+                             ignore_services=None, ignore_nodes=None):
+        """Returns command which gets state of HAProxy backends. Define
+        names of service or nodes if need check some specific service or
+        node. Use ignore_services for ignore service status on all nodes.
+        Use ignore_nodes for ignore all services on all nodes. Ignoring
+        has a bigger priority.
         :param service: List
         :param nodes: List
         :param ignore_services: List
         :param ignore_nodes: List
-        :return dict
+        :return str
         """
         cmd = 'haproxy-status.sh | egrep -v "BACKEND|FRONTEND"'
 
@@ -57,7 +55,7 @@ class HAProxyCheck(test.BaseTestCase):
         grep.extend(
             ['|egrep -v "{0}"'.format('|'.join(n)) for n in neg_filter if n])
 
-        return remote.exec_command("{0}{1}".format(cmd, ''.join(grep)))
+        return "{0}{1}".format(cmd, ''.join(grep))
 
     def test_001_check_state_of_backends(self):
         """Check state of haproxy backends on controllers
@@ -70,23 +68,23 @@ class HAProxyCheck(test.BaseTestCase):
         Available since release: 2015.1.0-8.0
         """
         LOG.info("Controllers nodes are %s" % self.controllers)
-        for controller in self.controllers:
-            remote = SSHClient(controller, self.controller_user,
-                               key_filename=self.controller_key,
-                               timeout=100)
-            ignore_services = []
-            if 'neutron' not in self.config.network.network_provider:
-                ignore_services.append('nova-metadata-api')
-            haproxy_status = self.verify(
-                10, self._check_haproxy_backend, 1,
-                "Can't get state of backends.",
-                "Getting state of backends",
-                remote,
-                ignore_services=ignore_services)
+        ignore_services = []
+        if 'neutron' not in self.config.network.network_provider:
+            ignore_services.append('nova-metadata-api')
+        results = self.verify_on_hosts(
+            10, self.controllers,
+            self._haproxy_backend_cmd(ignore_services=ignore_services), 1,
+            "Can't get state of backends.",
+            "Getting state of backends",
+            get_pty=True,
+            username=self.controller_user,
+            key_filename=self.controller_key)
 
+        for controller, result in results.items():
             dead_backends = filter(lambda x: 'DOWN' in x,
-                                   haproxy_status.splitlines())
-            LOG.debug("Dead backends {0}".format(dead_backends))
+                                   result.stdout.splitlines())
+            LOG.debug("Dead backends on {0}: {1}".format(controller,
+                                                         dead_backends))
             self.verify_response_true(
                 len(dead_backends) == 0,
                 "Step 2 failed: Some haproxy backend has down state.")
@@ -76,16 +76,15 @@ class TestMysqlReplication(BaseMysqlTest):
 
         # check that mysql is running on all hosts
         cmd = 'mysql -h localhost -e "" '
-        for db_node in databases:
-            ssh_client = SSHClient(
-                db_node, self.node_user,
-                key_filename=self.node_key, timeout=100)
-            self.verify(
-                20, ssh_client.exec_command, 1,
-                'Can not connect to mysql. '
-                'Please check that mysql is running and there '
-                'is connectivity by management network',
-                'detect mysql node', cmd)
+        self.verify_on_hosts(
+            20, databases, cmd, 1,
+            'Can not connect to mysql. '
+            'Please check that mysql is running and there '
+            'is connectivity by management network',
+            'detect mysql node',
+            get_pty=True,
+            username=self.node_user,
+            key_filename=self.node_key)
 
         database_name = self.database
         table_name = 'ost' + str(data_utils.rand_int_id(100, 999))
@@ -140,20 +139,19 @@ class TestMysqlReplication(BaseMysqlTest):
         LOG.info('create data')
 
         # Verify that data is replicated on other databases
-        for db_node in databases:
-            if db_node != self.master_ip:
-                client = SSHClient(db_node,
-                                   self.node_user,
-                                   key_filename=self.node_key)
-
-                output = self.verify(
-                    20, client.exec_command, 5,
-                    'Can not get data from database node %s' % db_node,
-                    'get_record', get_record)
-
-                self.verify_response_body(output, record_data,
-                                          msg='Expected data missing',
-                                          failed_step='6')
+        results = self.verify_on_hosts(
+            20, [node for node in databases if node != self.master_ip],
+            get_record, 5,
+            'Can not get data from database node.',
+            'get_record',
+            get_pty=True,
+            username=self.node_user,
+            key_filename=self.node_key)
+
+        for result in results.values():
+            self.verify_response_body(result.stdout, record_data,
+                                      msg='Expected data missing',
+                                      failed_step='6')
 
         # Drop created db
         ssh_client = SSHClient(self.master_ip, self.node_user,
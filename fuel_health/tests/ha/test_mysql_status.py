@@ -38,6 +38,8 @@ class BaseMysqlTest(BaseTestCase):
         cls.one_db_msg = "There is only one database online. Nothing to check"
         cls.no_db_msg = ("Can not find any online database. "
                          "Check that at least one database is operable")
+        # database nodes of hiera, they are read once for the class
+        cls._database_nodes = None
 
     def setUp(self):
         super(BaseMysqlTest, self).setUp()
@@ -49,18 +51,21 @@ class BaseMysqlTest(BaseTestCase):
         if version.StrictVersion(cls.release_version)\
                 < version.StrictVersion('7.0'):
             return cls.config.compute.online_controllers
-        # retrieve data from controller
-        ssh_client = SSHClient(controller_ip,
-                               username,
-                               key_filename=key,
-                               timeout=100)
-
-        hiera_cmd = ('ruby -e \'require "hiera";'
-                     'db = Hiera.new().lookup("database_nodes", {}, {}).keys;'
-                     'if db != [] then puts db else puts "None" end\'')
-        database_nodes = ssh_client.exec_command(hiera_cmd)
+        if cls._database_nodes is None:
+            # retrieve data from controller
+            ssh_client = SSHClient(controller_ip,
+                                   username,
+                                   key_filename=key,
+                                   timeout=100)
+
+            hiera_cmd = ('ruby -e \'require "hiera";'
+                         'db = Hiera.new().lookup("database_nodes", {}, {})'
+                         '.keys;'
+                         'if db != [] then puts db else puts "None" end\'')
+            cls._database_nodes = \
+                ssh_client.exec_command(hiera_cmd).splitlines()
+        database_nodes = cls._database_nodes
         # get online nodes
-        database_nodes = database_nodes.splitlines()
         databases = []
         for node in cls.config.compute.nodes:
             hostname = node['hostname']
@@ -108,19 +113,19 @@ class TestMysqlStatus(BaseMysqlTest):
         for database in dbs:
             LOG.info('Current database name is %s' % database)
             temp_set = set()
-            for node in databases:
+            cmd1 = cmd % {'database': database}
+            LOG.info('Try to execute command %s' % cmd1)
+            results = self.verify_on_hosts(
+                40, databases, cmd1, 2,
+                'Can list tables',
+                'get amount of tables for each database',
+                get_pty=True,
+                username=self.node_user,
+                key_filename=self.node_key,
+                timeout=self.config.compute.ssh_timeout)
+            for node, result in results.items():
                 LOG.info('Current database node is %s' % node)
-                cmd1 = cmd % {'database': database}
-                LOG.info('Try to execute command %s' % cmd1)
-                tables = SSHClient(
-                    node, self.node_user,
-                    key_filename=self.node_key,
-                    timeout=self.config.compute.ssh_timeout)
-                output = self.verify(40, tables.exec_command, 2,
-                                     'Can list tables',
-                                     'get amount of tables for each database',
-                                     cmd1)
-                tables = set(output.splitlines())
+                tables = set(result.stdout.splitlines())
                 if len(temp_set) == 0:
                     temp_set = tables
                 self.verify_response_true(
@@ -173,16 +178,17 @@ class TestMysqlStatus(BaseMysqlTest):
         if len(databases) == 1:
             self.skipTest(self.one_db_msg)
 
-        for db_node in databases:
-            command = "mysql -h localhost -e \"SHOW STATUS LIKE 'wsrep_%'\""
-            ssh_client = SSHClient(db_node, self.node_user,
-                                   key_filename=self.node_key,
-                                   timeout=100)
-            output = self.verify(
-                20, ssh_client.exec_command, 2,
-                "Verification of galera cluster node status failed",
-                'get status from galera node',
-                command).splitlines()
+        command = "mysql -h localhost -e \"SHOW STATUS LIKE 'wsrep_%'\""
+        results = self.verify_on_hosts(
+            20, databases, command, 2,
+            "Verification of galera cluster node status failed",
+            'get status from galera node',
+            get_pty=True,
+            username=self.node_user,
+            key_filename=self.node_key)
+
+        for db_node, result in results.items():
+            output = result.stdout.splitlines()
 
             LOG.debug('mysql output from node "{0}" is \n"{1}"'.format(
                 db_node, output)
@@ -47,10 +47,10 @@ class RabbitSanityTest(ha_base.RabbitSanityClass):
         Duration: 100 s.
         Deployment tags: CENTOS
         """
-        self.verify(20, self.list_nodes, 1,
-                    'Cannot retrieve cluster nodes')
+        num_nodes = self.verify(20, self.list_nodes, 1,
+                                'Cannot retrieve cluster nodes')
 
-        if len(self.amqp_hosts_name) != self.list_nodes():
+        if len(self.amqp_hosts_name) != num_nodes:
             self.fail('Step 2 failed: Number of RabbitMQ nodes '
                       'is not equal to number of cluster nodes.')
 
@@ -79,9 +79,10 @@ class RabbitSanityTest(ha_base.RabbitSanityClass):
         Duration: 100 s.
         Deployment tags: Ubuntu
         """
-        self.verify(20, self.list_nodes, 1, 'Cannot retrieve cluster nodes')
+        num_nodes = self.verify(20, self.list_nodes, 1,
+                                'Cannot retrieve cluster nodes')
 
-        if len(self.amqp_hosts_name) != self.list_nodes():
+        if len(self.amqp_hosts_name) != num_nodes:
             self.fail('Step 2 failed: Number of RabbitMQ nodes '
                       'is not equal to number of cluster nodes.')
 
@@ -0,0 +1,156 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Snapshot of cluster data of nailgun which is built by adapter once
+per test run and is read by configs of tests instead of requesting
+nailgun from every test process. Responses cached by adapter for
+discovery of cluster are reused, only missing ones are requested.
+
+Snapshot is json file of the following form:
+
+    {
+        "version": 1,
+        "nailgun_url": "http://127.0.0.1:8000",
+        "cluster_id": "1",
+        "created_at": 1450000000.0,
+        "expires_at": 1450000600.0,
+        "responses": {"/api/clusters/1": {...}, ...}
+    }
+
+Responses are decoded bodies of nailgun API by url, only successful
+ones are included. Version and urls of the snapshot are defined by
+fuel_health.common.nailgun_snapshot. Path of the snapshot is passed
+to tests with NAILGUN_SNAPSHOT environment variable.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    from oslo.config import cfg
+except ImportError:
+    from oslo_config import cfg
+
+import requests
+
+from fuel_health.common import nailgun_snapshot
+from fuel_plugin.ostf_adapter import mixins
+
+
+LOG = logging.getLogger(__name__)
+
+
+def _nailgun_url():
+    return 'http://{0}:{1}'.format(cfg.CONF.adapter.nailgun_host,
+                                   cfg.CONF.adapter.nailgun_port)
+
+
+def _fetch_all(req_session, api_urls, responses):
+    """Requests given urls of nailgun API concurrently and stores
+    successful responses.
+    """
+    def fetch(api_url):
+        try:
+            response = req_session.get(_nailgun_url() + api_url)
+            if response.status_code == 200:
+                responses[api_url] = response.json()
+            else:
+                LOG.warning('Nailgun responded %s to %s',
+                            response.status_code, api_url)
+        except Exception:
+            LOG.exception('Failed to request %s', api_url)
+
+    threads = [threading.Thread(target=fetch, args=(api_url,))
+               for api_url in api_urls if api_url not in responses]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def build_snapshot(cluster_id, token=None, responses=None):
+    """Requests cluster data used by configs of tests from nailgun.
+
+    :param responses: already received responses by url of nailgun
+                      API, they are not requested again.
+    """
+    req_session = requests.Session()
+    req_session.trust_env = False
+    if token:
+        req_session.headers.update({'X-Auth-Token': token})
+
+    responses = dict(responses or {})
+    _fetch_all(req_session,
+               nailgun_snapshot.cluster_api_urls(cluster_id),
+               responses)
+
+    cluster_data = responses.get('/api/clusters/{0}'.format(cluster_id))
+    if cluster_data:
+        _fetch_all(req_session,
+                   nailgun_snapshot.cluster_dependent_api_urls(
+                       cluster_id, cluster_data),
+                   responses)
+
+    created_at = time.time()
+    return {
+        'version': nailgun_snapshot.SNAPSHOT_VERSION,
+        'nailgun_url': _nailgun_url(),
+        'cluster_id': str(cluster_id),
+        'created_at': created_at,
+        'expires_at': created_at + cfg.CONF.adapter.cluster_snapshot_ttl,
+        'responses': responses,
+    }
+
+
+def write_snapshot(cluster_id, token=None):
+    """Builds snapshot of cluster and writes it to temporary file
+    readable only by owner (cluster attributes contain credentials).
+    Returns path of the file or None if snapshots are disabled or
+    snapshot can not be built.
+    """
+    if cfg.CONF.adapter.cluster_snapshot_ttl <= 0 or not cluster_id:
+        return None
+
+    try:
+        cluster_attrs = mixins.get_cluster_attrs(cluster_id, token=token)
+        snapshot = build_snapshot(cluster_id, token=token,
+                                  responses=cluster_attrs.get('responses'))
+    except Exception:
+        LOG.exception('Failed to build snapshot of cluster %s', cluster_id)
+        return None
+
+    fd, path = tempfile.mkstemp(prefix='ostf_cluster_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+    except Exception:
+        LOG.exception('Failed to write snapshot of cluster %s', cluster_id)
+        remove_snapshot(path)
+        return None
+
+    return path
+
+
+def remove_snapshot(path):
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        LOG.warning('Failed to remove snapshot %s', path)
@@ -45,6 +45,50 @@ adapter_opts = [
     cfg.StrOpt('nailgun_port',
                default='8000',
                help=""),
+    cfg.IntOpt('nailgun_cache_ttl',
+               default=30,
+               help="Time in seconds for which cluster attributes "
+                    "received from nailgun are cached. "
+                    "Set 0 to disable caching."),
+    cfg.IntOpt('cluster_snapshot_ttl',
+               default=600,
+               help="Time in seconds for which snapshot of cluster data "
+                    "built by adapter at start of test run is used by "
+                    "tests instead of requesting nailgun. "
+                    "Set 0 to disable snapshots."),
+    cfg.FloatOpt('results_flush_interval',
+                 default=1.0,
+                 help="Max delay in seconds before results of tests "
+                      "are written to db. Set 0 to write them "
+                      "immediately."),
+    cfg.IntOpt('parallel_test_classes',
+               default=1,
+               help="Number of test classes of test run executed "
+                    "at once in separate processes. Classes with "
+                    "true 'serial' attribute are executed after others "
+                    "one by one. Set 1 to execute tests serially."),
+    cfg.StrOpt('discovery_engine',
+               default='nose',
+               help="Engine of tests discovery: 'nose' imports test "
+                    "modules, 'ast' reads test sets and tests from "
+                    "sources of test modules without importing them."),
+    cfg.FloatOpt('scheduler_interval',
+                 default=1.0,
+                 help="Interval in seconds between checks whether "
+                      "queued test runs can be started."),
+    cfg.IntOpt('worker_pool_size',
+               default=4,
+               help="Number of pre-forked processes executing test runs. "
+                    "Set 0 to fork new process for each test run."),
+    cfg.IntOpt('worker_max_runs',
+               default=20,
+               help="Number of test runs after which worker process "
+                    "is replaced with new one. Set 0 to never "
+                    "replace workers."),
+    cfg.ListOpt('worker_preload_modules',
+                default=['fuel_health.nmanager'],
+                help="Modules imported by worker processes before "
+                     "they execute test runs."),
     cfg.StrOpt('log_file',
                default='/var/log/ostf.log',
                help=""),
@@ -12,7 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
 import logging
+import threading
+import time
 
 try:
     from oslo.config import cfg
@@ -20,6 +24,7 @@ except ImportError:
     from oslo_config import cfg
 
 import requests
+from sqlalchemy import exc
 from sqlalchemy.orm import joinedload
 
 from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
@@ -29,43 +34,136 @@ from fuel_plugin.ostf_adapter.storage import models
 LOG = logging.getLogger(__name__)
 
 
-TEST_REPOSITORY = []
+TEST_REPOSITORY = None
+
+# cluster attributes fetched from nailgun are cached
+# for CONF.adapter.nailgun_cache_ttl seconds by cluster id
+_CLUSTER_ATTRS_CACHE = {}
+_CLUSTER_ATTRS_LOCK = threading.Lock()
+
+_NAILGUN_SESSION = None
 
 
 def delete_db_data(session):
     LOG.info('Starting clean db action.')
-    session.query(models.ClusterTestingPattern).delete()
-    session.query(models.ClusterState).delete()
+    delete_cluster_data(session)
     session.query(models.TestSet).delete()
+    session.query(models.DiscoveredFile).delete()
 
     session.commit()
 
 
+def delete_cluster_data(session):
+    """Deletes testing patterns of clusters (and so their test runs),
+    they are computed again on next request for a cluster.
+    """
+    session.query(models.ClusterTestingPattern).delete()
+    session.query(models.ClusterState).delete()
+    session.query(models.TestingPattern).delete()
+
+
+class TestRepository(object):
+    """Read-only snapshot of discovered test sets and tests.
+
+    Test sets are indexed by id and tests are indexed by test set id
+    and name. Availability conditions of every entity are compiled
+    once on creation. Version is a digest of data which testing
+    patterns depend on, so it changes only when such data changes.
+
+    Instances are never modified after creation, new repository
+    is built and swapped in when discovery is performed again.
+    """
+
+    def __init__(self, test_sets=()):
+        self.test_sets = collections.OrderedDict()
+        self.tests = {}
+
+        digest = hashlib.sha1()
+
+        # test sets and tests are sorted, so version does not depend
+        # on order of rows returned by db
+        for test_set in sorted(test_sets, key=lambda ts: ts.id):
+            data_elem = dict()
+
+            data_elem['test_set_id'] = test_set.id
+            data_elem['deployment_tags'] = test_set.deployment_tags
+            data_elem['available_since_release'] = \
+                test_set.available_since_release
+            data_elem['availability'] = nose_utils.compile_availability(
+                data_elem)
+            data_elem['test_runs_ordering_priority'] = \
+                test_set.test_runs_ordering_priority
+            data_elem['frontend'] = test_set.frontend
+            data_elem['tests'] = []
+
+            digest.update(repr((test_set.id,
+                                test_set.deployment_tags,
+                                test_set.available_since_release)))
+
+            for test in sorted(test_set.tests, key=lambda t: t.name):
+                # skip copies of tests bound to test runs
+                if test.test_run_id is not None:
+                    continue
+
+                test_dict = {
+                    'name': test.name,
+                    'deployment_tags': test.deployment_tags,
+                    'available_since_release':
+                    test.available_since_release,
+                    'frontend': test.frontend,
+                }
+                test_dict['availability'] = \
+                    nose_utils.compile_availability(test_dict)
+
+                digest.update(repr((test.name,
+                                    test.deployment_tags,
+                                    test.available_since_release)))
+
+                data_elem['tests'].append(test_dict)
+                self.tests[(test_set.id, test.name)] = test_dict
+
+            self.test_sets[test_set.id] = data_elem
+
+        self.version = digest.hexdigest()
+
+    def __iter__(self):
+        return iter(self.test_sets.values())
+
+    def __len__(self):
+        return len(self.test_sets)
+
+    def get_test_set(self, test_set_id):
+        return self.test_sets.get(test_set_id)
+
+    def get_test(self, test_set_id, test_name):
+        return self.tests.get((test_set_id, test_name))
+
+
+def get_test_repository(session):
+    """Returns current test repository, builds it
+    from db if it was not built yet.
+    """
+    if TEST_REPOSITORY is None:
+        cache_test_repository(session)
+    return TEST_REPOSITORY
+
+
 def cache_test_repository(session):
-    test_repository = session.query(models.TestSet)\
+    """Builds test repository from db and replaces current one."""
+    global TEST_REPOSITORY
+
+    test_sets = session.query(models.TestSet)\
         .options(joinedload('tests'))\
         .all()
 
-    crucial_tests_attrs = ['name', 'deployment_tags',
-                           'available_since_release']
-    for test_set in test_repository:
-        data_elem = dict()
-
-        data_elem['test_set_id'] = test_set.id
-        data_elem['deployment_tags'] = test_set.deployment_tags
-        data_elem['available_since_release'] = test_set.available_since_release
-        data_elem['tests'] = []
-
-        for test in test_set.tests:
-            test_dict = dict([(attr_name, getattr(test, attr_name))
-                              for attr_name in crucial_tests_attrs])
-            data_elem['tests'].append(test_dict)
+    TEST_REPOSITORY = TestRepository(test_sets)
 
-        TEST_REPOSITORY.append(data_elem)
+    LOG.info('Test repository of version %s is cached.',
+             TEST_REPOSITORY.version)
 
 
 def discovery_check(session, cluster_id, token=None):
-    cluster_attrs = _get_cluster_attrs(cluster_id, token=token)
+    cluster_attrs = get_cluster_attrs(cluster_id, token=token)
 
     cluster_data = {
         'id': cluster_id,
@@ -81,7 +179,8 @@ def discovery_check(session, cluster_id, token=None):
         session.add(
             models.ClusterState(
                 id=cluster_data['id'],
-                deployment_tags=list(cluster_data['deployment_tags'])
+                deployment_tags=list(cluster_data['deployment_tags']),
+                release_version=cluster_data['release_version']
             )
         )
 
@@ -94,47 +193,109 @@ def discovery_check(session, cluster_id, token=None):
         return
 
     old_deployment_tags = cluster_state.deployment_tags
-    if set(old_deployment_tags) != cluster_data['deployment_tags']:
+    if set(old_deployment_tags) != cluster_data['deployment_tags'] or \
+            cluster_state.release_version != cluster_data['release_version']:
+        old_signatures = set(
+            signature for (signature,) in
+            session.query(models.ClusterTestingPattern.signature)
+            .filter_by(cluster_id=cluster_state.id)
+        )
         session.query(models.ClusterTestingPattern)\
             .filter_by(cluster_id=cluster_state.id)\
             .delete()
 
         _add_cluster_testing_pattern(session, cluster_data)
+        _delete_unused_testing_patterns(session, old_signatures)
 
         cluster_state.deployment_tags = \
             list(cluster_data['deployment_tags'])
+        cluster_state.release_version = cluster_data['release_version']
 
         session.merge(cluster_state)
 
 
-def _get_cluster_attrs(cluster_id, token=None):
-    cluster_attrs = {}
+def invalidate_cluster_attrs(cluster_id=None):
+    """Drops cached attributes of given cluster or of all
+    clusters if cluster_id is not provided.
+    """
+    with _CLUSTER_ATTRS_LOCK:
+        if cluster_id is None:
+            _CLUSTER_ATTRS_CACHE.clear()
+        else:
+            _CLUSTER_ATTRS_CACHE.pop(str(cluster_id), None)
+
+
+def get_cluster_attrs(cluster_id, token=None):
+    """Returns deployment tags and release version of cluster
+    and successful responses of nailgun API they are computed from.
+
+    Data is requested from nailgun only if it is absent in cache
+    or expired. Returned data must not be modified as it is shared
+    between callers.
+    """
+    key = str(cluster_id)
+    ttl = cfg.CONF.adapter.nailgun_cache_ttl
+
+    with _CLUSTER_ATTRS_LOCK:
+        cached = _CLUSTER_ATTRS_CACHE.get(key)
+    if cached and cached[0] > time.time():
+        return cached[1]
+
+    # fetches are not coalesced: adapter serves requests in greenlets
+    # of one thread and nailgun is requested without monkey patching,
+    # so fetch blocks other requests until nailgun responds anyway
+    cluster_attrs = _get_cluster_attrs(cluster_id, token=token)
+    if ttl > 0:
+        with _CLUSTER_ATTRS_LOCK:
+            _CLUSTER_ATTRS_CACHE[key] = (time.time() + ttl, cluster_attrs)
 
-    REQ_SES = requests.Session()
-    REQ_SES.trust_env = False
+    return cluster_attrs
 
-    if token is not None:
-        REQ_SES.headers.update({'X-Auth-Token': token})
 
-    URL = 'http://{0}:{1}/{2}'
-    NAILGUN_API_URL = 'api/clusters/{0}'
+def _get_nailgun_session():
+    """Returns requests session shared by all requests to nailgun
+    so keep-alive connections are reused.
+    """
+    global _NAILGUN_SESSION
 
-    cluster_url = NAILGUN_API_URL.format(cluster_id)
-    request_url = URL.format(cfg.CONF.adapter.nailgun_host,
-                             cfg.CONF.adapter.nailgun_port,
-                             cluster_url)
+    if _NAILGUN_SESSION is None:
+        session = requests.Session()
+        session.trust_env = False
+        _NAILGUN_SESSION = session
+
+    return _NAILGUN_SESSION
 
-    response = REQ_SES.get(request_url).json()
-    release_id = response.get('release_id', 'failed to get id')
 
-    release_url = URL.format(
-        cfg.CONF.adapter.nailgun_host, cfg.CONF.adapter.nailgun_port,
-        'api/releases/{0}'.format(release_id))
+def _get_cluster_attrs(cluster_id, token=None):
+    cluster_attrs = {}
+    # decoded successful responses by url of nailgun API,
+    # they are reused by snapshot of cluster passed to tests
+    responses = {}
+    cluster_attrs['responses'] = responses
 
-    nodes_url = URL.format(
-        cfg.CONF.adapter.nailgun_host, cfg.CONF.adapter.nailgun_port,
-        'api/nodes?cluster_id={0}'.format(cluster_id))
-    nodes_response = REQ_SES.get(nodes_url).json()
+    REQ_SES = _get_nailgun_session()
+
+    headers = {}
+    if token is not None:
+        headers['X-Auth-Token'] = token
+
+    def get_json(api_url):
+        response = REQ_SES.get(
+            'http://{0}:{1}{2}'.format(cfg.CONF.adapter.nailgun_host,
+                                       cfg.CONF.adapter.nailgun_port,
+                                       api_url),
+            headers=headers)
+        data = response.json()
+        if response.status_code == 200:
+            responses[api_url] = data
+        return data
+
+    cluster_url = '/api/clusters/{0}'.format(cluster_id)
+
+    response = get_json(cluster_url)
+    release_id = response.get('release_id', 'failed to get id')
+
+    nodes_response = get_json('/api/nodes?cluster_id={0}'.format(cluster_id))
     if 'objects' in nodes_response:
         nodes_response = nodes_response['objects']
     enable_without_ceph = filter(lambda node: 'ceph-osd' in node['roles'],
@@ -148,7 +309,7 @@ def _get_cluster_attrs(cluster_id, token=None):
     if fuel_version:
         deployment_tags.add(fuel_version)
 
-    release_data = REQ_SES.get(release_url).json()
+    release_data = get_json('/api/releases/{0}'.format(release_id))
 
     if 'version' in release_data:
         cluster_attrs['release_version'] = release_data['version']
@@ -164,8 +325,7 @@ def _get_cluster_attrs(cluster_id, token=None):
     deployment_tags.add(network_type)
 
     # info about murano/sahara clients installation
-    request_url += '/' + 'attributes'
-    response = REQ_SES.get(request_url).json()
+    response = get_json(cluster_url + '/attributes')
 
     public_assignment = response['editable'].get('public_network_assignment')
     if not public_assignment or \
@@ -229,28 +389,94 @@ def _get_cluster_attrs(cluster_id, token=None):
 
 
 def _add_cluster_testing_pattern(session, cluster_data):
-    to_database = []
-
-    global TEST_REPOSITORY
+    """Binds cluster to testing patterns of its signature.
+    Patterns are computed only if there are no patterns
+    for the signature yet, otherwise they are shared with
+    clusters that have the same release version and deployment tags.
+    """
+    test_repository = get_test_repository(session)
+    signature = models.TestingPattern.make_signature(
+        cluster_data, test_repository.version)
+
+    query = session.query(models.TestingPattern.test_set_id)\
+        .filter_by(signature=signature)
+    test_sets_ids = [test_set_id for (test_set_id,) in query]
+
+    if not test_sets_ids:
+        testing_patterns = _compute_testing_patterns(test_repository,
+                                                     cluster_data,
+                                                     signature)
+        try:
+            # patterns are flushed on exit of savepoint,
+            # because cluster testing patterns reference them
+            with session.begin_nested():
+                session.add_all(testing_patterns)
+            test_sets_ids = [pattern.test_set_id
+                             for pattern in testing_patterns]
+        except exc.IntegrityError:
+            # patterns of the signature were added by concurrent
+            # discovery of another cluster
+            LOG.debug('Testing patterns of signature %s already exist',
+                      signature)
+            test_sets_ids = [test_set_id for (test_set_id,) in query]
+
+    session.add_all([
+        models.ClusterTestingPattern(cluster_id=cluster_data['id'],
+                                     test_set_id=test_set_id,
+                                     signature=signature)
+        for test_set_id in test_sets_ids
+    ])
+
+
+def _delete_unused_testing_patterns(session, signatures):
+    """Deletes testing patterns of given signatures which are not
+    referenced by clusters anymore.
+    """
+    if not signatures:
+        return
 
-    # populate cache if it's empty
-    if not TEST_REPOSITORY:
-        cache_test_repository(session)
+    session.flush()
+    referenced = session.query(models.ClusterTestingPattern)\
+        .filter(models.ClusterTestingPattern.signature ==
+                models.TestingPattern.signature,
+                models.ClusterTestingPattern.test_set_id ==
+                models.TestingPattern.test_set_id)\
+        .exists()
+    try:
+        # pattern may be bound to cluster by concurrent discovery
+        # at the same time, it is kept then
+        with session.begin_nested():
+            session.query(models.TestingPattern)\
+                .filter(models.TestingPattern.signature.in_(signatures),
+                        ~referenced)\
+                .delete(synchronize_session=False)
+    except exc.IntegrityError:
+        LOG.debug('Unused testing patterns were not deleted',
+                  exc_info=True)
+
+
+def _compute_testing_patterns(test_repository, cluster_data, signature):
+    testing_patterns = []
+
+    cluster_tags, cluster_release = \
+        nose_utils.compile_cluster_data(cluster_data)
 
-    for test_set in TEST_REPOSITORY:
-        if nose_utils.is_test_available(cluster_data, test_set):
+    for test_set in test_repository:
+        if test_set['availability'].is_satisfied(cluster_tags,
+                                                 cluster_release):
 
             testing_pattern = {}
-            testing_pattern['cluster_id'] = cluster_data['id']
+            testing_pattern['signature'] = signature
             testing_pattern['test_set_id'] = test_set['test_set_id']
             testing_pattern['tests'] = []
 
             for test in test_set['tests']:
-                if nose_utils.is_test_available(cluster_data, test):
+                if test['availability'].is_satisfied(cluster_tags,
+                                                     cluster_release):
                     testing_pattern['tests'].append(test['name'])
 
-            to_database.append(
-                models.ClusterTestingPattern(**testing_pattern)
+            testing_patterns.append(
+                models.TestingPattern(**testing_pattern)
             )
 
-    session.add_all(to_database)
+    return testing_patterns
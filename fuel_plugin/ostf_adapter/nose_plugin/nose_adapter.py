@@ -12,21 +12,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import fcntl
 import logging
 import os
 import signal
-import time
+
+from sqlalchemy import orm
 
 try:
     from oslo.config import cfg
 except ImportError:
     from oslo_config import cfg
 
+from fuel_plugin.ostf_adapter import cluster_snapshot
 from fuel_plugin.ostf_adapter.logger import ResultsLogger
 from fuel_plugin.ostf_adapter.nose_plugin import nose_storage_plugin
 from fuel_plugin.ostf_adapter.nose_plugin import nose_test_runner
 from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
+from fuel_plugin.ostf_adapter.nose_plugin import worker_pool
 from fuel_plugin.ostf_adapter.storage import engine
 from fuel_plugin.ostf_adapter.storage import models
 
@@ -44,6 +46,17 @@ class InterruptTestRunException(KeyboardInterrupt):
 class NoseDriver(object):
     def __init__(self):
         LOG.warning('Initializing Nose Driver')
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = worker_pool.WorkerPool(
+                self._run_tests,
+                cfg.CONF.adapter.worker_pool_size,
+                max_runs=cfg.CONF.adapter.worker_max_runs,
+                preload_modules=cfg.CONF.adapter.worker_preload_modules)
+        return self._pool
 
     def run(self, test_run, test_set, dbpath,
             ostf_os_access_creds=None,
@@ -58,57 +71,64 @@ class NoseDriver(object):
         else:
             argv_add = [test_set.test_path] + test_set.additional_arguments
 
-        results_log = ResultsLogger(test_set.id, test_run.cluster_id)
+        # cluster data is taken from cache of adapter (requested from
+        # nailgun if it is missing) once per test run, configs of tests
+        # (shards included) read it from snapshot
+        snapshot_path = cluster_snapshot.write_snapshot(
+            test_run.cluster_id, token)
+
+        job = (dbpath,
+               test_run.id,
+               test_run.cluster_id,
+               ostf_os_access_creds,
+               argv_add,
+               token,
+               test_set.id,
+               snapshot_path)
 
-        lock_path = cfg.CONF.adapter.lock_dir
-        test_run.pid = nose_utils.run_proc(self._run_tests,
-                                           lock_path,
-                                           dbpath,
-                                           test_run.id,
-                                           test_run.cluster_id,
-                                           ostf_os_access_creds,
-                                           argv_add,
-                                           token,
-                                           results_log).pid
+        # job is sent to worker only after test run is committed
+        # (it used to be worked around with sleep, LP#1522941)
+        test_run.pid = self.pool.submit(
+            job, session=orm.object_session(test_run),
+            on_cancel=lambda: cluster_snapshot.remove_snapshot(
+                snapshot_path))
 
-    def _run_tests(self, lock_path, dbpath, test_run_id,
+    def _run_tests(self, dbpath, test_run_id,
                    cluster_id, ostf_os_access_creds, argv_add, token,
-                   results_log):
+                   test_set_id, snapshot_path=None):
         cleanup_flag = False
 
         def raise_exception_handler(signum, stack_frame):
             raise InterruptTestRunException()
         signal.signal(signal.SIGUSR1, raise_exception_handler)
 
-        # FIXME(dteselkin): add some sleep to allow process to
-        #                   initialize db before selecting data
-        #                   LP#1522941
-        time.sleep(1)
+        results_log = ResultsLogger(test_set_id, cluster_id)
 
-        with engine.contexted_session(dbpath) as session:
+        with engine.contexted_session(dbpath, pooled=True) as session:
             testrun = session.query(models.TestRun)\
                 .filter_by(id=test_run_id)\
                 .one()
 
+            def run_nose(session, argv):
+                self._run_nose(session, test_run_id, cluster_id,
+                               ostf_os_access_creds, token, results_log,
+                               argv, snapshot_path=snapshot_path)
+
             try:
-                if not os.path.exists(lock_path):
-                    LOG.error('There is no directory to store locks')
-                    raise Exception('There is no directory to store locks')
-
-                aquired_locks = []
-                for serie in testrun.test_set.exclusive_testsets:
-                    lock_name = serie + str(testrun.cluster_id)
-                    fd = open(os.path.join(lock_path, lock_name), 'w')
-                    fcntl.flock(fd, fcntl.LOCK_EX)
-                    aquired_locks.append(fd)
-
-                nose_test_runner.SilentTestProgram(
-                    addplugins=[nose_storage_plugin.StoragePlugin(
-                        session, test_run_id, str(cluster_id),
-                        ostf_os_access_creds, token, results_log
-                    )],
-                    exit=False,
-                    argv=['ostf_tests'] + argv_add)
+                # test run could be killed before handler was installed
+                if worker_pool.kill_requested():
+                    raise InterruptTestRunException()
+
+                # test runs of exclusive test sets are started by
+                # TestRun.schedule only when their series are free
+                classes = None
+                if cfg.CONF.adapter.parallel_test_classes > 1:
+                    classes = nose_utils.group_tests_by_class(argv_add)
+
+                if classes and len(classes) > 1:
+                    self._run_parallel(run_nose, session, dbpath, classes)
+                else:
+                    run_nose(session, argv_add)
 
             except InterruptTestRunException:
                 # (dshulyak) after process is interrupted we need to
@@ -126,16 +146,92 @@ class NoseDriver(object):
                 models.TestRun.update_test_run(
                     session, test_run_id, updated_data)
 
-                for fd in aquired_locks:
-                    fcntl.flock(fd, fcntl.LOCK_UN)
-                    fd.close()
-
                 if cleanup_flag:
                     self._clean_up(session,
                                    test_run_id,
                                    cluster_id,
                                    testrun.test_set.cleanup_path)
 
+                cluster_snapshot.remove_snapshot(snapshot_path)
+
+    def _run_nose(self, session, test_run_id, cluster_id,
+                  ostf_os_access_creds, token, results_log, argv,
+                  snapshot_path=None):
+        results_writer = nose_storage_plugin.ResultsWriter(
+            session, test_run_id)
+        try:
+            nose_test_runner.SilentTestProgram(
+                addplugins=[nose_storage_plugin.StoragePlugin(
+                    session, test_run_id, str(cluster_id),
+                    ostf_os_access_creds, token, results_log,
+                    results_writer=results_writer,
+                    snapshot_path=snapshot_path
+                )],
+                exit=False,
+                argv=['ostf_tests'] + argv)
+        finally:
+            # results must be in db before test run is finished
+            results_writer.close()
+
+    def _run_parallel(self, run_nose, session, dbpath, classes):
+        """Runs each test class in separate forked process, at most
+        parallel_test_classes processes at once. Serial classes are
+        run in current process after all other ones.
+        """
+        parallel = []
+        serial = []
+        for class_path, argv in classes.items():
+            if nose_utils.is_serial_test_class(class_path):
+                serial.extend(argv)
+            else:
+                parallel.append(argv)
+
+        # server ignores SIGCHLD, so finished shards must be reaped here
+        sigchld_handler = signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        shards = {}
+        try:
+            while parallel or shards:
+                while parallel and \
+                        len(shards) < cfg.CONF.adapter.parallel_test_classes:
+                    argv = parallel.pop(0)
+                    shards[self._fork_shard(run_nose, dbpath, argv)] = argv
+
+                pid, _ = os.wait()
+                shards.pop(pid, None)
+
+        except InterruptTestRunException:
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            for pid in shards:
+                try:
+                    os.kill(pid, signal.SIGUSR1)
+                    os.waitpid(pid, 0)
+                except OSError:
+                    pass
+            raise
+        finally:
+            signal.signal(signal.SIGCHLD, sigchld_handler)
+
+        if serial:
+            run_nose(session, serial)
+
+    def _fork_shard(self, run_nose, dbpath, argv):
+        pid = os.fork()
+        if pid:
+            return pid
+
+        # shard must not use connections of parent's session
+        code = 0
+        try:
+            with engine.contexted_session(dbpath, pooled=True) as session:
+                run_nose(session, argv)
+        except InterruptTestRunException:
+            pass
+        except BaseException:
+            LOG.exception('Shard of test run failed: %s', argv)
+            code = 1
+        finally:
+            os._exit(code)
+
     def kill(self, test_run):
         try:
             if test_run.pid:
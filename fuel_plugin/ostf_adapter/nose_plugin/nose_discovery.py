@@ -12,14 +12,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
 import logging
 import os
-import re
 
 from nose import plugins
+from nose import util
+import sqlalchemy as sa
 
+from fuel_plugin.ostf_adapter import mixins
 from fuel_plugin.ostf_adapter.nose_plugin import nose_test_runner
 from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
+from fuel_plugin.ostf_adapter.nose_plugin import static_discovery
 from fuel_plugin.ostf_adapter.storage import models
 
 
@@ -32,9 +37,15 @@ class DiscoveryPlugin(plugins.Plugin):
     name = 'discovery'
     score = 15000
 
-    def __init__(self, session):
+    def __init__(self, session, test_sets=None):
         self.session = session
-        self.test_sets = {}
+        self.test_sets = dict(test_sets or {})
+        self.test_sets_index = nose_utils.TestSetIndex(self.test_sets)
+
+        # discovered entities are collected in modules_test_sets and
+        # tests; they are written to db in bulk by save
+        self.modules_test_sets = collections.defaultdict(list)
+        self.tests = []
         super(DiscoveryPlugin, self).__init__()
 
     def options(self, parser, env=os.environ):
@@ -55,11 +66,6 @@ class DiscoveryPlugin(plugins.Plugin):
 
             try:
                 test_set = models.TestSet(**profile)
-                self.session.merge(test_set)
-                self.test_sets[test_set.id] = test_set
-
-                # flush test_sets data into db
-                self.session.commit()
             except Exception as e:
                 LOG.error(
                     ('An error has occured while processing'
@@ -67,47 +73,48 @@ class DiscoveryPlugin(plugins.Plugin):
                     module.__name__,
                     e.message
                 )
+                return
+
+            self.test_sets[test_set.id] = test_set
+            self.test_sets_index.add(test_set.id)
+            self.modules_test_sets[module.__name__].append(test_set.id)
             LOG.info('%s discovered.', module.__name__)
 
     @classmethod
     def test_belongs_to_testset(cls, test_id, test_set_id):
         """Checks by name if test belongs to given test set."""
-        test_set_pattern = re.compile(
-            r'(\b|_){0}(\b|_)'.format(test_set_id)
-        )
-        return bool(test_set_pattern.search(test_id))
+        return nose_utils.test_belongs_to_testset(test_id, test_set_id)
 
     def addSuccess(self, test):
         test_id = test.id()
-        for test_set_id in self.test_sets.keys():
-            if self.test_belongs_to_testset(test_id, test_set_id):
-                test_kwargs = {
-                    "title": "",
-                    "description": "",
-                    "duration": "",
-                    "deployment_tags": [],
-                    "available_since_release": "",
-                    "test_set_id": test_set_id,
-                    "name": test_id,
-                }
-
-                test_kwargs.update(nose_utils.get_description(test))
-
-                try:
-                    test_obj = models.Test(**test_kwargs)
-                    self.session.merge(test_obj)
-
-                    # flush tests data into db
-                    self.session.commit()
-                except Exception as e:
-                    LOG.error(
-                        ('An error has occured while '
-                         'processing data entity for '
-                         'test with name %s. Error message: %s'),
-                        test_id,
-                        e.message
-                    )
-                LOG.info('%s added for %s', test_id, test_set_id)
+        test_set_ids = self.test_sets_index.match(test_id)
+        if not test_set_ids:
+            return
+
+        metadata = nose_utils.get_test_metadata(test)
+        for test_set_id in sorted(test_set_ids):
+            test_kwargs = metadata.to_dict()
+            test_kwargs.update(test_set_id=test_set_id, name=test_id)
+            self.tests.append(test_kwargs)
+
+    def save(self):
+        """Writes discovered test sets and tests to db in bulk."""
+        test_sets = [self.test_sets[test_set_id]
+                     for test_set_ids in self.modules_test_sets.values()
+                     for test_set_id in test_set_ids]
+        try:
+            models.TestSet.upsert_many(self.session, test_sets)
+            models.Test.add_templates(self.session, self.tests)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            LOG.error(
+                'An error has occured while saving discovered '
+                'test sets and tests. Error message: %s', e.message)
+            return
+
+        LOG.info('%s test sets and %s tests added.',
+                 len(test_sets), len(self.tests))
 
 
 def discovery(path, session):
@@ -115,8 +122,181 @@ def discovery(path, session):
     """
     LOG.info('Starting discovery for %r.', path)
 
+    _run_discovery(session, [path]).save()
+
+
+def _file_digest(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _run_discovery(session, paths, test_sets=None, engine='nose'):
+    if engine == 'ast':
+        return static_discovery.StaticDiscovery(test_sets).discover(paths)
+
+    plugin = DiscoveryPlugin(session, test_sets=test_sets)
     nose_test_runner.SilentTestProgram(
-        addplugins=[DiscoveryPlugin(session)],
+        addplugins=[plugin],
         exit=False,
-        argv=['tests_discovery', '--collect-only', '--nocapture', path]
+        argv=['tests_discovery', '--collect-only', '--nocapture'] + paths
+    )
+    return plugin
+
+
+def _store_files(session, files, plugin):
+    for filepath, (mtime, size) in files.items():
+        module = util.getpackage(filepath)
+        session.merge(models.DiscoveredFile(
+            path=filepath,
+            module=module,
+            mtime=mtime,
+            size=size,
+            digest=_file_digest(filepath),
+            test_sets=plugin.modules_test_sets.get(module, [])
+        ))
+
+
+def _full_discovery(session, path, files, engine='nose'):
+    # testing patterns of clusters refer to test sets
+    mixins.delete_cluster_data(session)
+    session.query(models.TestSet).delete()
+    session.query(models.DiscoveredFile).delete()
+
+    plugin = _run_discovery(session, [path], engine=engine)
+
+    models.TestSet.upsert_many(
+        session, [plugin.test_sets[test_set_id]
+                  for test_set_ids in plugin.modules_test_sets.values()
+                  for test_set_id in test_set_ids])
+    models.Test.add_templates(session, plugin.tests)
+
+    _store_files(session, files, plugin)
+    session.flush()
+
+    LOG.info('Full discovery is performed for %s files.', len(files))
+
+
+def _update_tests(session, prefixes, discovered_tests):
+    """Brings template tests of modules with given names
+    in line with discovered ones.
+    """
+    discovered = dict(((test['test_set_id'], test['name']), test)
+                      for test in discovered_tests)
+
+    existing = session.query(models.Test)\
+        .filter(models.Test.test_run_id.is_(None))\
+        .filter(sa.or_(*[models.Test.name.like(prefix + '.%')
+                         for prefix in prefixes]))
+
+    for test in existing:
+        if not any(test.name.startswith(prefix + '.')
+                   for prefix in prefixes):
+            continue
+
+        data = discovered.pop((test.test_set_id, test.name), None)
+        if data is None:
+            session.delete(test)
+            continue
+
+        for key, value in data.items():
+            if getattr(test, key) != value:
+                setattr(test, key, value)
+
+    models.Test.add_templates(session, list(discovered.values()))
+
+
+def incremental_discovery(path, session, engine='nose'):
+    """Discovers tests on provided path inspecting only files
+    changed since previous discovery and updates db with the difference.
+    Files are compared by mtime and size first and by digest of content
+    if they differ. Data of clusters is deleted if anything is changed,
+    as their testing patterns depend on discovered tests.
+
+    :param engine: 'nose' to import test modules and collect tests
+                   with nose or 'ast' to read them from sources
+    :returns: True if any test set or test could have changed.
+    """
+    root = nose_utils.discovery_root(path)
+    files = nose_utils.collect_test_files(root)
+    manifest = dict((entry.path, entry)
+                    for entry in session.query(models.DiscoveredFile))
+
+    if not manifest:
+        _full_discovery(session, path, files, engine)
+        return True
+
+    changed = []
+    for filepath, (mtime, size) in files.items():
+        entry = manifest.get(filepath)
+        if entry is not None and (entry.mtime, entry.size) == (mtime, size):
+            continue
+        if entry is not None and entry.digest == _file_digest(filepath):
+            entry.mtime, entry.size = mtime, size
+            continue
+        changed.append(filepath)
+
+    removed = [manifest[filepath] for filepath in manifest
+               if filepath not in files]
+
+    if not changed and not removed:
+        LOG.info('Discovery is skipped, %s files are not changed.',
+                 len(files))
+        return False
+
+    # whole package is rediscovered if its __init__ is changed
+    candidates = sorted(
+        (os.path.dirname(filepath)
+         if os.path.basename(filepath) == '__init__.py' else filepath)
+        for filepath in changed
+    )
+    targets = []
+    for candidate in sorted(candidates, key=len):
+        if not any(candidate.startswith(target + os.sep)
+                   for target in targets):
+            targets.append(candidate)
+
+    covered = dict(
+        (filepath, stat) for filepath, stat in files.items()
+        if any(filepath == target or filepath.startswith(target + os.sep)
+               for target in targets)
     )
+
+    old_test_sets = set()
+    for filepath in covered:
+        if filepath in manifest:
+            old_test_sets.update(manifest[filepath].test_sets or [])
+    for entry in removed:
+        old_test_sets.update(entry.test_sets or [])
+
+    existing_test_sets = dict((test_set.id, test_set)
+                              for test_set in session.query(models.TestSet))
+    plugin = _run_discovery(session, targets, existing_test_sets, engine)
+
+    new_test_sets = set()
+    for test_set_ids in plugin.modules_test_sets.values():
+        new_test_sets.update(test_set_ids)
+
+    if old_test_sets != new_test_sets:
+        # tests are bound to test sets by names, so tests of any
+        # module could be affected by added or removed test set
+        _full_discovery(session, path, files, engine)
+        return True
+
+    for test_set_id in new_test_sets:
+        session.merge(plugin.test_sets[test_set_id])
+
+    prefixes = [util.getpackage(target) for target in targets] + \
+        [removed_entry.module for removed_entry in removed]
+    _update_tests(session, prefixes, plugin.tests)
+
+    for entry in removed:
+        session.delete(entry)
+    _store_files(session, covered, plugin)
+
+    # testing patterns of clusters depend on discovered tests
+    mixins.delete_cluster_data(session)
+    session.flush()
+
+    LOG.info('Discovery is performed for %s changed and %s removed files.',
+             len(changed), len(removed))
+    return True
@@ -12,8 +12,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import logging
 import os
+import threading
 import time
 
 from nose import plugins
@@ -30,6 +32,111 @@ CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
 
+# number of attempts to write pending results when writer is closed
+CLOSE_ATTEMPTS = 3
+
+
+class ResultsWriter(object):
+    """Writes results of test run's tests to db in batches.
+
+    Ids of tests are resolved by their names once on creation.
+    Results are coalesced by test (only the latest one is written)
+    and are flushed by background thread every flush_interval
+    seconds with single executemany statement. If flush_interval
+    is 0 results are written as soon as they are added. Results
+    which failed to be written are kept pending and are written
+    by next flush.
+    """
+
+    def __init__(self, session, test_run_id, flush_interval=None):
+        if flush_interval is None:
+            flush_interval = CONF.adapter.results_flush_interval
+
+        self.engine = session.get_bind()
+        self.test_run_id = test_run_id
+        self.flush_interval = flush_interval
+        self.tests_ids = models.Test.get_tests_ids(session, test_run_id)
+
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        if self.flush_interval > 0:
+            self._thread = threading.Thread(target=self._flush_loop)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def add(self, test_name, data):
+        test_id = self.tests_ids.get(test_name)
+        if test_id is None:
+            LOG.warning('Test %s is not found in test run %s',
+                        test_name, self.test_run_id)
+            return
+
+        result = dict(data, test_id=test_id)
+        with self._lock:
+            self._pending.pop(test_id, None)
+            self._pending[test_id] = result
+
+        if self._thread is None:
+            self.try_flush()
+
+    def flush(self):
+        """Writes pending results, raises error of db if they
+        could not be written.
+        """
+        # serialize flushes so older results never overwrite newer ones
+        with self._flush_lock:
+            with self._lock:
+                results = list(self._pending.values())
+                self._pending.clear()
+
+            if not results:
+                return
+
+            try:
+                with self.engine.begin() as connection:
+                    models.Test.add_results(connection, results)
+            except Exception:
+                # results added since flush has started are newer
+                with self._lock:
+                    for result in results:
+                        self._pending.setdefault(result['test_id'], result)
+                raise
+
+    def close(self):
+        """Stops background flushing and writes all pending results.
+        Raises error of the last attempt if they could not be written.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        for attempt in range(1, CLOSE_ATTEMPTS):
+            if self.try_flush():
+                return
+            time.sleep(attempt)
+        self.flush()
+
+    def try_flush(self):
+        """Same as flush but logs error instead of raising it.
+        Returns whether pending results were written.
+        """
+        try:
+            self.flush()
+        except Exception:
+            LOG.exception('Failed to write results of test run %s',
+                          self.test_run_id)
+            return False
+        return True
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.try_flush()
+
 
 class StoragePlugin(plugins.Plugin):
     enabled = True
@@ -37,17 +144,21 @@ class StoragePlugin(plugins.Plugin):
     score = 15000
 
     def __init__(self, session, test_run_id, cluster_id,
-                 ostf_os_access_creds, token, results_log):
+                 ostf_os_access_creds, token, results_log,
+                 results_writer=None, snapshot_path=None):
 
         self.session = session
         self.test_run_id = test_run_id
         self.cluster_id = cluster_id
         self.ostf_os_access_creds = ostf_os_access_creds
         self.results_log = results_log
+        self.results_writer = results_writer or \
+            ResultsWriter(session, test_run_id)
 
         super(StoragePlugin, self).__init__()
         self._start_time = None
         self.token = token
+        self.snapshot_path = snapshot_path
 
     def options(self, parser, env=os.environ):
         env['NAILGUN_HOST'] = str(CONF.adapter.nailgun_host)
@@ -56,6 +167,11 @@ class StoragePlugin(plugins.Plugin):
             env['NAILGUN_TOKEN'] = self.token
         if self.cluster_id:
             env['CLUSTER_ID'] = str(self.cluster_id)
+        # snapshot of previous test run must not be used by worker
+        if self.snapshot_path is not None:
+            env['NAILGUN_SNAPSHOT'] = self.snapshot_path
+        else:
+            env.pop('NAILGUN_SNAPSHOT', None)
 
         for var_name in self.ostf_os_access_creds:
             env[var_name.upper()] = self.ostf_os_access_creds[var_name]
@@ -63,17 +179,15 @@ class StoragePlugin(plugins.Plugin):
     def configure(self, options, conf):
         self.conf = conf
 
+    def finalize(self, result):
+        self.results_writer.try_flush()
+
     def _add_test_results(self, test, data):
         test_id = test.id()
 
-        models.Test.add_result(
-            self.session,
-            self.test_run_id,
-            test_id,
-            data
-        )
+        self.results_writer.add(test_id, data)
         if data['status'] != 'running':
-            test_name = nose_utils.get_description(test)["title"]
+            test_name = nose_utils.get_test_metadata(test).title
             self.results_log.log_results(
                 test_id,
                 test_name=test_name,
@@ -104,7 +218,6 @@ class StoragePlugin(plugins.Plugin):
 
         for test in tests_to_update:
             self._add_test_results(test, data)
-        self.session.commit()
 
     def addSuccess(self, test, capt=None):
         self._add_message(test, status='success')
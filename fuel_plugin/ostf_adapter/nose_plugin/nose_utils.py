@@ -12,8 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 from distutils import version
-import itertools
+import importlib
 import logging
 import multiprocessing
 import os
@@ -21,6 +22,8 @@ import re
 import traceback
 
 from nose import case
+from nose import config
+from nose import selector
 from nose.suite import ContextSuite
 
 try:
@@ -50,8 +53,21 @@ def get_exc_message(exception_value):
     return u""
 
 
+DEPLOYMENT_TAGS_PATTERN = re.compile(r'Deployment tags:.?(?P<tags>.+)?')
+RELEASE_PATTERN = re.compile(r'Available since release:.?(?P<rel_vers>.+)')
+DURATION_PATTERN = re.compile(r'Duration:.?(?P<duration>.+)')
+
+DURATION_VALUE_PATTERN = re.compile(
+    r'^\s*(?P<value>\d+(\.\d+)?)\s*(?P<unit>[a-z]*)\.?\s*$', re.I)
+DURATION_UNITS = {
+    '': 1, 's': 1, 'sec': 1, 'secs': 1, 'second': 1, 'seconds': 1,
+    'm': 60, 'min': 60, 'mins': 60, 'minute': 60, 'minutes': 60,
+    'h': 3600, 'hour': 3600, 'hours': 3600,
+}
+
+
 def _process_docstring(docstring, pattern):
-    pattern_matcher = re.search(pattern, docstring)
+    pattern_matcher = pattern.search(docstring)
 
     if pattern_matcher:
         value = pattern_matcher.group(1)
@@ -63,57 +79,199 @@ def _process_docstring(docstring, pattern):
     return docstring, value
 
 
-def get_description(test_obj):
-    """Parses docstring of test object in order
-    to get necessary data.
+def parse_duration(duration):
+    """Converts duration from docstring of test (e.g. '20 s.',
+    '5sec', '2 min') to number of seconds or None if it is unknown.
+    """
+    matcher = DURATION_VALUE_PATTERN.match(duration or '')
+    if matcher is None:
+        return None
+
+    multiplier = DURATION_UNITS.get(matcher.group('unit').lower())
+    if multiplier is None:
+        return None
+    return float(matcher.group('value')) * multiplier
+
+
+class TestMetadata(collections.namedtuple(
+        'TestMetadata', ('title', 'description', 'duration',
+                         'duration_seconds', 'deployment_tags',
+                         'available_since_release'))):
+    """Data of test parsed from its docstring."""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Returns metadata as kwargs of Test model."""
+        data = dict(self._asdict())
+        data['deployment_tags'] = list(self.deployment_tags)
+        return data
+
+
+EMPTY_METADATA = TestMetadata(
+    title="",
+    description="",
+    duration="",
+    duration_seconds=None,
+    deployment_tags=(),
+    available_since_release="",
+)
+
+
+def parse_docstring(docstring):
+    """Parses docstring of test method into TestMetadata."""
+    if not docstring:
+        return EMPTY_METADATA
+
+    docstring, deployment_tags = _process_docstring(
+        docstring,
+        DEPLOYMENT_TAGS_PATTERN
+    )
+
+    # if deployment tags is empty or absent
+    # _process_docstring returns None
+    if deployment_tags:
+        deployment_tags = tuple(
+            tag.strip().lower() for tag in deployment_tags.split(',')
+        )
+
+    docstring, rel_vers = _process_docstring(
+        docstring,
+        RELEASE_PATTERN
+    )
+
+    docstring, duration = _process_docstring(
+        docstring,
+        DURATION_PATTERN
+    )
+
+    docstring = docstring.split('\n')
+    title = docstring.pop(0)
+
+    return TestMetadata(
+        title=title,
+        description=u'\n'.join(docstring) if docstring else u"",
+        duration=duration or "",
+        duration_seconds=parse_duration(duration),
+        deployment_tags=deployment_tags or (),
+        available_since_release=rel_vers or "",
+    )
+
+
+# metadata of test methods keyed by test class and method name
+_METADATA_CACHE = {}
+
+
+def get_test_metadata(test_obj):
+    """Returns TestMetadata of nose test. Docstring of test method
+    is parsed once per process.
 
     test_obj.test._testMethodDoc is using directly
     instead of calling test_obj.shortDescription()
     for the sake of compability with python 2.6 where
     this method works pretty buggy.
     """
-    if isinstance(test_obj, case.Test):
-        docstring = test_obj.test._testMethodDoc
-
-        test_data = {}
-        if docstring:
-            deployment_tags_pattern = r'Deployment tags:.?(?P<tags>.+)?'
-            docstring, deployment_tags = _process_docstring(
-                docstring,
-                deployment_tags_pattern
-            )
-
-            # if deployment tags is empty or absent
-            # _process_docstring returns None so we
-            # must check this and prevent
-            if deployment_tags:
-                deployment_tags = [
-                    tag.strip().lower() for tag in deployment_tags.split(',')
-                ]
-                test_data['deployment_tags'] = deployment_tags
-
-            rel_vers_pattern = "Available since release:.?(?P<rel_vers>.+)"
-            docstring, rel_vers = _process_docstring(
-                docstring,
-                rel_vers_pattern
-            )
-            if rel_vers:
-                test_data["available_since_release"] = rel_vers
-
-            duration_pattern = r'Duration:.?(?P<duration>.+)'
-            docstring, duration = _process_docstring(
-                docstring,
-                duration_pattern
-            )
-            if duration:
-                test_data['duration'] = duration
-
-            docstring = docstring.split('\n')
-            test_data['title'] = docstring.pop(0)
-            test_data['description'] = \
-                u'\n'.join(docstring) if docstring else u""
-
-    return test_data
+    if not isinstance(test_obj, case.Test):
+        return EMPTY_METADATA
+
+    test = test_obj.test
+    key = (type(test), getattr(test, '_testMethodName', None))
+    metadata = _METADATA_CACHE.get(key)
+    if metadata is None:
+        metadata = parse_docstring(getattr(test, '_testMethodDoc', None))
+        _METADATA_CACHE[key] = metadata
+    return metadata
+
+
+def get_description(test_obj):
+    """Returns data parsed from docstring of test object as dict."""
+    return get_test_metadata(test_obj).to_dict()
+
+
+def test_belongs_to_testset(test_id, test_set_id):
+    """Checks by name if test belongs to given test set."""
+    test_set_pattern = re.compile(
+        r'(\b|_){0}(\b|_)'.format(test_set_id)
+    )
+    return bool(test_set_pattern.search(test_id))
+
+
+class TestSetIndex(object):
+    """Index of test set ids which finds all test sets test belongs
+    to (in terms of test_belongs_to_testset) in one pass over test id.
+
+    Test set id may match only substring of test id which starts and
+    ends at separator ('_' or non-word character), so only such
+    substrings are looked up. Ids which are not plain identifiers
+    are matched with regular expressions.
+    """
+
+    _separator = re.compile(r'[\W_]')
+    _plain_id = re.compile(r'^[^\W_](\w*[^\W_])?$')
+
+    def __init__(self, test_set_ids=()):
+        self.ids = set()
+        self.patterns = {}
+        for test_set_id in test_set_ids:
+            self.add(test_set_id)
+
+    def add(self, test_set_id):
+        if self._plain_id.match(test_set_id):
+            self.ids.add(test_set_id)
+        else:
+            self.patterns[test_set_id] = re.compile(
+                r'(\b|_){0}(\b|_)'.format(test_set_id))
+
+    def match(self, test_id):
+        """Returns set of ids of test sets test belongs to."""
+        separators = [m.start() for m in self._separator.finditer(test_id)]
+        starts = [0] + [pos + 1 for pos in separators]
+        ends = separators + [len(test_id)]
+
+        matched = set()
+        for start in starts:
+            for end in ends:
+                if end > start and test_id[start:end] in self.ids:
+                    matched.add(test_id[start:end])
+
+        for test_set_id, pattern in self.patterns.items():
+            if pattern.search(test_id):
+                matched.add(test_set_id)
+
+        return matched
+
+
+def discovery_root(path):
+    """Returns directory which is inspected when discovery is performed
+    with given path (path may also be name of package).
+    """
+    if os.path.isdir(path):
+        return os.path.abspath(path)
+    module = importlib.import_module(path)
+    return os.path.dirname(os.path.abspath(module.__file__))
+
+
+def collect_test_files(root):
+    """Returns dict of path to (mtime, size) of modules and packages
+    which nose inspects on discovery in given directory.
+    """
+    file_selector = selector.Selector(config.Config())
+    files = {}
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            dirname for dirname in dirnames
+            if file_selector.wantDirectory(os.path.join(dirpath, dirname))
+        ]
+
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            if filename == '__init__.py' or \
+                    file_selector.wantFile(filepath):
+                stat = os.stat(filepath)
+                files[filepath] = (stat.st_mtime, stat.st_size)
+
+    return files
 
 
 def modify_test_name_for_nose(test_path):
@@ -121,6 +279,36 @@ def modify_test_name_for_nose(test_path):
     return '{0}:{1}.{2}'.format(test_module, test_class, test_method)
 
 
+def group_tests_by_class(argv):
+    """Groups nose names of tests (module:Class.method) by
+    their classes preserving order of argv.
+
+    :returns: OrderedDict of 'module:Class' to names of its tests
+              or None if argv contains anything except names of tests.
+    """
+    classes = collections.OrderedDict()
+    for name in argv:
+        if ':' not in name:
+            return None
+        test_module, test_path = name.split(':', 1)
+        test_class = '{0}:{1}'.format(test_module, test_path.split('.')[0])
+        classes.setdefault(test_class, []).append(name)
+    return classes
+
+
+def is_serial_test_class(class_path):
+    """Checks whether test class declares that it must not run
+    in parallel with other classes (has true 'serial' attribute).
+    """
+    test_module, test_class = class_path.split(':', 1)
+    try:
+        module = importlib.import_module(test_module)
+        return bool(getattr(getattr(module, test_class), 'serial', False))
+    except Exception:
+        LOG.exception('Failed to import test class %s', class_path)
+        return True
+
+
 def format_exception(exc_info):
     ec, ev, tb = exc_info
 
@@ -179,62 +367,102 @@ def get_tests_to_update(test):
     return tests
 
 
+def _release_version_key(release_part):
+    """Converts part of release version to tuple which
+    is ordered in the same way as StrictVersion objects.
+    """
+    parsed = version.StrictVersion(release_part)
+    if parsed.prerelease:
+        return parsed.version + (0,) + parsed.prerelease
+    return parsed.version + (1,)
+
+
+def parse_release_version(release_version):
+    """Parses release version (e.g. '2015.2-6.0') into pair
+    of comparable keys for openstack and fuel versions.
+    """
+    openstack_ver, fuel_ver = release_version.split('-')
+    return (_release_version_key(openstack_ver),
+            _release_version_key(fuel_ver))
+
+
+class AvailabilityCondition(object):
+    """Compiled form of deployment tags and 'available_since_release'
+    attribute of test entity (testset or test).
+
+    Deployment tags are stored in conjunctive normal form: every tag
+    is a clause of alternatives separated with '|', and each clause
+    must have at least one alternative present in cluster tags.
+    """
+
+    __slots__ = ('tags_clauses', 'since_release')
+
+    def __init__(self, deployment_tags, available_since_release):
+        self.tags_clauses = tuple(
+            frozenset(alt_tag.strip() for alt_tag in tag.split('|'))
+            for tag in deployment_tags or []
+        )
+
+        self.since_release = None
+        if available_since_release:
+            self.since_release = parse_release_version(
+                available_since_release)
+
+    def is_satisfied(self, cluster_tags, cluster_release):
+        """Checks condition against cluster data compiled by
+        compile_cluster_data function.
+        """
+        if self.since_release is not None:
+            if cluster_release is None:
+                return False
+            for cluster_part, test_part in zip(cluster_release,
+                                               self.since_release):
+                if cluster_part < test_part:
+                    return False
+
+        for clause in self.tags_clauses:
+            if clause.isdisjoint(cluster_tags):
+                return False
+
+        return True
+
+
+def compile_availability(test_entity_data):
+    return AvailabilityCondition(
+        test_entity_data['deployment_tags'],
+        test_entity_data['available_since_release']
+    )
+
+
+def compile_cluster_data(cluster_data):
+    """Returns cluster deployment tags and parsed release version
+    in form expected by AvailabilityCondition.is_satisfied.
+    """
+    release_version = cluster_data.get('release_version')
+    if release_version:
+        release_version = parse_release_version(release_version)
+
+    return frozenset(cluster_data['deployment_tags']), release_version
+
+
 def _process_deployment_tags(cluster_depl_tags, test_depl_tags):
     """Process alternative deployment tags for testsets and tests
     and determines whether current test entity (testset or test)
     is appropriate for cluster.
     """
-
-    test_depl_tags = [
-        [alt_tag.strip() for alt_tag in tag.split('|')]
-        for tag in test_depl_tags
-    ]
-
-    for comb in itertools.product(*test_depl_tags):
-        if set(comb).issubset(cluster_depl_tags):
-            return True
-
-    return False
+    condition = AvailabilityCondition(test_depl_tags, None)
+    return condition.is_satisfied(cluster_depl_tags, None)
 
 
 def _compare_release_versions(cluster_release_version, test_release_version):
-    cl_openstack_ver, cl_fuel_ver = cluster_release_version.split('-')
-    test_openstack_ver, test_fuel_ver = test_release_version.split('-')
-
-    cond = (
-        (version.StrictVersion(cl_openstack_ver) >=
-         version.StrictVersion(test_openstack_ver))
-        and
-        (version.StrictVersion(cl_fuel_ver) >=
-         version.StrictVersion(test_fuel_ver))
-    )
-    return cond
+    condition = AvailabilityCondition([], test_release_version)
+    return condition.is_satisfied(
+        frozenset(), parse_release_version(cluster_release_version))
 
 
 def is_test_available(cluster_data, test_entity_data):
-    is_test_available = False
-    is_rel_ver_suitable = False
-
-    # if 'available_since_release' attritube of test entity
-    # is empty then this test entity is available for cluster
-    # in other case execute release comparator logic
-    if not test_entity_data['available_since_release']:
-        is_rel_ver_suitable = True
-    else:
-        is_rel_ver_suitable = _compare_release_versions(
-            cluster_data['release_version'],
-            test_entity_data['available_since_release']
-        )
-
-    # if release version of test entity is suitable for cluster
-    # then check test entity compatibility with cluster
-    # by deployment tags
-    if is_rel_ver_suitable:
-        is_depl_tags_suitable = _process_deployment_tags(
-            cluster_data['deployment_tags'],
-            test_entity_data['deployment_tags']
-        )
-        if is_depl_tags_suitable:
-            is_test_available = True
+    condition = test_entity_data.get('availability')
+    if condition is None:
+        condition = compile_availability(test_entity_data)
 
-    return is_test_available
+    return condition.is_satisfied(*compile_cluster_data(cluster_data))
@@ -0,0 +1,345 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Discovery of test sets and tests which reads sources of test
+modules with ast instead of importing them.
+
+It follows rules of nose collection: classes (including imported ones)
+of test-like modules which are subclasses of TestCase and their methods
+matching testMatch are collected. Base classes are looked up in sources
+of modules found on sys.path. Unlike nose, __profile__ must be literal
+and module-level test functions are not collected.
+"""
+
+import ast
+import collections
+import logging
+import os
+import re
+import sys
+
+from nose import config
+from nose import util
+
+from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
+from fuel_plugin.ostf_adapter.storage import models
+
+
+LOG = logging.getLogger(__name__)
+
+TEST_CASE_CLASSES = frozenset([
+    'unittest.TestCase',
+    'unittest.case.TestCase',
+    'unittest2.TestCase',
+    'unittest2.case.TestCase',
+    'testtools.TestCase',
+    'testtools.testcase.TestCase',
+    'testresources.ResourcedTestCase',
+])
+
+# marks base class which is known to be TestCase
+TEST_CASE = object()
+
+
+def find_module_file(module_name):
+    """Looks up source file of module on sys.path without importing it."""
+    parts = module_name.split('.')
+    for entry in sys.path:
+        base = os.path.join(entry or os.curdir, *parts)
+        for filepath in (base + '.py', os.path.join(base, '__init__.py')):
+            if os.path.isfile(filepath):
+                return os.path.abspath(filepath)
+    return None
+
+
+def _dotted_name(node):
+    """Returns dotted name of Name or Attribute node or None."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        if value is not None:
+            return '{0}.{1}'.format(value, node.attr)
+    return None
+
+
+class ClassInfo(object):
+    """Class statically defined in module."""
+
+    def __init__(self, module, node):
+        self.module = module
+        self.name = node.name
+        self.bases = [_dotted_name(base) for base in node.bases]
+        self.declared_test = None
+        self.methods = collections.OrderedDict()
+
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef):
+                self.methods[item.name] = ast.get_docstring(item,
+                                                            clean=False)
+            elif isinstance(item, ast.Assign):
+                if any(isinstance(target, ast.Name) and
+                       target.id == '__test__' for target in item.targets):
+                    try:
+                        self.declared_test = bool(
+                            ast.literal_eval(item.value))
+                    except ValueError:
+                        pass
+
+
+class ModuleInfo(object):
+    """Profile, classes and imported names of module read from
+    its source.
+    """
+
+    def __init__(self, name, filepath):
+        self.name = name
+        self.filepath = filepath
+        self.profile = None
+        self.classes = {}
+        self.names = {}
+
+        is_package = os.path.basename(filepath) == '__init__.py'
+        self.package = name if is_package else name.rpartition('.')[0]
+
+        with open(filepath, 'rb') as f:
+            tree = ast.parse(f.read(), filepath)
+
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = ClassInfo(self, node)
+                self.names.pop(node.name, None)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.names[alias.asname] = alias.name
+                    else:
+                        head = alias.name.split('.')[0]
+                        self.names[head] = head
+            elif isinstance(node, ast.ImportFrom):
+                source = self._import_source(node)
+                for alias in node.names:
+                    local_name = alias.asname or alias.name
+                    self.names[local_name] = \
+                        '{0}.{1}'.format(source, alias.name)
+                    self.classes.pop(local_name, None)
+            elif isinstance(node, ast.Assign):
+                if any(isinstance(target, ast.Name) and
+                       target.id == '__profile__' for target in node.targets):
+                    try:
+                        self.profile = ast.literal_eval(node.value)
+                    except ValueError:
+                        LOG.error('__profile__ of %s is not literal',
+                                  self.name)
+
+    def _import_source(self, node):
+        if not node.level:
+            return node.module
+
+        package = self.package.split('.')
+        if node.level > 1:
+            package = package[:-(node.level - 1)]
+        if node.module:
+            package.append(node.module)
+        return '.'.join(package)
+
+
+class StaticDiscovery(object):
+    """Collects test sets and tests in the same form as DiscoveryPlugin
+    does.
+    """
+
+    def __init__(self, test_sets=None):
+        self.test_sets = dict(test_sets or {})
+        self.modules_test_sets = collections.defaultdict(list)
+        self.tests = []
+
+        self._test_match = re.compile(config.Config().testMatch)
+        self._modules = {}
+
+    def _load(self, module_name, filepath=None):
+        if module_name not in self._modules:
+            filepath = filepath or find_module_file(module_name)
+            module = None
+            if filepath is not None:
+                try:
+                    module = ModuleInfo(module_name, filepath)
+                except (IOError, SyntaxError) as e:
+                    LOG.error('Failed to parse %s: %s', filepath, e)
+            self._modules[module_name] = module
+        return self._modules[module_name]
+
+    def _resolve_name(self, module, name, seen):
+        """Resolves dotted name used in module to ClassInfo,
+        TEST_CASE or None.
+        """
+        if name is None or (module.name, name) in seen:
+            return None
+        seen.add((module.name, name))
+
+        head, _, rest = name.partition('.')
+        if not rest and head in module.classes:
+            return module.classes[head]
+
+        if head not in module.names:
+            return None
+
+        reference = module.names[head] + ('.' + rest if rest else '')
+        if reference in TEST_CASE_CLASSES:
+            return TEST_CASE
+
+        # implicit relative import of python 2
+        if module.package:
+            relative = '{0}.{1}'.format(module.package, reference)
+            if find_module_file(relative.rpartition('.')[0]) is not None:
+                reference = relative
+
+        module_name, _, class_name = reference.rpartition('.')
+        if not module_name or self._load(module_name) is None:
+            return None
+        return self._resolve_name(self._load(module_name), class_name, seen)
+
+    def _linearize(self, class_info, seen=None):
+        """Returns C3 linearization of class and flag whether
+        it is subclass of TestCase.
+        """
+        seen = seen or set()
+        sequences = []
+        is_test_case = False
+
+        for base in class_info.bases:
+            resolved = self._resolve_name(class_info.module, base, set())
+            if resolved is TEST_CASE:
+                is_test_case = True
+            elif resolved is not None and resolved not in seen:
+                mro, base_is_test_case = self._linearize(
+                    resolved, seen | set([class_info]))
+                is_test_case = is_test_case or base_is_test_case
+                sequences.append(mro)
+        sequences.append([seq[0] for seq in sequences])
+
+        mro = [class_info]
+        sequences = [list(seq) for seq in sequences if seq]
+        while sequences:
+            for seq in sequences:
+                head = seq[0]
+                if not any(head in other[1:] for other in sequences):
+                    break
+            else:
+                LOG.error('Inconsistent hierarchy of %s.%s',
+                          class_info.module.name, class_info.name)
+                break
+            mro.append(head)
+            for seq in sequences:
+                if seq[0] is head:
+                    del seq[0]
+            sequences = [seq for seq in sequences if seq]
+
+        return mro, is_test_case
+
+    def _wanted_methods(self, mro):
+        methods = {}
+        for class_info in reversed(mro):
+            methods.update(class_info.methods)
+
+        names = sorted(
+            name for name in methods
+            if not name.startswith('_') and self._test_match.search(name)
+        )
+        if not names and 'runTest' in methods:
+            names = ['runTest']
+        return [(name, methods[name]) for name in names]
+
+    def _module_classes(self, module):
+        classes = list(module.classes.values())
+        for name in module.names:
+            resolved = self._resolve_name(module, name, set())
+            if isinstance(resolved, ClassInfo):
+                classes.append(resolved)
+        return sorted(classes, key=lambda class_info: class_info.name)
+
+    def _inspect(self, module_name, filepath):
+        module = self._load(module_name, filepath)
+        if module is None:
+            return []
+
+        LOG.info('Inspecting %s', filepath)
+        if module.profile is not None:
+            profile = dict(module.profile)
+            profile['deployment_tags'] = [
+                tag.lower() for tag in profile.get('deployment_tags', [])
+            ]
+            test_set = models.TestSet(**profile)
+            self.test_sets[test_set.id] = test_set
+            self.modules_test_sets[module_name].append(test_set.id)
+
+        if not self._test_match.search(module_name.split('.')[-1]):
+            return []
+
+        test_ids = []
+        for class_info in self._module_classes(module):
+            mro, is_test_case = self._linearize(class_info)
+            wanted = class_info.declared_test
+            if wanted is None:
+                wanted = is_test_case and not class_info.name.startswith('_')
+            if not wanted:
+                continue
+
+            for name, docstring in self._wanted_methods(mro):
+                test_ids.append(('{0}.{1}.{2}'.format(
+                    module_name, class_info.name, name), docstring))
+        return test_ids
+
+    def discover(self, paths):
+        """Inspects modules in given paths (directories, files or
+        names of packages) and returns self.
+        """
+        files = set()
+        for path in paths:
+            if os.path.isfile(path):
+                files.add(os.path.abspath(path))
+            else:
+                files.update(nose_utils.collect_test_files(
+                    nose_utils.discovery_root(path)))
+
+        test_ids = []
+        for filepath in sorted(files):
+            test_ids.extend(self._inspect(util.getpackage(filepath),
+                                          filepath))
+
+        test_sets_index = nose_utils.TestSetIndex(self.test_sets)
+        for test_id, docstring in test_ids:
+            test_set_ids = test_sets_index.match(test_id)
+            if not test_set_ids:
+                continue
+
+            metadata = nose_utils.parse_docstring(docstring)
+            for test_set_id in sorted(test_set_ids):
+                test_kwargs = metadata.to_dict()
+                test_kwargs.update(test_set_id=test_set_id, name=test_id)
+                self.tests.append(test_kwargs)
+
+        return self
+
+
+def discovery(path, session):
+    """Discovers all tests on provided path without importing
+    test modules and saves info in db.
+    """
+    LOG.info('Starting static discovery for %r.', path)
+
+    result = StaticDiscovery().discover([path])
+    models.TestSet.upsert_many(session, result.test_sets.values())
+    models.Test.add_templates(session, result.tests)
+    session.commit()
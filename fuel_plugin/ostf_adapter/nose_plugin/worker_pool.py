@@ -0,0 +1,318 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import importlib
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import time
+
+from sqlalchemy import event
+
+
+LOG = logging.getLogger(__name__)
+
+READY = 'ready'
+
+# time in seconds job waits for starting worker of pool
+# before single-use worker is forked for it
+READY_TIMEOUT = 5
+
+# whether SIGUSR1 (kill of test run) was received by worker after it
+# reported readiness, but before job installed its own handler
+_kill_pending = False
+
+
+def _record_kill(signum, stack_frame):
+    global _kill_pending
+    _kill_pending = True
+
+
+def kill_requested():
+    """Returns true if job was killed before it installed its own
+    handler of SIGUSR1. Job is expected to check it right after
+    installing the handler.
+    """
+    global _kill_pending
+    killed, _kill_pending = _kill_pending, False
+    return killed
+
+
+def _run_job(target, job):
+    """Executes job in child process forked from worker and waits
+    for it. State changed by job (environment, caches and pools
+    of modules) belongs to the child, so it never leaks to next
+    jobs of the worker. SIGUSR1 received by worker (kill of test
+    run) is forwarded to the child, kill received before the child
+    is forked is inherited by it (see kill_requested).
+    """
+    pid = os.fork()
+    if pid == 0:
+        # kill is recorded until job installs its own handler
+        signal.signal(signal.SIGUSR1, _record_kill)
+        code = 0
+        try:
+            target(*job)
+        except KeyboardInterrupt:
+            LOG.warning('Job of worker was interrupted')
+        except BaseException:
+            LOG.exception('Job of worker failed')
+            code = 1
+        finally:
+            os._exit(code)
+
+    def forward_signal(signum, stack_frame):
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+
+    signal.signal(signal.SIGUSR1, forward_signal)
+    try:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except OSError as e:
+                if e.errno != errno.EINTR:
+                    raise
+    finally:
+        signal.signal(signal.SIGUSR1, _record_kill)
+
+
+def _worker_loop(conn, target, max_runs, preload_modules):
+    """Main loop of worker process. Worker reports readiness through
+    the pipe, then executes jobs received from it one by one, each
+    job in its own forked child.
+    """
+    global _kill_pending
+
+    # kill of test run must not affect idle worker, it is recorded
+    # for job the worker is reserved for
+    signal.signal(signal.SIGUSR1, _record_kill)
+    # server ignores SIGCHLD, children of jobs must be waited for
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    for module_name in preload_modules:
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            LOG.exception('Failed to preload module %s', module_name)
+
+    runs = 0
+    while not max_runs or runs < max_runs:
+        # kill received before readiness belongs to previous job
+        _kill_pending = False
+        conn.send(READY)
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+
+        if job is None:
+            break
+
+        try:
+            _run_job(target, job)
+        except Exception:
+            LOG.exception('Job of worker failed')
+
+        runs += 1
+
+    conn.close()
+
+
+class Worker(object):
+    """Parent side of worker process."""
+
+    def __init__(self, target, max_runs=0, preload_modules=()):
+        self.conn, child_conn = multiprocessing.Pipe()
+
+        proc = multiprocessing.Process(
+            target=_worker_loop,
+            args=(child_conn, target, max_runs, preload_modules))
+        proc.daemon = True
+        proc.start()
+
+        # end of pipe is closed by parent in order to get EOF
+        # as soon as worker exits
+        child_conn.close()
+
+        self.pid = proc.pid
+        self.ready = False
+        # whether job was sent and worker has not finished it yet
+        self.busy = False
+        self.alive = True
+        self.runs_left = max_runs or None
+
+    def poll(self):
+        """Reads messages sent by worker without blocking."""
+        try:
+            while self.alive and self.conn.poll():
+                if self.conn.recv() == READY:
+                    self.ready = True
+                    self.busy = False
+        except (EOFError, IOError):
+            self.alive = False
+            self.ready = False
+            self.conn.close()
+
+    @property
+    def exhausted(self):
+        """Whether worker exits after job it is executing."""
+        return self.runs_left == 0
+
+    def send(self, job):
+        self.ready = False
+        self.busy = job is not None
+        if self.busy and self.runs_left is not None:
+            self.runs_left -= 1
+        self.conn.send(job)
+
+
+class WorkerPool(object):
+    """Pool of long-lived processes executing jobs with target function.
+
+    Workers are forked in advance (with preloaded modules) and fork
+    child for every job, they are recycled after max_runs jobs. Job
+    waits at most ready_timeout seconds for worker which is starting
+    (preloading modules); if all workers of the pool are busy
+    single-use worker is forked for the job.
+    """
+
+    def __init__(self, target, size, max_runs=0, preload_modules=(),
+                 ready_timeout=READY_TIMEOUT):
+        self.target = target
+        self.size = size
+        self.max_runs = max_runs
+        self.preload_modules = list(preload_modules)
+        self.ready_timeout = ready_timeout
+        self.workers = []
+
+    def _fork(self, max_runs):
+        return Worker(self.target, max_runs, self.preload_modules)
+
+    def maintain(self):
+        """Drops exited workers and workers executing their last job
+        and forks new ones up to size of pool, so new workers preload
+        modules while last jobs of old ones are executed.
+        """
+        for worker in self.workers:
+            worker.poll()
+            if worker.alive and worker.exhausted:
+                # worker sends nothing after its last job
+                worker.conn.close()
+
+        self.workers = [worker for worker in self.workers
+                        if worker.alive and not worker.exhausted]
+
+        while len(self.workers) < self.size:
+            self.workers.append(self._fork(self.max_runs))
+
+    def _wait_starting(self, deadline):
+        """Waits until one of starting workers reports readiness
+        or deadline is reached.
+        """
+        while True:
+            starting = [worker for worker in self.workers
+                        if worker.alive and not worker.ready
+                        and not worker.busy]
+            timeout = deadline - time.time()
+            if not starting or timeout <= 0:
+                return
+            try:
+                select.select([worker.conn for worker in starting],
+                              [], [], timeout)
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+            for worker in starting:
+                worker.poll()
+            if any(worker.ready for worker in starting):
+                return
+
+    def reserve(self):
+        """Returns worker which is ready to execute job."""
+        self.maintain()
+        deadline = time.time() + self.ready_timeout
+
+        while True:
+            for worker in self.workers:
+                if worker.ready:
+                    worker.ready = False
+                    return worker
+            if time.time() >= deadline or \
+                    all(worker.busy for worker in self.workers):
+                break
+            self._wait_starting(deadline)
+            self.maintain()
+
+        LOG.info('No worker of %s is ready, forking single-use worker',
+                 self.size)
+        return self._fork(max_runs=1)
+
+    def release(self, worker):
+        """Returns reserved worker to pool without sending job to it."""
+        if worker in self.workers:
+            worker.ready = True
+        else:
+            worker.send(None)
+
+    def submit(self, job, session=None, on_cancel=None):
+        """Sends job to worker and returns pid of the worker.
+
+        If session is given job is sent only after commit of its
+        transaction, so worker sees all data the job refers to.
+        on_cancel is called if job is not sent because of rollback.
+        """
+        worker = self.reserve()
+
+        if session is None:
+            worker.send(job)
+            return worker.pid
+
+        state = {'done': False}
+
+        def on_commit(session):
+            if not state['done']:
+                state['done'] = True
+                try:
+                    worker.send(job)
+                except IOError:
+                    LOG.exception('Worker %s exited before job was sent',
+                                  worker.pid)
+                    if on_cancel is not None:
+                        on_cancel()
+
+        def on_rollback(session):
+            if not state['done']:
+                state['done'] = True
+                self.release(worker)
+                if on_cancel is not None:
+                    on_cancel()
+
+        event.listen(session, 'after_commit', on_commit, once=True)
+        event.listen(session, 'after_rollback', on_rollback, once=True)
+
+        return worker.pid
+
+    def close(self):
+        for worker in self.workers:
+            worker.poll()
+            if worker.alive:
+                worker.send(None)
+        self.workers = []
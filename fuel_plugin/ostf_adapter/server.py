@@ -18,6 +18,7 @@ import os
 import signal
 import sys
 
+import gevent
 from gevent import pywsgi
 try:
     from oslo.config import cfg
@@ -28,14 +29,28 @@ from fuel_plugin.ostf_adapter import config as ostf_config
 from fuel_plugin.ostf_adapter import logger
 from fuel_plugin.ostf_adapter import mixins
 from fuel_plugin.ostf_adapter import nailgun_hooks
+from fuel_plugin.ostf_adapter import nose_plugin
 from fuel_plugin.ostf_adapter.nose_plugin import nose_discovery
 from fuel_plugin.ostf_adapter.storage import engine
+from fuel_plugin.ostf_adapter.storage import models
 from fuel_plugin.ostf_adapter.wsgi import app
 
 
 CONF = cfg.CONF
 
 
+def schedule_test_runs(dbpath, interval):
+    """Periodically starts queued test runs which can be started."""
+    log = logging.getLogger(__name__)
+    while True:
+        gevent.sleep(interval)
+        try:
+            with engine.contexted_session(dbpath, pooled=True) as session:
+                models.TestRun.schedule(session, dbpath)
+        except Exception:
+            log.exception('Failed to schedule queued test runs')
+
+
 def main():
 
     ostf_config.init_config(sys.argv[1:])
@@ -57,20 +72,29 @@ def main():
         return nailgun_hooks.after_initialization_environment_hook()
 
     with engine.contexted_session(CONF.adapter.dbpath) as session:
-        # performing cleaning of expired data (if any) in db
-        mixins.delete_db_data(session)
-        log.info('Cleaned up database.')
+        # workers of previous run of adapter are gone
+        models.TestRun.finish_interrupted(session)
+
         # discover testsets and their tests
         CORE_PATH = CONF.debug_tests or 'fuel_health'
 
         log.info('Performing nose discovery with {0}.'.format(CORE_PATH))
 
-        nose_discovery.discovery(path=CORE_PATH, session=session)
+        nose_discovery.incremental_discovery(
+            path=CORE_PATH, session=session,
+            engine=CONF.adapter.discovery_engine)
 
         # cache needed data from test repository
         mixins.cache_test_repository(session)
 
     log.info('Discovery is completed')
+
+    # fork workers executing test runs before serving requests
+    nose_plugin.get_plugin('nose').pool.maintain()
+
+    gevent.spawn(schedule_test_runs, CONF.adapter.dbpath,
+                 CONF.adapter.scheduler_interval)
+
     host, port = CONF.adapter.server_host, CONF.adapter.server_port
     srv = pywsgi.WSGIServer((host, port), root)
 
@@ -14,19 +14,35 @@
 
 import contextlib
 import logging
+import os
 
 from sqlalchemy import create_engine, orm
 
 
 LOG = logging.getLogger(__name__)
 
+_ENGINES = {}
+
+
+def get_engine(dbpath):
+    """Returns engine which is shared by all sessions of current process.
+
+    Engines are keyed by pid as connections of parent's engine must
+    not be used (or closed) by forked process.
+    """
+    key = (os.getpid(), dbpath)
+    if key not in _ENGINES:
+        _ENGINES[key] = create_engine(dbpath)
+    return _ENGINES[key]
+
 
 @contextlib.contextmanager
-def contexted_session(dbpath):
-    """Allows to handle session via context manager
+def contexted_session(dbpath, pooled=False):
+    """Allows to handle session via context manager. Pooled session
+    reuses engine (and connections) of current process.
     """
     LOG.debug('Starting session with dbpath={0}'.format(dbpath))
-    engine = create_engine(dbpath)
+    engine = get_engine(dbpath) if pooled else create_engine(dbpath)
     session = orm.Session(bind=engine)
     try:
         LOG.debug('Before yielding session.')
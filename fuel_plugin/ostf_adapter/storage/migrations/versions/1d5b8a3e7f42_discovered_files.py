@@ -0,0 +1,47 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""discovered_files
+
+Revision ID: 1d5b8a3e7f42
+Revises: 4f6e2a1c9d37
+Create Date: 2016-01-11 11:02:37.519846
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1d5b8a3e7f42'
+down_revision = '4f6e2a1c9d37'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+def upgrade():
+    op.create_table(
+        'discovered_files',
+        sa.Column('path', sa.String(length=1024), nullable=False),
+        sa.Column('module', sa.String(length=512), nullable=False),
+        sa.Column('mtime', sa.Float(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('digest', sa.String(length=40), nullable=True),
+        sa.Column('test_sets', postgresql.ARRAY(sa.String(length=128)),
+                  nullable=True),
+        sa.PrimaryKeyConstraint('path')
+    )
+
+
+def downgrade():
+    op.drop_table('discovered_files')
@@ -0,0 +1,40 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""tests_duration_seconds
+
+Revision ID: 2c8d6e4b9a15
+Revises: 1d5b8a3e7f42
+Create Date: 2016-01-18 12:27:04.316528
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2c8d6e4b9a15'
+down_revision = '1d5b8a3e7f42'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('tests',
+                  sa.Column('duration_seconds', sa.Float(), nullable=True))
+    # durations of already discovered tests are filled by full
+    # rediscovery on next start of adapter
+    op.execute('DELETE FROM discovered_files')
+
+
+def downgrade():
+    op.drop_column('tests', 'duration_seconds')
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""shared_testing_patterns
+
+Revision ID: 3a4c0f2b8e11
+Revises: 36e3fd684a9e
+Create Date: 2015-12-21 12:14:05.311204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a4c0f2b8e11'
+down_revision = '36e3fd684a9e'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+def upgrade():
+    op.create_table(
+        'testing_patterns',
+        sa.Column('signature', sa.String(length=64), nullable=False),
+        sa.Column('test_set_id', sa.String(length=128), nullable=False),
+        sa.Column('tests', postgresql.ARRAY(sa.String(length=512)),
+                  nullable=True),
+        sa.ForeignKeyConstraint(['test_set_id'], ['test_sets.id'], ),
+        sa.PrimaryKeyConstraint('signature', 'test_set_id')
+    )
+    op.add_column('cluster_testing_pattern',
+                  sa.Column('signature', sa.String(length=64),
+                            nullable=True))
+
+    # existing patterns are moved to per cluster signatures;
+    # release version of clusters is reset so patterns are
+    # recomputed and shared on next discovery check
+    op.execute(
+        "INSERT INTO testing_patterns (signature, test_set_id, tests) "
+        "SELECT 'cluster-' || cluster_id, test_set_id, tests "
+        "FROM cluster_testing_pattern"
+    )
+    op.execute(
+        "UPDATE cluster_testing_pattern "
+        "SET signature = 'cluster-' || cluster_id"
+    )
+    op.execute("UPDATE cluster_state SET release_version = NULL")
+
+    op.create_foreign_key(
+        'cluster_testing_pattern_signature_fkey',
+        'cluster_testing_pattern', 'testing_patterns',
+        ['signature', 'test_set_id'], ['signature', 'test_set_id']
+    )
+    op.drop_column('cluster_testing_pattern', 'tests')
+
+
+def downgrade():
+    op.add_column('cluster_testing_pattern',
+                  sa.Column('tests',
+                            postgresql.ARRAY(sa.String(length=512)),
+                            nullable=True))
+    op.execute(
+        "UPDATE cluster_testing_pattern AS ctp SET tests = tp.tests "
+        "FROM testing_patterns AS tp "
+        "WHERE tp.signature = ctp.signature "
+        "AND tp.test_set_id = ctp.test_set_id"
+    )
+    op.drop_constraint('cluster_testing_pattern_signature_fkey',
+                       'cluster_testing_pattern', type_='foreignkey')
+    op.drop_column('cluster_testing_pattern', 'signature')
+    op.drop_table('testing_patterns')
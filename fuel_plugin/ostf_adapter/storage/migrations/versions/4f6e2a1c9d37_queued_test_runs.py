@@ -0,0 +1,57 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""queued_test_runs
+
+Revision ID: 4f6e2a1c9d37
+Revises: 3a4c0f2b8e11
+Create Date: 2015-12-28 15:41:52.104733
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f6e2a1c9d37'
+down_revision = '3a4c0f2b8e11'
+
+from alembic import op
+import sqlalchemy as sa
+
+from fuel_plugin.ostf_adapter.storage import fields
+
+
+old_states = ('running', 'finished')
+new_states = ('queued', 'running', 'finished')
+
+
+def _change_states(states):
+    # ALTER TYPE ... ADD VALUE can not be executed inside transaction,
+    # so type is recreated
+    op.execute('ALTER TYPE test_run_states RENAME TO test_run_states_old')
+    sa.Enum(*states, name='test_run_states').create(op.get_bind())
+    op.execute('ALTER TABLE test_runs ALTER COLUMN status '
+               'TYPE test_run_states USING status::text::test_run_states')
+    op.execute('DROP TYPE test_run_states_old')
+
+
+def upgrade():
+    _change_states(new_states)
+    op.add_column('test_runs',
+                  sa.Column('queued_args', fields.JsonField(), nullable=True))
+
+
+def downgrade():
+    op.execute("UPDATE test_runs SET status = 'finished' "
+               "WHERE status = 'queued'")
+    op.drop_column('test_runs', 'queued_args')
+    _change_states(old_states)
@@ -12,15 +12,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
+import hashlib
 import logging
 
+try:
+    from oslo.serialization import jsonutils
+except ImportError:
+    from oslo_serialization import jsonutils
 import sqlalchemy as sa
 from sqlalchemy import desc
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import joinedload, relationship, object_mapper
+from sqlalchemy.orm import joinedload, relationship
 
 from fuel_plugin.ostf_adapter import nose_plugin
 from fuel_plugin.ostf_adapter.storage import engine
@@ -32,6 +38,11 @@ LOG = logging.getLogger(__name__)
 
 BASE = declarative_base()
 
+# OpenStack credentials and nailgun token of queued test runs by id
+# of test run; they must not be stored in db, so they are kept in
+# memory of adapter and queued test runs are finished on its restart
+_QUEUED_CREDENTIALS = {}
+
 
 class ClusterState(BASE):
     """Represents clusters currently
@@ -51,6 +62,37 @@ class ClusterState(BASE):
     release_version = sa.Column(sa.String(64))
 
 
+class TestingPattern(BASE):
+    """Stores tests of testset which are available for clusters
+    with the same signature (release version and deployment tags).
+    Is shared by all such clusters via ClusterTestingPattern.
+    """
+
+    __tablename__ = 'testing_patterns'
+
+    signature = sa.Column(sa.String(64), primary_key=True)
+
+    test_set_id = sa.Column(
+        sa.String(128),
+        sa.ForeignKey('test_sets.id'),
+        primary_key=True
+    )
+
+    tests = sa.Column(ARRAY(sa.String(512)))
+
+    @staticmethod
+    def make_signature(cluster_data, repository_version=''):
+        """Computes canonical hash of data which
+        testing patterns of cluster depend on.
+        """
+        canonical = jsonutils.dumps([
+            repository_version,
+            cluster_data.get('release_version') or '',
+            sorted(cluster_data['deployment_tags'])
+        ])
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
 class ClusterTestingPattern(BASE):
     """Stores cluster's pattern for testsets and tests."""
 
@@ -68,10 +110,48 @@ class ClusterTestingPattern(BASE):
         primary_key=True
     )
 
-    tests = sa.Column(ARRAY(sa.String(512)))
+    signature = sa.Column(sa.String(64))
+
+    __table_args__ = (
+        sa.ForeignKeyConstraint(
+            ['signature', 'test_set_id'],
+            ['testing_patterns.signature',
+             'testing_patterns.test_set_id'],
+        ),
+        {}
+    )
 
     test_set = relationship('TestSet')
 
+    testing_pattern = relationship('TestingPattern', viewonly=True)
+    tests = association_proxy('testing_pattern', 'tests')
+
+    @classmethod
+    def query_with_tests(cls, session, *entities):
+        """Returns query of given entities where cluster testing
+        patterns are joined with their shared testing patterns.
+        """
+        return session.query(*entities)\
+            .select_from(cls)\
+            .join(cls.testing_pattern)
+
+    @classmethod
+    def get_cluster_tests(cls, session, cluster_id):
+        """Returns (test set id, test name) rows of tests available
+        for cluster in single query. Names are taken by unnesting of
+        arrays of testing patterns and are ordered bytewise, as names
+        were sorted by python before.
+        """
+        name = sa.func.unnest(TestingPattern.tests).label('name')
+        pattern_tests = cls.query_with_tests(session, cls.test_set_id, name)\
+            .filter(cls.cluster_id == cluster_id)\
+            .subquery()
+
+        return session.query(pattern_tests.c.test_set_id,
+                             pattern_tests.c.name)\
+            .order_by(pattern_tests.c.name.collate('"C"'))\
+            .all()
+
 
 class TestSet(BASE):
 
@@ -110,6 +190,62 @@ class TestSet(BASE):
             .filter_by(id=test_set)\
             .first()
 
+    @classmethod
+    def get_test_sets(cls, session, test_sets):
+        """Returns dict of test sets with given ids."""
+        if not test_sets:
+            return {}
+
+        return dict(
+            (test_set.id, test_set) for test_set in
+            session.query(cls).filter(cls.id.in_(list(test_sets)))
+        )
+
+    @classmethod
+    def upsert_many(cls, session, test_sets):
+        """Inserts new and updates existing test sets with
+        one query and two executemany statements.
+        """
+        mappings = []
+        for test_set in test_sets:
+            state = sa.inspect(test_set)
+            mappings.append(dict(
+                (column.key, state.dict[column.key])
+                for column in cls.__table__.columns
+                if column.key in state.dict
+            ))
+        if not mappings:
+            return
+
+        existing = set(
+            test_set_id for test_set_id, in session.query(cls.id)
+            .filter(cls.id.in_([mapping['id'] for mapping in mappings]))
+        )
+
+        session.bulk_update_mappings(
+            cls, [mapping for mapping in mappings
+                  if mapping['id'] in existing])
+        session.bulk_insert_mappings(
+            cls, [mapping for mapping in mappings
+                  if mapping['id'] not in existing])
+
+
+class DiscoveredFile(BASE):
+    """Fingerprint of file inspected by discovery. Used to
+    rediscover only files changed since previous discovery.
+    """
+
+    __tablename__ = 'discovered_files'
+
+    path = sa.Column(sa.String(1024), primary_key=True)
+    module = sa.Column(sa.String(512), nullable=False)
+    mtime = sa.Column(sa.Float)
+    size = sa.Column(sa.BigInteger)
+    digest = sa.Column(sa.String(40))
+
+    # ids of test sets defined by module
+    test_sets = sa.Column(ARRAY(sa.String(128)))
+
 
 class Test(BASE):
 
@@ -131,6 +267,8 @@ class Test(BASE):
     title = sa.Column(sa.String(512))
     description = sa.Column(sa.Text())
     duration = sa.Column(sa.String(512))
+    # duration parsed to number of seconds
+    duration_seconds = sa.Column(sa.Float())
     message = sa.Column(sa.Text())
     traceback = sa.Column(sa.Text())
     status = sa.Column(sa.Enum(*STATES, name='test_states'))
@@ -170,6 +308,18 @@ class Test(BASE):
             'taken': self.time_taken
         }
 
+    @classmethod
+    def add_templates(cls, session, tests):
+        """Inserts template tests in one executemany statement.
+
+        :param tests: list of dicts of columns of tests; only last
+                      of tests with the same test set and name is kept.
+        """
+        unique = collections.OrderedDict(
+            ((test['test_set_id'], test['name']), test) for test in tests
+        )
+        session.bulk_insert_mappings(cls, list(unique.values()))
+
     @classmethod
     def add_result(cls, session, test_run_id, test_name, data):
         session.query(cls).\
@@ -177,6 +327,38 @@ class Test(BASE):
                    cls.test_run_id == test_run_id).\
             update(data, synchronize_session='fetch')
 
+    @classmethod
+    def get_tests_ids(cls, session, test_run_id):
+        """Returns mapping of names of test run's tests to their ids."""
+        return dict(
+            session.query(cls.name, cls.id)
+            .filter(cls.test_run_id == test_run_id)
+        )
+
+    @classmethod
+    def add_results(cls, connection, results):
+        """Updates several tests in one executemany statement.
+
+        :param results: list of dicts with the same set of keys
+                        where 'test_id' key holds id of test to update
+                        and other keys hold values of columns to set.
+
+        Stopped tests are not updated, so results written by test run
+        after it was stopped do not overwrite their status.
+        """
+        if not results:
+            return
+
+        table = cls.__table__
+        connection.execute(
+            table.update().where(sa.and_(
+                table.c.id == sa.bindparam('test_id'),
+                sa.or_(table.c.status.is_(None),
+                       table.c.status != 'stopped')
+            )),
+            results
+        )
+
     @classmethod
     def update_running_tests(cls, session, test_run_id, status='stopped'):
         session.query(cls). \
@@ -184,6 +366,39 @@ class Test(BASE):
                    cls.status.in_(('running', 'wait_running'))). \
             update({'status': status}, synchronize_session='fetch')
 
+    @classmethod
+    def update_test_runs_running_tests(cls, session, test_runs_ids,
+                                       status='stopped'):
+        """Same as update_running_tests but for several test runs."""
+        if not test_runs_ids:
+            return
+
+        session.query(cls). \
+            filter(cls.test_run_id.in_(test_runs_ids),
+                   cls.status.in_(('running', 'wait_running'))). \
+            update({'status': status}, synchronize_session='fetch')
+
+    @classmethod
+    def update_test_runs_tests(cls, session, tests_by_test_run,
+                               status='wait_running'):
+        """Same as update_test_run_tests but for several test runs.
+
+        :param tests_by_test_run: dict of test run id to tests names.
+        """
+        conditions = [
+            sa.and_(cls.test_run_id == test_run_id,
+                    cls.name.in_(tests_names))
+            for test_run_id, tests_names in tests_by_test_run.items()
+            if tests_names
+        ]
+        if not conditions:
+            return
+
+        session.query(cls). \
+            filter(sa.or_(*conditions)). \
+            update({'status': status, 'time_taken': None},
+                   synchronize_session='fetch')
+
     @classmethod
     def update_test_run_tests(cls, session, test_run_id,
                               tests_names, status='wait_running'):
@@ -193,22 +408,56 @@ class Test(BASE):
             update({'status': status, 'time_taken': None},
                    synchronize_session='fetch')
 
-    def copy_test(self, test_run, predefined_tests):
-        """Performs copying of tests for newly created
-        test_run.
+    @classmethod
+    def copy_tests_select(cls, test_set_id, tests_names, test_run_id,
+                          predefined_tests):
+        """Returns SELECT of template tests of test set with given names
+        which produces their copies bound to test run. Tests absent in
+        non empty predefined_tests are disabled.
         """
-        new_test = self.__class__()
-        mapper = object_mapper(self)
-        primary_keys = set([col.key for col in mapper.primary_key])
-        for column in mapper.iterate_properties:
-            if column.key not in primary_keys:
-                setattr(new_test, column.key, getattr(self, column.key))
-        new_test.test_run_id = test_run.id
-        if predefined_tests and new_test.name not in predefined_tests:
-            new_test.status = 'disabled'
+        table = cls.__table__
+
+        if predefined_tests:
+            status = sa.case(
+                [(table.c.name.in_(predefined_tests), 'wait_running')],
+                else_='disabled'
+            )
         else:
-            new_test.status = 'wait_running'
-        return new_test
+            status = sa.literal('wait_running')
+
+        return sa.select(
+            cls._copied_columns() + [
+                sa.literal(test_run_id, sa.Integer),
+                sa.cast(status, table.c.status.type)
+            ]
+        ).where(
+            sa.and_(table.c.name.in_(tests_names),
+                    table.c.test_set_id == test_set_id,
+                    table.c.test_run_id.is_(None))
+        )
+
+    @classmethod
+    def copy_tests_statement(cls, copy_selects):
+        """Returns INSERT ... SELECT statement which inserts
+        copies of tests produced by given copy_tests_select selects.
+        """
+        if len(copy_selects) == 1:
+            select = copy_selects[0]
+        else:
+            select = sa.union_all(*copy_selects)
+
+        return cls.__table__.insert().from_select(
+            [column.key for column in cls._copied_columns()] +
+            ['test_run_id', 'status'],
+            select
+        )
+
+    @classmethod
+    def _copied_columns(cls):
+        return [
+            column for column in cls.__table__.c
+            if column.key not in ('id', 'test_run_id', 'status')
+        ]
 
 
 class TestRun(BASE):
@@ -216,6 +465,7 @@ class TestRun(BASE):
     __tablename__ = 'test_runs'
 
     STATES = (
+        'queued',
         'running',
         'finished'
     )
@@ -228,6 +478,9 @@ class TestRun(BASE):
     started_at = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
     ended_at = sa.Column(sa.DateTime)
     pid = sa.Column(sa.Integer)
+    # arguments for plugin.run kept while test run is queued,
+    # without credentials (see _QUEUED_CREDENTIALS)
+    queued_args = sa.Column(fields.JsonField())
 
     test_set_id = sa.Column(sa.String(128))
     cluster_id = sa.Column(sa.Integer)
@@ -267,6 +520,29 @@ class TestRun(BASE):
     def is_finished(self):
         return self.status == 'finished'
 
+    def run_or_enqueue(self, test_set, dbpath, ostf_os_access_creds,
+                       tests=None, token=None):
+        """Runs test run at once if its test set has no exclusive test
+        sets, otherwise queues it for scheduler.
+
+        :returns: True if test run is queued.
+        """
+        if test_set.exclusive_testsets:
+            self.status = 'queued'
+            self.queued_args = {'tests': tests}
+            _QUEUED_CREDENTIALS[self.id] = (ostf_os_access_creds, token)
+            return True
+
+        plugin = nose_plugin.get_plugin(test_set.driver)
+        plugin.run(self, test_set, dbpath,
+                   ostf_os_access_creds, tests, token=token)
+        return False
+
+    def dequeue(self):
+        self.queued_args = None
+        _QUEUED_CREDENTIALS.pop(self.id, None)
+        self.update('finished')
+
     @property
     def frontend(self):
         test_run_data = {
@@ -288,29 +564,30 @@ class TestRun(BASE):
                      tests=None):
         """Creates new test_run object with given data
         and makes copy of tests that will be bound
-        with this test_run. Copying is performed by
-        copy_test method of Test class.
+        with this test_run. Copying is performed on db side
+        by single INSERT ... SELECT from template tests.
         """
         predefined_tests = tests or []
-        tests_names = session.query(ClusterTestingPattern.tests)\
-            .filter_by(test_set_id=test_set, cluster_id=cluster_id)\
+        tests_names = ClusterTestingPattern.query_with_tests(
+            session, TestingPattern.tests
+        )\
+            .filter(ClusterTestingPattern.test_set_id == test_set,
+                    ClusterTestingPattern.cluster_id == cluster_id)\
             .scalar()
 
-        tests = session.query(Test)\
-            .filter(Test.name.in_(tests_names))\
-            .filter_by(test_set_id=test_set)\
-            .filter_by(test_run_id=None)
-
         test_run = cls(test_set_id=test_set, cluster_id=cluster_id,
                        status=status)
         session.add(test_run)
 
-        for test in tests:
-            new_test = test.copy_test(test_run, predefined_tests)
-            session.add(new_test)
-            test_run.tests.append(new_test)
+        # id of test run is needed for copying of tests
         session.flush()
 
+        if tests_names:
+            session.execute(Test.copy_tests_statement([
+                Test.copy_tests_select(test_set, tests_names,
+                                       test_run.id, predefined_tests)
+            ]))
+
         return test_run
 
     @classmethod
@@ -320,6 +597,39 @@ class TestRun(BASE):
             order_by(desc(cls.id)).first()
         return test_run
 
+    @classmethod
+    def get_last_test_runs(cls, session, keys):
+        """Returns dict which maps (test_set_id, cluster_id) pairs
+        to last test runs for them. Pairs without test runs are absent.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        test_run_ids = session.query(sa.func.max(cls.id))\
+            .filter(sa.tuple_(cls.test_set_id, cls.cluster_id).in_(keys))\
+            .group_by(cls.test_set_id, cls.cluster_id)
+
+        test_runs = session.query(cls)\
+            .filter(cls.id.in_(test_run_ids))
+
+        return dict(((test_run.test_set_id, test_run.cluster_id), test_run)
+                    for test_run in test_runs)
+
+    @classmethod
+    def get_test_runs(cls, session, test_run_ids):
+        """Returns dict of test runs with given ids
+        with their tests loaded.
+        """
+        if not test_run_ids:
+            return {}
+
+        test_runs = session.query(cls)\
+            .options(joinedload('tests'))\
+            .filter(cls.id.in_(test_run_ids))
+
+        return dict((test_run.id, test_run) for test_run in test_runs)
+
     @classmethod
     def get_test_results(cls):
         session = engine.get_session()
@@ -361,7 +671,6 @@ class TestRun(BASE):
 
     @classmethod
     def start(cls, session, test_set, metadata, tests, dbpath, token=None):
-        plugin = nose_plugin.get_plugin(test_set.driver)
         if cls.is_last_running(session, test_set.id,
                                metadata['cluster_id']):
 
@@ -369,12 +678,259 @@ class TestRun(BASE):
                 session, test_set.id,
                 metadata['cluster_id'], tests=tests)
 
-            plugin.run(test_run, test_set, dbpath,
-                       metadata.get('ostf_os_access_creds'), token=token)
+            if test_run.run_or_enqueue(test_set, dbpath,
+                                       metadata.get('ostf_os_access_creds'),
+                                       token=token):
+                cls.schedule(session, dbpath)
 
             return test_run.frontend
         return {}
 
+    @classmethod
+    def start_many(cls, session, test_runs_data, dbpath, token=None):
+        """Starts several test runs using constant number of queries.
+
+        :param test_runs_data: list of (test_set, metadata, tests)
+                               tuples as they are passed to start method.
+        :returns: list of frontend representations of started test runs
+                  in order of test_runs_data, {} for test runs which
+                  are not started because previous ones are running.
+        """
+        if not test_runs_data:
+            return []
+
+        keys = list(set((test_set.id, metadata['cluster_id'])
+                        for test_set, metadata, _ in test_runs_data))
+
+        last_test_runs = cls.get_last_test_runs(session, keys)
+
+        patterns = ClusterTestingPattern.query_with_tests(
+            session,
+            ClusterTestingPattern.test_set_id,
+            ClusterTestingPattern.cluster_id,
+            TestingPattern.tests
+        )\
+            .filter(sa.tuple_(ClusterTestingPattern.test_set_id,
+                              ClusterTestingPattern.cluster_id).in_(keys))
+        tests_names = dict(((test_set_id, cluster_id), names)
+                           for test_set_id, cluster_id, names in patterns)
+
+        started = []
+        test_runs = []
+        for test_set, metadata, tests in test_runs_data:
+            key = (test_set.id, metadata['cluster_id'])
+
+            last_test_run = last_test_runs.get(key)
+            if last_test_run is not None and \
+                    not last_test_run.is_finished():
+                test_runs.append(None)
+                continue
+
+            test_run = cls(test_set_id=test_set.id,
+                           cluster_id=metadata['cluster_id'],
+                           status='running')
+            session.add(test_run)
+
+            # test run with the same key further in list must not start
+            last_test_runs[key] = test_run
+
+            started.append((test_run, test_set, metadata, tests))
+            test_runs.append(test_run)
+
+        if not started:
+            return [{} for _ in test_runs]
+
+        # ids of test runs are needed for copying of tests
+        session.flush()
+
+        copy_selects = []
+        started_ids = []
+        for test_run, test_set, metadata, tests in started:
+            started_ids.append(test_run.id)
+
+            names = tests_names.get((test_set.id, test_run.cluster_id))
+            if names:
+                copy_selects.append(
+                    Test.copy_tests_select(test_set.id, names,
+                                           test_run.id, tests or []))
+        if copy_selects:
+            session.execute(Test.copy_tests_statement(copy_selects))
+
+        # load copied tests of all started test runs at once
+        session.query(cls)\
+            .options(joinedload('tests'))\
+            .filter(cls.id.in_(started_ids))\
+            .all()
+
+        queued = False
+        for test_run, test_set, metadata, tests in started:
+            queued |= test_run.run_or_enqueue(
+                test_set, dbpath, metadata.get('ostf_os_access_creds'),
+                token=token)
+        if queued:
+            cls.schedule(session, dbpath)
+
+        return [item.frontend if item is not None else {}
+                for item in test_runs]
+
+    @classmethod
+    def restart_many(cls, session, test_runs_data, dbpath, token=None):
+        """Restarts several test runs using constant number of queries.
+
+        :param test_runs_data: list of (test_run, ostf_os_access_creds,
+                               tests) tuples as they are passed to
+                               restart method.
+        """
+        if not test_runs_data:
+            return []
+
+        last_test_runs = cls.get_last_test_runs(
+            session,
+            set((test_run.test_set_id, test_run.cluster_id)
+                for test_run, _, _ in test_runs_data)
+        )
+        test_sets = TestSet.get_test_sets(
+            session,
+            set(test_run.test_set_id for test_run, _, _ in test_runs_data)
+        )
+
+        restarted = []
+        for test_run, ostf_os_access_creds, tests in test_runs_data:
+            key = (test_run.test_set_id, test_run.cluster_id)
+            last_test_run = last_test_runs.get(key)
+            if last_test_run is not None and \
+                    not last_test_run.is_finished():
+                continue
+
+            test_run.update('running')
+            last_test_runs[key] = test_run
+            restarted.append((test_run, ostf_os_access_creds, tests))
+
+        Test.update_test_runs_tests(
+            session,
+            dict((test_run.id, tests)
+                 for test_run, _, tests in restarted if tests)
+        )
+        session.flush()
+
+        queued = False
+        for test_run, ostf_os_access_creds, tests in restarted:
+            queued |= test_run.run_or_enqueue(
+                test_sets[test_run.test_set_id], dbpath,
+                ostf_os_access_creds, tests, token=token)
+        if queued:
+            cls.schedule(session, dbpath)
+
+        restarted_ids = set(test_run.id for test_run, _, _ in restarted)
+        return [test_run.frontend if test_run.id in restarted_ids else {}
+                for test_run, _, _ in test_runs_data]
+
+    @classmethod
+    def stop_many(cls, session, test_runs):
+        """Stops several test runs using constant number of queries."""
+        if not test_runs:
+            return []
+
+        test_sets = TestSet.get_test_sets(
+            session,
+            set(test_run.test_set_id for test_run in test_runs)
+        )
+
+        killed_ids = []
+        for test_run in test_runs:
+            if test_run.status == 'queued':
+                test_run.dequeue()
+                killed_ids.append(test_run.id)
+                continue
+
+            test_set = test_sets[test_run.test_set_id]
+            plugin = nose_plugin.get_plugin(test_set.driver)
+            if plugin.kill(test_run):
+                killed_ids.append(test_run.id)
+
+        Test.update_test_runs_running_tests(
+            session, killed_ids, status='stopped')
+
+        return [test_run.frontend for test_run in test_runs]
+
+    @classmethod
+    def finish_interrupted(cls, session):
+        """Finishes test runs which were running or queued when
+        adapter was stopped, their running tests are marked as stopped.
+        Credentials of queued test runs were lost with adapter.
+        """
+        test_runs_ids = [
+            test_run_id for (test_run_id,) in
+            session.query(cls.id)
+            .filter(cls.status.in_(['running', 'queued']))
+        ]
+        if not test_runs_ids:
+            return []
+
+        Test.update_test_runs_running_tests(
+            session, test_runs_ids, status='stopped')
+
+        session.query(cls)\
+            .filter(cls.id.in_(test_runs_ids))\
+            .update({'status': 'finished',
+                     'pid': None,
+                     'queued_args': None,
+                     'ended_at': datetime.datetime.utcnow()},
+                    synchronize_session='fetch')
+
+        return test_runs_ids
+
+    @classmethod
+    def schedule(cls, session, dbpath):
+        """Starts queued test runs which exclusive test sets are not
+        used by running test runs. Test runs are admitted in order of
+        test_runs_ordering_priority of their test sets, a queued test
+        run is never overtaken by later one it conflicts with.
+
+        :returns: list of started test runs.
+        """
+        queued = session.query(cls, TestSet)\
+            .join(TestSet, TestSet.id == cls.test_set_id)\
+            .filter(cls.status == 'queued')\
+            .order_by(TestSet.test_runs_ordering_priority.nullslast(),
+                      cls.id)\
+            .all()
+        if not queued:
+            return []
+
+        running = session.query(cls.cluster_id, TestSet.exclusive_testsets)\
+            .join(TestSet, TestSet.id == cls.test_set_id)\
+            .filter(cls.status == 'running')
+
+        busy = set()
+        for cluster_id, exclusive_testsets in running:
+            busy.update((serie, cluster_id)
+                        for serie in exclusive_testsets or [])
+
+        admitted = []
+        for test_run, test_set in queued:
+            series = set((serie, test_run.cluster_id)
+                         for serie in test_set.exclusive_testsets or [])
+            if not series & busy:
+                admitted.append((test_run, test_set))
+            busy.update(series)
+
+        for test_run, test_set in admitted:
+            queued_args = test_run.queued_args or {}
+            ostf_os_access_creds, token = _QUEUED_CREDENTIALS.pop(
+                test_run.id, (None, None))
+            test_run.queued_args = None
+            test_run.status = 'running'
+            test_run.started_at = datetime.datetime.utcnow()
+
+            plugin = nose_plugin.get_plugin(test_set.driver)
+            plugin.run(test_run, test_set, dbpath,
+                       ostf_os_access_creds,
+                       queued_args.get('tests'),
+                       token=token)
+
+        return [test_run for test_run, _ in admitted]
+
     def restart(self, session, dbpath,
                 ostf_os_access_creds, tests=None, token=None):
         """Restart test run with
@@ -383,21 +939,27 @@ class TestRun(BASE):
         if TestRun.is_last_running(session,
                                    self.test_set_id,
                                    self.cluster_id):
-            plugin = nose_plugin.get_plugin(self.test_set.driver)
-
             self.update('running')
             if tests:
                 Test.update_test_run_tests(
                     session, self.id, tests)
 
-            plugin.run(self, self.test_set, dbpath,
-                       ostf_os_access_creds, tests, token=token)
+            if self.run_or_enqueue(self.test_set, dbpath,
+                                   ostf_os_access_creds, tests,
+                                   token=token):
+                TestRun.schedule(session, dbpath)
             return self.frontend
         return {}
 
     def stop(self, session):
         """Stop test run if running
         """
+        if self.status == 'queued':
+            self.dequeue()
+            Test.update_running_tests(
+                session, self.id, status='stopped')
+            return self.frontend
+
         plugin = nose_plugin.get_plugin(self.test_set.driver)
         killed = plugin.kill(self)
         if killed:
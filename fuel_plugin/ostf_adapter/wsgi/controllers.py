@@ -56,18 +56,23 @@ class TestsetsController(BaseRestController):
     @expose('json')
     def get(self, cluster):
         mixins.discovery_check(request.session, cluster, request.token)
+        test_repository = mixins.get_test_repository(request.session)
 
         needed_testsets = request.session\
             .query(models.ClusterTestingPattern.test_set_id)\
             .filter_by(cluster_id=cluster)
 
-        test_sets = request.session.query(models.TestSet)\
-            .filter(models.TestSet.id.in_(needed_testsets))\
-            .order_by(models.TestSet.test_runs_ordering_priority)\
-            .all()
+        test_sets = [test_repository.get_test_set(test_set_id)
+                     for (test_set_id,) in needed_testsets]
+        test_sets = [item for item in test_sets if item is not None]
+
+        # test sets without priority go last as it is done by db
+        test_sets.sort(key=lambda item: (
+            item['test_runs_ordering_priority'] is None,
+            item['test_runs_ordering_priority']))
 
         if test_sets:
-            return [item.frontend for item in test_sets]
+            return [item['frontend'] for item in test_sets]
         return {}
 
 
@@ -76,22 +81,19 @@ class TestsController(BaseRestController):
     @expose('json')
     def get(self, cluster):
         mixins.discovery_check(request.session, cluster, request.token)
-        needed_tests_list = request.session\
-            .query(models.ClusterTestingPattern.tests)\
-            .filter_by(cluster_id=cluster)
-
-        result = []
-        for tests in needed_tests_list:
-            tests_to_return = request.session.query(models.Test)\
-                .filter(models.Test.name.in_(tests[0]))\
-                .all()
+        test_repository = mixins.get_test_repository(request.session)
 
-            result.extend(tests_to_return)
+        cluster_tests = models.ClusterTestingPattern.get_cluster_tests(
+            request.session, cluster)
 
-        result.sort(key=lambda test: test.name)
+        result = []
+        for test_set_id, test_name in cluster_tests:
+            test = test_repository.get_test(test_set_id, test_name)
+            if test is not None:
+                result.append(test['frontend'])
 
         if result:
-            return [item.frontend for item in result]
+            return result
 
         return {}
 
@@ -146,34 +148,20 @@ class TestrunsController(BaseRestController):
                                        request.token)
             nedded_testsets.add(test_run['testset'])
         # Validate testsets from request
-        test_sets = set([testset.id for testset in request.
-                        session.query(models.TestSet).all()])
-        if nedded_testsets - test_sets:
+        test_sets = models.TestSet.get_test_sets(request.session,
+                                                 nedded_testsets)
+        if nedded_testsets - set(test_sets):
             abort(400)
 
-        res = []
-        for test_run in test_runs:
-            test_set = test_run['testset']
-            metadata = test_run['metadata']
-            tests = test_run.get('tests', [])
-
-            test_set = models.TestSet.get_test_set(
-                request.session,
-                test_set
-            )
-
-            test_run = models.TestRun.start(
-                request.session,
-                test_set,
-                metadata,
-                tests,
-                cfg.CONF.adapter.dbpath,
-                token=request.token
-            )
-
-            res.append(test_run)
-
-        return res
+        return models.TestRun.start_many(
+            request.session,
+            [(test_sets[test_run['testset']],
+              test_run['metadata'],
+              test_run.get('tests', []))
+             for test_run in test_runs],
+            cfg.CONF.adapter.dbpath,
+            token=request.token
+        )
 
     @expose('json')
     def put(self):
@@ -181,21 +169,43 @@ class TestrunsController(BaseRestController):
         if 'objects' in test_runs:
             test_runs = test_runs['objects']
 
-        data = []
         with request.session.begin(subtransactions=True):
+            found_test_runs = models.TestRun.get_test_runs(
+                request.session,
+                [test_run['id'] for test_run in test_runs]
+            )
+
+            to_stop = []
+            to_restart = []
+            statuses = []
             for test_run in test_runs:
                 status = test_run.get('status')
-                tests = test_run.get('tests', [])
-                ostf_os_access_creds = test_run.get('ostf_os_access_creds')
+                found_test_run = found_test_runs.get(test_run['id'])
+                if found_test_run is None:
+                    abort(400)
 
-                test_run = models.TestRun.get_test_run(request.session,
-                                                       test_run['id'])
                 if status == 'stopped':
-                    data.append(test_run.stop(request.session))
+                    to_stop.append(found_test_run)
                 elif status == 'restarted':
-                    data.append(test_run.restart(request.session,
-                                                 cfg.CONF.adapter.dbpath,
-                                                 ostf_os_access_creds,
-                                                 tests=tests,
-                                                 token=request.token))
+                    to_restart.append((
+                        found_test_run,
+                        test_run.get('ostf_os_access_creds'),
+                        test_run.get('tests', [])
+                    ))
+                else:
+                    continue
+                statuses.append(status)
+
+            stopped = iter(models.TestRun.stop_many(request.session,
+                                                    to_stop))
+            restarted = iter(models.TestRun.restart_many(
+                request.session,
+                to_restart,
+                cfg.CONF.adapter.dbpath,
+                token=request.token
+            ))
+
+            data = [next(stopped) if item_status == 'stopped'
+                    else next(restarted)
+                    for item_status in statuses]
         return data
@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 
 import requests_mock
 from sqlalchemy import create_engine
@@ -175,6 +176,9 @@ class BaseIntegrationTest(BaseUnitTest):
         cls.requests_mock.stop()
 
     def setUp(self):
+        # data received from mocked nailgun must not leak between tests
+        mixins.invalidate_cluster_attrs()
+
         self.connection = self.engine.connect()
         self.trans = self.connection.begin()
         self.session = scoped_session(sessionmaker())
@@ -190,9 +194,24 @@ class BaseIntegrationTest(BaseUnitTest):
             if transaction.nested and not transaction._parent.nested:
                 session.begin_nested()
 
+    @contextlib.contextmanager
+    def count_queries(self):
+        """Collects statements executed through test connection."""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.connection, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(self.connection, 'before_cursor_execute',
+                         before_cursor_execute)
+
     def discovery(self):
         """Discover dummy tests used for testsing."""
-        mixins.TEST_REPOSITORY = []
         nose_discovery.discovery(path=TEST_PATH, session=self.session)
         mixins.cache_test_repository(self.session)
         self.session.flush()
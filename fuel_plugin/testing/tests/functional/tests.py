@@ -601,7 +601,7 @@ class AdapterTests(base.BaseAdapterTest):
             },
             {
                 'testset': 'gemini_second',
-                'status': 'running',
+                'status': 'queued',
                 'tests': [
                     {
                         'id': (
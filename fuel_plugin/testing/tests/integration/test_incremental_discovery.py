@@ -0,0 +1,143 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+
+from fuel_plugin.ostf_adapter import mixins
+from fuel_plugin.ostf_adapter.nose_plugin import nose_discovery
+from fuel_plugin.ostf_adapter.storage import models
+from fuel_plugin.testing.tests import base
+
+
+APPENDED_TEST = '''
+
+class AppendedTest(unittest2.TestCase):
+
+    def test_appended(self):
+        """appended test
+        Duration: 1sec
+        """
+'''
+
+
+class TestIncrementalDiscovery(base.BaseIntegrationTest):
+
+    def setUp(self):
+        super(TestIncrementalDiscovery, self).setUp()
+
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'dummy_tests')
+        shutil.copytree(base.TEST_PATH, self.path,
+                        ignore=shutil.ignore_patterns('*.pyc',
+                                                      '__pycache__'))
+
+        self.session.query(models.DiscoveredFile).delete()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        self.forget_modules()
+        super(TestIncrementalDiscovery, self).tearDown()
+
+    def forget_modules(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] == 'dummy_tests':
+                del sys.modules[name]
+
+    def discover(self):
+        # modules are imported again as it happens on restart of adapter
+        self.forget_modules()
+        return nose_discovery.incremental_discovery(self.path, self.session)
+
+    def get_templates(self):
+        return dict(
+            ((test.test_set_id, test.name), test.id) for test in
+            self.session.query(models.Test)
+            .filter(models.Test.test_run_id.is_(None))
+            .filter(models.Test.name.like('dummy_tests.%'))
+        )
+
+    def test_unchanged_files_are_not_rediscovered(self):
+        self.assertTrue(self.discover())
+        templates = self.get_templates()
+        self.assertEqual(len(templates), 29)
+
+        with mock.patch.object(nose_discovery, '_run_discovery') as m_run:
+            self.assertFalse(self.discover())
+
+        self.assertFalse(m_run.called)
+        self.assertEqual(self.get_templates(), templates)
+
+    def test_only_changed_module_is_rediscovered(self):
+        self.discover()
+        templates = self.get_templates()
+
+        with open(os.path.join(self.path, 'general_test.py'), 'a') as f:
+            f.write(APPENDED_TEST)
+
+        with mock.patch.object(nose_discovery, '_full_discovery') as m_full:
+            with mock.patch.object(nose_discovery, '_run_discovery',
+                                   wraps=nose_discovery._run_discovery) \
+                    as m_run:
+                self.assertTrue(self.discover())
+
+        self.assertFalse(m_full.called)
+        self.assertEqual(m_run.call_args[0][1],
+                         [os.path.join(self.path, 'general_test.py')])
+
+        # rows of unchanged tests are kept
+        new_templates = self.get_templates()
+        appended = ('general_test',
+                    'dummy_tests.general_test.AppendedTest.test_appended')
+        self.assertIn(appended, new_templates)
+        del new_templates[appended]
+        self.assertEqual(new_templates, templates)
+
+    def test_removed_test_set(self):
+        self.discover()
+
+        os.remove(os.path.join(self.path, 'stopped_test.py'))
+
+        self.assertTrue(self.discover())
+        self.assertIsNone(
+            models.TestSet.get_test_set(self.session, 'stopped_test'))
+        self.assertFalse([
+            name for _, name in self.get_templates()
+            if name.startswith('dummy_tests.stopped_test.')
+        ])
+
+    def test_full_rediscovery_with_cluster_data(self):
+        cluster_id = 1
+
+        self.discover()
+        mixins.cache_test_repository(self.session)
+        self.mock_api_for_cluster(cluster_id)
+        mixins.discovery_check(self.session, cluster_id)
+        self.session.flush()
+        self.assertTrue(self.session.query(models.ClusterTestingPattern)
+                        .filter_by(cluster_id=cluster_id).count())
+
+        # manifest is missing so test sets are discovered from scratch
+        self.session.query(models.DiscoveredFile).delete()
+        self.assertTrue(self.discover())
+
+        for model in (models.ClusterTestingPattern, models.ClusterState,
+                      models.TestingPattern):
+            self.assertEqual(self.session.query(model).count(), 0)
+        self.assertIsNotNone(
+            models.TestSet.get_test_set(self.session, 'general_test'))
@@ -77,6 +77,36 @@ class TestModelTestMethods(base.BaseIntegrationTest):
 
         self.check_model_obj_attrs(self.test_to_check, expected_data)
 
+    def test_add_results(self):
+        expected_data = {
+            'message': 'test_message',
+            'status': 'failure',
+            'time_taken': 3.2
+        }
+        tests_ids = models.Test.get_tests_ids(self.session,
+                                              self.test_run.id)
+
+        models.Test.add_results(
+            self.session.connection(),
+            [dict(expected_data, test_id=tests_ids[self.test_obj.name])]
+        )
+        self.session.expire_all()
+
+        self.check_model_obj_attrs(self.test_to_check, expected_data)
+
+    def test_add_results_skips_stopped_tests(self):
+        models.Test.update_running_tests(self.session, self.test_run.id)
+        tests_ids = models.Test.get_tests_ids(self.session,
+                                              self.test_run.id)
+
+        models.Test.add_results(
+            self.session.connection(),
+            [{'status': 'running', 'test_id': tests_ids[self.test_obj.name]}]
+        )
+        self.session.expire_all()
+
+        self.assertEqual(self.test_to_check.status, 'stopped')
+
     def test_update_running_tests_default_status(self):
         models.Test.update_running_tests(self.session,
                                          self.test_run.id)
@@ -119,38 +149,57 @@ class TestModelTestMethods(base.BaseIntegrationTest):
 
         self.check_model_obj_attrs(self.test_to_check, expected_attrs)
 
-    def test_properly_copied_test(self):
-        new_test = self.test_obj.copy_test(self.test_run, predefined_tests=[])
 
-        copied_attrs_list = [
-            'name',
-            'title',
-            'description',
-            'duration',
-            'message',
-            'traceback',
-            'step',
-            'time_taken',
-            'meta',
-            'deployment_tags',
-            'available_since_release',
-            'test_set_id',
-        ]
-        attrs = {}
-        for attr_name in copied_attrs_list:
-            attrs[attr_name] = getattr(self.test_obj, attr_name)
+class TestModelClusterTestingPatternMethods(base.BaseIntegrationTest):
 
-        self.check_model_obj_attrs(new_test, attrs)
+    test_set_id = 'general_test'
+    cluster_id = 1
+    tests_count = 3000
 
-        self.assertEqual(new_test.test_run_id, self.test_run.id)
-        self.assertEqual(new_test.status, 'wait_running')
+    def setUp(self):
+        super(TestModelClusterTestingPatternMethods, self).setUp()
+        self.discovery()
 
-    def test_copy_test_with_predefined_list(self):
-        predefined_tests_names = ['some_other_test']
-        new_test = self.test_obj.copy_test(self.test_run,
-                                           predefined_tests_names)
+        self.mock_api_for_cluster(self.cluster_id)
+        mixins.discovery_check(self.session, self.cluster_id)
 
-        self.assertEqual(new_test.status, 'disabled')
+        # catalog of thousands of tests in one pattern, in reverse order
+        generated_names = [
+            'generated_test.GeneratedTest.test_{0:05d}'.format(i)
+            for i in reversed(range(self.tests_count))
+        ]
+        testing_pattern = models.ClusterTestingPattern.query_with_tests(
+            self.session, models.TestingPattern)\
+            .filter(models.ClusterTestingPattern.cluster_id ==
+                    self.cluster_id)\
+            .filter(models.ClusterTestingPattern.test_set_id ==
+                    self.test_set_id)\
+            .one()
+        testing_pattern.tests = testing_pattern.tests + generated_names
+        self.session.flush()
+
+        self.expected_tests = [
+            (test_set_id, name)
+            for test_set_id, tests in
+            models.ClusterTestingPattern.query_with_tests(
+                self.session,
+                models.ClusterTestingPattern.test_set_id,
+                models.TestingPattern.tests)
+            .filter(models.ClusterTestingPattern.cluster_id ==
+                    self.cluster_id)
+            for name in tests
+        ]
+
+    def test_get_cluster_tests_in_single_query(self):
+        with self.count_queries() as statements:
+            cluster_tests = models.ClusterTestingPattern.get_cluster_tests(
+                self.session, self.cluster_id)
+
+        self.assertEqual(len(statements), 1)
+        self.assertGreater(len(cluster_tests), self.tests_count)
+        self.assertEqual([tuple(row) for row in cluster_tests],
+                         sorted(self.expected_tests,
+                                key=lambda test: test[1]))
 
 
 class TestModelTestSetMethods(base.BaseIntegrationTest):
@@ -229,6 +278,37 @@ class TestModelTestRunMethods(base.BaseIntegrationTest):
         self.assertItemsEqual(test_names_from_test_run,
                               test_names_from_test_set)
 
+    def test_add_test_run_copies_tests_on_db_side(self):
+        with self.count_queries() as statements:
+            test_run = models.TestRun.add_test_run(
+                self.session, self.test_set_id,
+                self.cluster_id
+            )
+
+        # select of tests names, insert of test run
+        # and insert ... select of its tests
+        self.assertEqual(len(statements), 3)
+
+        template_tests = self.session.query(models.Test)\
+            .filter_by(test_set_id=self.test_set_id, test_run_id=None)\
+            .all()
+        self.assertEqual(len(test_run.tests), len(template_tests))
+
+        copied_attrs = [
+            'title',
+            'description',
+            'duration',
+            'deployment_tags',
+            'available_since_release',
+        ]
+        tests = dict((test.name, test) for test in test_run.tests)
+        for template in template_tests:
+            copy = tests[template.name]
+            self.assertEqual(copy.status, 'wait_running')
+            for attr_name in copied_attrs:
+                self.assertEqual(getattr(copy, attr_name),
+                                 getattr(template, attr_name))
+
     def test_add_test_run_non_default_status(self):
         expected_status = 'finished'
         test_run = models.TestRun.add_test_run(
@@ -506,3 +586,101 @@ class TestModelTestRunMethods(base.BaseIntegrationTest):
             self.session, self.test_set_id, self.cluster_id
         )
         self.assertTrue(is_last_running)
+
+
+class TestTestRunScheduler(base.BaseIntegrationTest):
+
+    cluster_id = 5
+
+    def setUp(self):
+        super(TestTestRunScheduler, self).setUp()
+
+        self.discovery()
+
+        self.mock_api_for_cluster(self.cluster_id)
+        mixins.discovery_check(self.session, self.cluster_id)
+        self.session.flush()
+
+        self.nose_plugin_patcher = mock.patch(
+            'fuel_plugin.ostf_adapter.storage.models.nose_plugin')
+        self.plugin = self.nose_plugin_patcher.start().get_plugin()
+
+        test_sets = models.TestSet.get_test_sets(
+            self.session, ['gemini_first', 'gemini_second'])
+        metadata = {'cluster_id': self.cluster_id,
+                    'ostf_os_access_creds': {'username': 'admin'}}
+
+        self.first, self.second = models.TestRun.start_many(
+            self.session,
+            [(test_sets['gemini_first'], metadata, None),
+             (test_sets['gemini_second'], metadata, None)],
+            'fake_db_path', token='fake_token')
+
+    def tearDown(self):
+        self.nose_plugin_patcher.stop()
+        models._QUEUED_CREDENTIALS.clear()
+        super(TestTestRunScheduler, self).tearDown()
+
+    def get_test_run(self, frontend):
+        return models.TestRun.get_test_run(self.session, frontend['id'])
+
+    def test_conflicting_test_run_is_queued(self):
+        self.assertEqual(self.first['status'], 'running')
+        self.assertEqual(self.second['status'], 'queued')
+
+        self.assertEqual(self.plugin.run.call_count, 1)
+        # credentials are not stored in db
+        self.assertEqual(self.get_test_run(self.second).queued_args,
+                         {'tests': None})
+
+    def test_queued_test_run_is_started_when_serie_is_free(self):
+        self.assertEqual(models.TestRun.schedule(self.session, 'db'), [])
+
+        self.get_test_run(self.first).update('finished')
+        second = self.get_test_run(self.second)
+
+        self.assertEqual(models.TestRun.schedule(self.session, 'db'),
+                         [second])
+        self.assertEqual(second.status, 'running')
+        self.assertIsNone(second.queued_args)
+        self.plugin.run.assert_called_with(
+            second, second.test_set, 'db', {'username': 'admin'},
+            None, token='fake_token')
+
+    def test_queued_restart_keeps_selected_tests(self):
+        second = self.get_test_run(self.second)
+        tests = [second.tests[0].name]
+        second.queued_args = None
+
+        self.assertTrue(second.run_or_enqueue(
+            second.test_set, 'db', {'username': 'admin'}, tests,
+            token='fake_token'))
+        self.get_test_run(self.first).update('finished')
+        models.TestRun.schedule(self.session, 'db')
+
+        self.plugin.run.assert_called_with(
+            second, second.test_set, 'db', {'username': 'admin'},
+            tests, token='fake_token')
+
+    def test_queued_test_run_is_finished_on_restart(self):
+        second = self.get_test_run(self.second)
+        models._QUEUED_CREDENTIALS.clear()
+
+        self.assertIn(second.id,
+                      models.TestRun.finish_interrupted(self.session))
+        self.session.refresh(second)
+
+        self.assertEqual(second.status, 'finished')
+        self.assertIsNone(second.queued_args)
+        self.assertEqual(models.TestRun.schedule(self.session, 'db'), [])
+
+    def test_stop_queued_test_run(self):
+        second = self.get_test_run(self.second)
+
+        frontend, = models.TestRun.stop_many(self.session, [second])
+
+        self.assertEqual(frontend['status'], 'finished')
+        self.assertFalse(self.plugin.kill.called)
+        self.assertEqual(
+            set(test['status'] for test in frontend['tests']),
+            set(['stopped']))
@@ -14,6 +14,7 @@
 
 import mock
 
+from fuel_plugin.ostf_adapter import mixins
 from fuel_plugin.ostf_adapter.storage import models
 from fuel_plugin.testing.tests import base
 
@@ -34,6 +35,7 @@ class TestTestsController(base.BaseWSGITest):
             resp_tests,
             self.expected['tests']
         )
+        self.assertEqual(resp_tests, sorted(resp_tests))
 
 
 class TestTestSetsController(base.BaseWSGITest):
@@ -150,6 +152,78 @@ class TestTestRunsController(base.BaseWSGITest):
             self.expected['testrun_post']['tests']['names']
         )
 
+    def test_post_many_test_runs_in_constant_queries(self):
+        # make discovery for cluster beforehand
+        self.app.get('/v1/testsets/{0}'.format(self.cluster_id))
+
+        with self.count_queries() as single_statements:
+            self.app.post_json('/v1/testruns/', (
+                {
+                    'testset': 'general_test',
+                    'metadata': {'cluster_id': self.cluster_id}
+                },
+            ))
+
+        with self.count_queries() as bulk_statements:
+            resp = self.app.post_json('/v1/testruns/', [
+                {
+                    'testset': test_set,
+                    'metadata': {'cluster_id': self.cluster_id}
+                }
+                for test_set in ('stopped_test', 'ha_deployment_test',
+                                 'environment_variables')
+            ])
+
+        self.assertEqual(len(bulk_statements), len(single_statements))
+        self.assertEqual(
+            [test_run['testset'] for test_run in resp.json],
+            ['stopped_test', 'ha_deployment_test', 'environment_variables']
+        )
+        self.assertTrue(all(test_run['tests'] for test_run in resp.json))
+        self.assertEqual(self.plugin_mock.run.call_count, 4)
+
+    def test_post_same_test_set_twice(self):
+        resp = self.app.post_json('/v1/testruns/', [
+            {
+                'testset': 'general_test',
+                'metadata': {'cluster_id': self.cluster_id}
+            }
+        ] * 2)
+
+        self.assertEqual(resp.json[0]['testset'], 'general_test')
+        self.assertEqual(resp.json[1], {})
+        self.assertEqual(self.plugin_mock.run.call_count, 1)
+
+    def test_put_many_test_runs(self):
+        resp = self.app.post_json('/v1/testruns/', [
+            {
+                'testset': test_set,
+                'metadata': {'cluster_id': self.cluster_id}
+            }
+            for test_set in ('general_test', 'stopped_test')
+        ])
+        test_runs_ids = [test_run['id'] for test_run in resp.json]
+
+        self.session.query(models.Test)\
+            .filter(models.Test.test_run_id.in_(test_runs_ids))\
+            .update({'status': 'running'}, synchronize_session=False)
+        self.session.commit()
+
+        resp = self.app.put_json('/v1/testruns/', [
+            {'status': 'stopped', 'id': test_run_id}
+            for test_run_id in test_runs_ids
+        ])
+
+        self.assertEqual([test_run['id'] for test_run in resp.json],
+                         test_runs_ids)
+        self.assertEqual(self.plugin_mock.kill.call_count, 2)
+
+        statuses = self.session.query(models.Test.status)\
+            .filter(models.Test.test_run_id.in_(test_runs_ids))\
+            .distinct()\
+            .all()
+        self.assertEqual(statuses, [('stopped',)])
+
     def test_put_stopped(self):
         resp = self.app.post_json('/v1/testruns/', (
             {
@@ -267,6 +341,9 @@ class TestClusterRedeployment(base.BaseWSGITest):
             'deployment_tags': set(['multinode', 'ubuntu', 'nova_network']),
             'release_version': '2015.2-1.0'
         }
+        # attributes of cluster are cached so drop them
+        # to not wait for expiration of cache
+        mixins.invalidate_cluster_attrs(cluster_id)
 
         self.app.get('/v1/testsets/{0}'.format(cluster_id))
 
@@ -304,3 +381,60 @@ class TestVersioning(base.BaseWSGITest):
         }
 
         self.assertTrue(self.is_background_working)
+
+
+class TestSharedTestingPatterns(base.BaseWSGITest):
+
+    @mock.patch('fuel_plugin.ostf_adapter.mixins._get_cluster_attrs')
+    def test_clusters_with_same_signature_share_patterns(
+            self, m_get_cluster_attrs):
+        m_get_cluster_attrs.return_value = {
+            'deployment_tags': set(['ha', 'rhel', 'nova_network']),
+            'release_version': '2015.2-1.0'
+        }
+
+        self.app.get('/v1/testsets/1')
+        patterns_count = self.session.query(models.TestingPattern).count()
+
+        self.app.get('/v1/testsets/2')
+
+        self.assertEqual(
+            self.session.query(models.TestingPattern).count(),
+            patterns_count
+        )
+
+        signatures = self.session\
+            .query(models.ClusterTestingPattern.signature)\
+            .distinct()\
+            .all()
+        self.assertEqual(len(signatures), 1)
+
+        first_cluster_tests = self.app.get('/v1/tests/1').json
+        second_cluster_tests = self.app.get('/v1/tests/2').json
+        self.assertEqual(first_cluster_tests, second_cluster_tests)
+
+    @mock.patch('fuel_plugin.ostf_adapter.mixins._get_cluster_attrs')
+    def test_unused_patterns_are_deleted(self, m_get_cluster_attrs):
+        m_get_cluster_attrs.return_value = {
+            'deployment_tags': set(['ha', 'rhel', 'nova_network']),
+            'release_version': '2015.2-1.0'
+        }
+        self.app.get('/v1/testsets/1')
+        old_signature = self.session\
+            .query(models.ClusterTestingPattern.signature)\
+            .filter_by(cluster_id=1)\
+            .first()[0]
+
+        m_get_cluster_attrs.return_value = {
+            'deployment_tags': set(['multinode', 'ubuntu', 'nova_network']),
+            'release_version': '2015.2-1.0'
+        }
+        mixins.invalidate_cluster_attrs()
+        self.app.get('/v1/testsets/1')
+
+        self.assertEqual(
+            self.session.query(models.TestingPattern)
+            .filter_by(signature=old_signature)
+            .count(),
+            0
+        )
@@ -0,0 +1,115 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import stat
+
+import mock
+import requests_mock
+
+from fuel_health.common import nailgun_snapshot
+from fuel_plugin.ostf_adapter import cluster_snapshot
+from fuel_plugin.ostf_adapter import config
+from fuel_plugin.ostf_adapter import mixins
+from fuel_plugin.testing.tests import base
+
+
+class TestClusterSnapshot(base.BaseUnitTest):
+
+    def setUp(self):
+        config.init_config([])
+        mixins.invalidate_cluster_attrs()
+        self.mocker = requests_mock.Mocker()
+        self.mocker.start()
+
+        cluster = base.CLUSTERS[3]
+        self.mocker.register_uri(
+            'GET', '/api/clusters/3',
+            json=dict(cluster['cluster_meta'], net_provider='neutron'))
+        self.mocker.register_uri('GET', '/api/clusters/3/attributes',
+                                 json=cluster['cluster_attributes'])
+        self.mocker.register_uri('GET', '/api/clusters/3/generated',
+                                 status_code=404, json={})
+        self.mocker.register_uri('GET', '/api/nodes?cluster_id=3',
+                                 json=[])
+        self.mocker.register_uri('GET', '/api/releases/3',
+                                 json=cluster['release_data'])
+        self.mocker.register_uri(
+            'GET', '/api/clusters/3/network_configuration/neutron',
+            json={'networking_parameters': {}})
+
+    def tearDown(self):
+        self.mocker.stop()
+        mixins.invalidate_cluster_attrs()
+        config.cfg.CONF.clear_override('cluster_snapshot_ttl', 'adapter')
+
+    def test_build_snapshot(self):
+        with mock.patch.object(cluster_snapshot.time, 'time',
+                               return_value=100):
+            snapshot = cluster_snapshot.build_snapshot(3, token='token')
+
+        self.assertEqual(snapshot['version'],
+                         nailgun_snapshot.SNAPSHOT_VERSION)
+        self.assertEqual(snapshot['cluster_id'], '3')
+        self.assertEqual(snapshot['expires_at'], 700)
+        # failed responses are not included
+        self.assertEqual(sorted(snapshot['responses']), [
+            '/api/clusters/3',
+            '/api/clusters/3/attributes',
+            '/api/clusters/3/network_configuration/neutron',
+            '/api/nodes?cluster_id=3',
+            '/api/releases/3',
+        ])
+        self.assertEqual(snapshot['responses']['/api/releases/3'],
+                         base.CLUSTERS[3]['release_data'])
+        self.assertTrue(all(
+            request.headers['X-Auth-Token'] == 'token'
+            for request in self.mocker.request_history))
+
+    def test_received_responses_are_not_requested(self):
+        release_data = {'version': 'cached'}
+        snapshot = cluster_snapshot.build_snapshot(
+            3, responses={'/api/releases/3': release_data})
+
+        self.assertEqual(snapshot['responses']['/api/releases/3'],
+                         release_data)
+        self.assertNotIn('/api/releases/3', [
+            request.path_url for request in self.mocker.request_history])
+
+    def test_write_snapshot_reuses_cached_cluster_data(self):
+        mixins.get_cluster_attrs(3)
+        cached_count = self.mocker.call_count
+
+        path = cluster_snapshot.write_snapshot(3)
+        cluster_snapshot.remove_snapshot(path)
+
+        # only generated data and network configuration are requested
+        self.assertEqual(self.mocker.call_count - cached_count, 2)
+
+    def test_write_and_remove_snapshot(self):
+        path = cluster_snapshot.write_snapshot(3)
+
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['cluster_id'], '3')
+
+        cluster_snapshot.remove_snapshot(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_snapshots_disabled(self):
+        config.cfg.CONF.set_override('cluster_snapshot_ttl', 0, 'adapter')
+
+        self.assertIsNone(cluster_snapshot.write_snapshot(3))
+        self.assertFalse(self.mocker.called)
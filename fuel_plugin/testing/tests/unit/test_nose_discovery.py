@@ -12,9 +12,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import os
+
+from mock import MagicMock
 from mock import Mock
 from nose import case
 
+import fuel_plugin
 from fuel_plugin.ostf_adapter.nose_plugin import nose_discovery
 from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
 from fuel_plugin.ostf_adapter.storage import models
@@ -39,7 +44,7 @@ class TestNoseDiscovery(base.BaseUnitTest):
 
     @classmethod
     def setUpClass(cls):
-        session_mock = Mock()
+        session_mock = MagicMock()
         session_mock.begin = TransactionBeginMock
 
         nose_discovery.discovery(
@@ -47,15 +52,15 @@ class TestNoseDiscovery(base.BaseUnitTest):
             session=session_mock
         )
 
-        cls.test_sets = [
-            el[0][0] for el in session_mock.merge.call_args_list
-            if isinstance(el[0][0], models.TestSet)
-        ]
+        # discovered entities are inserted in bulk
+        inserted = collections.defaultdict(list)
+        for el in session_mock.bulk_insert_mappings.call_args_list:
+            model, mappings = el[0]
+            inserted[model].extend(model(**mapping) for mapping in mappings)
 
-        cls.tests = [
-            el[0][0] for el in session_mock.merge.call_args_list
-            if isinstance(el[0][0], models.Test)
-        ]
+        cls.test_sets = inserted[models.TestSet]
+        cls.tests = inserted[models.Test]
+        cls.commits = session_mock.commit.call_count
 
     def _find_needed_test(self, test_name):
         return next(t for t in self.tests if t.name == test_name)
@@ -76,6 +81,8 @@ class TestNoseDiscovery(base.BaseUnitTest):
             )
         )
 
+        self.assertEqual(self.commits, 1)
+
         unique_test_sets = list(
             set([testset.id for testset in self.test_sets])
         )
@@ -225,3 +232,33 @@ class TestNoseDiscovery(base.BaseUnitTest):
             self.assertEqual(data[key], expected[key])
 
         self.assertNotIn('Duration', data['description'])
+
+
+class TestCollectDiscovery(base.BaseUnitTest):
+
+    def test_collect_mode(self):
+        session_mock = Mock()
+
+        plugin = nose_discovery._run_discovery(session_mock, [TEST_PATH])
+
+        self.assertFalse(session_mock.merge.called)
+        self.assertEqual(len(plugin.tests), 29)
+        self.assertEqual(
+            plugin.modules_test_sets[
+                'fuel_plugin.testing.fixture.dummy_tests.general_test'],
+            ['general_test'])
+        self.assertEqual(
+            sum(len(ids) for ids in plugin.modules_test_sets.values()), 10)
+
+    def test_collect_files(self):
+        root = nose_utils.discovery_root(TEST_PATH)
+        files = nose_utils.collect_test_files(root)
+
+        self.assertIn(os.path.join(root, 'general_test.py'), files)
+        self.assertIn(
+            os.path.join(root, 'dependent_testsets', '__init__.py'), files)
+        self.assertEqual(len(files), 14)
+
+        self.assertEqual(
+            nose_utils.discovery_root('fuel_plugin'),
+            os.path.dirname(os.path.abspath(fuel_plugin.__file__)))
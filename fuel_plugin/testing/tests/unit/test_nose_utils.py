@@ -0,0 +1,235 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+import random
+import time
+import unittest
+
+import mock
+from nose import case
+
+from fuel_plugin.ostf_adapter.nose_plugin import nose_utils
+from fuel_plugin.testing.tests import base
+
+
+def _product_deployment_tags(cluster_depl_tags, test_depl_tags):
+    """Reference implementation which checks all combinations
+    of alternative tags.
+    """
+    test_depl_tags = [
+        [alt_tag.strip() for alt_tag in tag.split('|')]
+        for tag in test_depl_tags
+    ]
+
+    for comb in itertools.product(*test_depl_tags):
+        if set(comb).issubset(cluster_depl_tags):
+            return True
+
+    return False
+
+
+class TestAvailabilityCondition(base.BaseUnitTest):
+
+    cluster_data = {
+        'deployment_tags': set(['ha', 'rhel', 'nova_network']),
+        'release_version': '2015.2-7.0',
+    }
+
+    def check_available(self, deployment_tags,
+                        available_since_release=''):
+        return nose_utils.is_test_available(
+            self.cluster_data,
+            {'deployment_tags': deployment_tags,
+             'available_since_release': available_since_release})
+
+    def test_deployment_tags(self):
+        self.assertTrue(self.check_available([]))
+        self.assertTrue(self.check_available(['ha', 'rhel']))
+        self.assertTrue(self.check_available(['ha', 'ubuntu | rhel']))
+        self.assertTrue(self.check_available(['multinode|ha']))
+        self.assertFalse(self.check_available(['ha', 'ubuntu']))
+        self.assertFalse(self.check_available(['multinode | ubuntu']))
+
+    def test_release_versions(self):
+        self.assertTrue(self.check_available([], '2015.2-7.0'))
+        self.assertTrue(self.check_available([], '2014.2-6.1'))
+        self.assertFalse(self.check_available([], '2015.2-8.0'))
+        self.assertFalse(self.check_available([], '2016.1-7.0'))
+        self.assertFalse(self.check_available(['ubuntu'], '2014.2-6.1'))
+
+    def test_release_version_key_order(self):
+        versions = ['6.0', '6.1a1', '6.1b2', '6.1', '6.1.1', '7.0']
+        keys = [nose_utils._release_version_key(v) for v in versions]
+
+        self.assertEqual(keys, sorted(keys))
+
+    def test_matches_product_of_alternatives(self):
+        rnd = random.Random(42)
+        all_tags = ['tag{0}'.format(i) for i in range(8)]
+
+        for _ in range(500):
+            cluster_tags = set(rnd.sample(all_tags, rnd.randint(0, 8)))
+            test_tags = [
+                ' | '.join(rnd.sample(all_tags, rnd.randint(1, 3)))
+                for _ in range(rnd.randint(0, 4))
+            ]
+
+            self.assertEqual(
+                nose_utils._process_deployment_tags(cluster_tags,
+                                                    test_tags),
+                _product_deployment_tags(cluster_tags, test_tags)
+            )
+
+    def test_large_tag_expression(self):
+        # 40 groups of 6 alternatives give 6 ** 40 combinations
+        # which cannot be checked one by one
+        test_tags = [
+            ' | '.join('tag_{0}_{1}'.format(group, alt)
+                       for alt in range(6))
+            for group in range(40)
+        ]
+        cluster_tags = set('tag_{0}_5'.format(group)
+                           for group in range(40))
+        condition = nose_utils.compile_availability(
+            {'deployment_tags': test_tags,
+             'available_since_release': '2015.2-7.0'})
+        compiled_cluster = nose_utils.compile_cluster_data(
+            {'deployment_tags': cluster_tags,
+             'release_version': '2015.2-7.0'})
+
+        started_at = time.time()
+        for _ in range(1000):
+            self.assertTrue(condition.is_satisfied(*compiled_cluster))
+        time_taken = time.time() - started_at
+
+        self.assertLess(time_taken, 1)
+
+
+class SerialCase(object):
+    serial = True
+
+
+class ParallelCase(object):
+    pass
+
+
+class TestGroupTestsByClass(base.BaseUnitTest):
+
+    def test_group_tests_by_class(self):
+        argv = ['a.b:First.test_1', 'a.c:Second.test_1', 'a.b:First.test_2']
+
+        self.assertEqual(
+            list(nose_utils.group_tests_by_class(argv).items()),
+            [('a.b:First', ['a.b:First.test_1', 'a.b:First.test_2']),
+             ('a.c:Second', ['a.c:Second.test_1'])])
+
+    def test_test_path_is_not_grouped(self):
+        self.assertIsNone(
+            nose_utils.group_tests_by_class(['fuel_health/tests/smoke']))
+
+    def test_is_serial_test_class(self):
+        module = 'fuel_plugin.testing.tests.unit.test_nose_utils'
+
+        self.assertTrue(
+            nose_utils.is_serial_test_class(module + ':SerialCase'))
+        self.assertFalse(
+            nose_utils.is_serial_test_class(module + ':ParallelCase'))
+        self.assertTrue(
+            nose_utils.is_serial_test_class(module + ':MissingCase'))
+
+
+class TestTestSetIndex(base.BaseUnitTest):
+
+    def test_matches_as_test_belongs_to_testset(self):
+        test_set_ids = ['ha', 'sanity', 'ha_test', 'test', 'a.b', '_ha']
+        index = nose_utils.TestSetIndex(test_set_ids)
+
+        random.seed(2)
+        chars = 'ha_.tes'
+        for _ in range(5000):
+            test_id = ''.join(random.choice(chars)
+                              for _ in range(random.randint(1, 12)))
+            expected = set(
+                test_set_id for test_set_id in test_set_ids
+                if nose_utils.test_belongs_to_testset(test_id, test_set_id))
+            self.assertEqual(index.match(test_id), expected, test_id)
+
+    def test_match(self):
+        index = nose_utils.TestSetIndex(['ha', 'smoke', 'ha_smoke'])
+
+        self.assertEqual(
+            index.match('fuel_health.tests.ha.test_ha_smoke.Test.test_1'),
+            set(['ha', 'smoke', 'ha_smoke']))
+        self.assertEqual(index.match('fuel_health.tests.sahara.Test'),
+                         set())
+
+
+class TestTestMetadata(base.BaseUnitTest):
+
+    def test_parse_duration(self):
+        cases = {
+            '20 s.': 20,
+            ' 1200 s.': 1200,
+            '0sec': 0,
+            '25sec': 25,
+            '2 min': 120,
+            '1.5 h': 5400,
+            '30': 30,
+            'about a minute': None,
+            '10 parsecs': None,
+            None: None,
+        }
+        for duration, seconds in cases.items():
+            self.assertEqual(nose_utils.parse_duration(duration), seconds,
+                             duration)
+
+    def test_parse_docstring(self):
+        metadata = nose_utils.parse_docstring(
+            """Create volume
+            Target component: Cinder
+            Duration: 200 s.
+            Deployment tags: Ceph, ha
+            Available since release: 2014.2-6.1
+            """)
+
+        self.assertEqual(metadata.title, 'Create volume')
+        self.assertEqual(metadata.duration, '200 s.')
+        self.assertEqual(metadata.duration_seconds, 200)
+        self.assertEqual(metadata.deployment_tags, ('ceph', 'ha'))
+        self.assertEqual(metadata.available_since_release, '2014.2-6.1')
+        self.assertNotIn('Duration', metadata.description)
+
+        self.assertEqual(metadata.to_dict()['deployment_tags'],
+                         ['ceph', 'ha'])
+        self.assertIs(nose_utils.parse_docstring(None),
+                      nose_utils.EMPTY_METADATA)
+
+    def test_metadata_is_cached_per_test_method(self):
+        class DummyTest(unittest.TestCase):
+            def test_first(self):
+                """First test
+                Duration: 5 s.
+                """
+
+        test = case.Test(DummyTest('test_first'))
+        with mock.patch.object(nose_utils, 'parse_docstring',
+                               wraps=nose_utils.parse_docstring) as m_parse:
+            first = nose_utils.get_test_metadata(test)
+            second = nose_utils.get_test_metadata(
+                case.Test(DummyTest('test_first')))
+
+        self.assertIs(first, second)
+        self.assertEqual(m_parse.call_count, 1)
+        self.assertEqual(first.duration_seconds, 5)
@@ -0,0 +1,99 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import json
+import os
+import tempfile
+import time
+
+import mock
+
+from fuel_plugin.ostf_adapter import config
+from fuel_plugin.ostf_adapter.nose_plugin import nose_adapter
+from fuel_plugin.testing.tests import base
+
+
+RUNS_FILE = tempfile.NamedTemporaryFile(suffix='.runs')
+
+
+def record_run(session, argv):
+    started = time.time()
+    time.sleep(0.5)
+    with open(RUNS_FILE.name, 'a') as f:
+        f.write(json.dumps([os.getpid(), argv, started, time.time()]) +
+                '\n')
+
+
+class TestParallelRun(base.BaseUnitTest):
+
+    def setUp(self):
+        config.init_config([])
+        config.cfg.CONF.set_override(
+            'parallel_test_classes', 2, group='adapter')
+
+        self.driver = nose_adapter.NoseDriver()
+        self.classes = collections.OrderedDict([
+            ('m:A', ['m:A.test_1', 'm:A.test_2']),
+            ('m:B', ['m:B.test_1']),
+            ('m:C', ['m:C.test_1']),
+        ])
+
+        self.session_patcher = mock.patch.object(
+            nose_adapter.engine, 'contexted_session',
+            return_value=mock.MagicMock())
+        self.session_patcher.start()
+
+        RUNS_FILE.truncate(0)
+
+    def tearDown(self):
+        self.session_patcher.stop()
+        config.cfg.CONF.clear_override('parallel_test_classes',
+                                       group='adapter')
+
+    def collect_runs(self):
+        with open(RUNS_FILE.name) as f:
+            return [json.loads(line) for line in f]
+
+    @mock.patch.object(nose_adapter.nose_utils, 'is_serial_test_class',
+                       return_value=False)
+    def test_classes_run_in_parallel(self, _):
+        self.driver._run_parallel(record_run, None, 'db', self.classes)
+
+        runs = self.collect_runs()
+        self.assertEqual(sorted(run[1] for run in runs),
+                         sorted(self.classes.values()))
+        self.assertNotIn(os.getpid(), [run[0] for run in runs])
+
+        # first two classes overlap, third one waits for free slot
+        by_class = dict((argv[0], (started, ended))
+                        for _, argv, started, ended in runs)
+        self.assertLess(by_class['m:B.test_1'][0],
+                        by_class['m:A.test_1'][1])
+        self.assertGreaterEqual(by_class['m:C.test_1'][0],
+                                min(by_class['m:A.test_1'][1],
+                                    by_class['m:B.test_1'][1]))
+
+    def test_serial_classes_run_after_parallel_ones(self):
+        with mock.patch.object(
+                nose_adapter.nose_utils, 'is_serial_test_class',
+                side_effect=lambda path: path != 'm:A'):
+            self.driver._run_parallel(record_run, 'session', 'db',
+                                      self.classes)
+
+        shard, serial = self.collect_runs()
+        self.assertEqual(shard[1], ['m:A.test_1', 'm:A.test_2'])
+        self.assertEqual(serial[0], os.getpid())
+        self.assertEqual(serial[1], ['m:B.test_1', 'm:C.test_1'])
+        self.assertGreaterEqual(serial[2], shard[3])
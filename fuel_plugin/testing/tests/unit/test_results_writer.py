@@ -0,0 +1,134 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import mock
+
+from fuel_plugin.ostf_adapter import config
+from fuel_plugin.ostf_adapter.nose_plugin import nose_storage_plugin
+from fuel_plugin.testing.tests import base
+
+
+class TestResultsWriter(base.BaseUnitTest):
+
+    def setUp(self):
+        config.init_config([])
+
+        self.session = mock.MagicMock()
+        self.connection = \
+            self.session.get_bind.return_value.begin.return_value.\
+            __enter__.return_value
+
+        self.get_ids_patcher = mock.patch(
+            'fuel_plugin.ostf_adapter.storage.models.Test.get_tests_ids',
+            return_value={'test_a': 1, 'test_b': 2})
+        self.get_ids_patcher.start()
+
+        self.add_results_patcher = mock.patch(
+            'fuel_plugin.ostf_adapter.storage.models.Test.add_results')
+        self.m_add_results = self.add_results_patcher.start()
+
+    def tearDown(self):
+        self.get_ids_patcher.stop()
+        self.add_results_patcher.stop()
+
+    def test_results_are_coalesced(self):
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=60)
+
+        writer.add('test_a', {'status': 'running'})
+        writer.add('test_b', {'status': 'running'})
+        writer.add('test_a', {'status': 'success'})
+        self.assertFalse(self.m_add_results.called)
+
+        writer.close()
+
+        self.m_add_results.assert_called_once_with(
+            self.connection,
+            [{'status': 'running', 'test_id': 2},
+             {'status': 'success', 'test_id': 1}])
+
+    def test_unknown_tests_are_skipped(self):
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=60)
+
+        writer.add('test_c', {'status': 'running'})
+        writer.close()
+
+        self.assertFalse(self.m_add_results.called)
+
+    def test_synchronous_writes(self):
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=0)
+
+        writer.add('test_a', {'status': 'running'})
+        writer.add('test_a', {'status': 'success'})
+
+        self.assertEqual(self.m_add_results.call_count, 2)
+        writer.close()
+        self.assertEqual(self.m_add_results.call_count, 2)
+
+    def test_results_are_flushed_in_background(self):
+        flushed = threading.Event()
+        self.m_add_results.side_effect = lambda *args: flushed.set()
+
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=0.01)
+        writer.add('test_a', {'status': 'running'})
+
+        self.assertTrue(flushed.wait(5))
+        writer.close()
+
+        self.m_add_results.assert_called_once_with(
+            self.connection, [{'status': 'running', 'test_id': 1}])
+
+    def test_failed_results_are_written_by_next_flush(self):
+        self.m_add_results.side_effect = [Exception('db is gone'), None]
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=60)
+
+        writer.add('test_a', {'status': 'running'})
+        self.assertRaises(Exception, writer.flush)
+        writer.add('test_b', {'status': 'success'})
+        writer.close()
+
+        self.assertEqual(
+            self.m_add_results.call_args,
+            mock.call(self.connection,
+                      [{'status': 'running', 'test_id': 1},
+                       {'status': 'success', 'test_id': 2}]))
+
+    @mock.patch.object(nose_storage_plugin.time, 'sleep')
+    def test_close_raises_when_results_are_not_written(self, m_sleep):
+        self.m_add_results.side_effect = Exception('db is gone')
+        writer = nose_storage_plugin.ResultsWriter(
+            self.session, 1, flush_interval=60)
+
+        writer.add('test_a', {'status': 'success'})
+
+        self.assertRaises(Exception, writer.close)
+        self.assertEqual(self.m_add_results.call_count,
+                         nose_storage_plugin.CLOSE_ATTEMPTS)
+
+    def test_pending_results_are_written_on_finalize(self):
+        plugin = nose_storage_plugin.StoragePlugin(
+            self.session, 1, 1, {}, None, mock.Mock())
+        self.addCleanup(plugin.results_writer.close)
+
+        plugin.results_writer.add('test_a', {'status': 'success'})
+        plugin.finalize(None)
+
+        self.m_add_results.assert_called_once_with(
+            self.connection, [{'status': 'success', 'test_id': 1}])
@@ -0,0 +1,370 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import os
+import subprocess
+import time
+
+import mock
+
+from fuel_health.common import ssh
+from fuel_plugin.testing.tests import base
+
+
+def make_connection():
+    connection = mock.Mock()
+    connection.get_transport.return_value.is_active.return_value = True
+    return connection
+
+
+class TestConnectionPool(base.BaseUnitTest):
+
+    def setUp(self):
+        ssh.close_vm_tunnels()
+        ssh.close_pooled_connections()
+        self.client = ssh.Client('10.20.0.2', 'root', 'pass')
+        patcher = mock.patch.object(
+            ssh.Client, '_get_ssh_connection',
+            side_effect=lambda: make_connection())
+        self.get_ssh_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(ssh.close_pooled_connections)
+        self.addCleanup(ssh.close_vm_tunnels)
+
+    def entry(self):
+        return ssh._POOL[self.client._pool_key]
+
+    def age(self):
+        self.entry().last_used = time.time() - ssh.POOL_IDLE_TIMEOUT - 1
+
+    def test_connection_is_reused(self):
+        first = self.client._acquire_connection()
+        ssh._release_connection(self.client._pool_key, first)
+        other = ssh.Client('10.20.0.2', 'root', 'pass')
+        second = other._acquire_connection()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.get_ssh_connection.call_count, 1)
+        self.assertEqual(self.entry().users, 1)
+
+    def test_broken_connection_is_replaced(self):
+        first = self.client._acquire_connection()
+        first.get_transport.return_value.is_active.return_value = False
+        second = self.client._acquire_connection()
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.close.called)
+
+    def test_idle_connection_is_evicted(self):
+        connection = self.client._acquire_connection()
+        ssh._release_connection(self.client._pool_key, connection)
+        self.age()
+        ssh._evict_idle()
+
+        self.assertNotIn(self.client._pool_key, ssh._POOL)
+        self.assertTrue(connection.close.called)
+
+    def test_used_connection_is_not_evicted(self):
+        connection = self.client._acquire_connection()
+        self.age()
+        ssh._evict_idle()
+
+        self.assertIs(self.entry().connection, connection)
+        self.assertFalse(connection.close.called)
+
+    def test_release_refreshes_time_of_use(self):
+        connection = self.client._acquire_connection()
+        self.age()
+        ssh._release_connection(self.client._pool_key, connection)
+        ssh._evict_idle()
+
+        self.assertIs(self.entry().connection, connection)
+        self.assertEqual(self.entry().users, 0)
+
+    def test_connection_is_used_while_command_runs(self):
+        connection = make_connection()
+        self.get_ssh_connection.side_effect = None
+        self.get_ssh_connection.return_value = connection
+        channel = connection.get_transport.return_value.open_session\
+            .return_value
+
+        with self.client._session() as opened:
+            self.assertIs(opened, channel)
+            self.assertEqual(self.entry().users, 1)
+
+        self.assertEqual(self.entry().users, 0)
+        self.assertTrue(channel.close.called)
+
+    def test_connection_under_tunnel_is_not_evicted(self):
+        with mock.patch('paramiko.Transport') as transport_cls:
+            transport = transport_cls.return_value
+            transport.is_active.return_value = True
+            self.assertIs(
+                self.client._get_vm_transport('cirros', 'pass', '10.0.0.3'),
+                transport)
+            self.age()
+            ssh._evict_idle()
+            connection = self.entry().connection
+            self.assertFalse(connection.close.called)
+
+            self.age()
+            self.assertIs(
+                self.client._get_vm_transport('cirros', 'pass', '10.0.0.3'),
+                transport)
+            self.assertEqual(transport_cls.call_count, 1)
+            self.assertGreater(self.entry().last_used,
+                               time.time() - ssh.POOL_IDLE_TIMEOUT)
+
+        ssh.close_vm_tunnels()
+        self.assertTrue(transport.close.called)
+        self.assertEqual(self.entry().users, 0)
+
+    def test_broken_tunnel_is_replaced(self):
+        with mock.patch('paramiko.Transport') as transport_cls:
+            stale, fresh = mock.Mock(), mock.Mock()
+            transport_cls.side_effect = [stale, fresh]
+            stale.open_session.side_effect = ssh.paramiko.SSHException()
+            fresh.open_session.return_value.recv_exit_status.return_value = 0
+            with mock.patch.object(ssh.Client, '_read_channel'):
+                self.client.exec_command_on_vm('true', 'cirros', 'pass',
+                                               '10.0.0.3')
+                self.client.exec_command_on_vm('true', 'cirros', 'pass',
+                                               '10.0.0.3')
+
+        self.assertTrue(stale.close.called)
+        self.assertFalse(fresh.close.called)
+        self.assertEqual(fresh.open_session.call_count, 2)
+        # only transport which is kept uses jump connection
+        self.assertEqual(self.entry().users, 1)
+
+    def test_failed_tunnel_releases_connection(self):
+        with mock.patch('paramiko.Transport') as transport_cls:
+            transport = transport_cls.return_value
+            transport.auth_password.side_effect = \
+                ssh.paramiko.AuthenticationException()
+            self.assertRaises(
+                ssh.paramiko.AuthenticationException,
+                self.client._get_vm_transport, 'cirros', 'pass', '10.0.0.3')
+
+        self.assertTrue(transport.close.called)
+        self.assertEqual(self.entry().users, 0)
+        self.assertEqual(ssh._VM_TRANSPORTS, {})
+
+    def test_pool_is_reset_in_child_process(self):
+        connection = self.client._acquire_connection()
+        with mock.patch('os.getpid', return_value=ssh._POOL_PID + 1):
+            other = self.client._acquire_connection()
+
+        self.assertIsNot(connection, other)
+        # socket of parent's connection must not be closed by child
+        self.assertFalse(connection.close.called)
+        self.assertEqual(self.entry().users, 1)
+
+
+class TestOutputBuffer(base.BaseUnitTest):
+
+    def write(self, buf, chunks):
+        for chunk in chunks:
+            buf.write(chunk)
+        buf.close()
+
+    def test_chunks_are_passed_to_callback(self):
+        received = []
+        buf = ssh.OutputBuffer(received.append)
+        self.write(buf, ['ab', 'c\nd', 'e'])
+
+        self.assertEqual(received, ['ab', 'c\nd', 'e'])
+        self.assertEqual(buf.getvalue(), 'abc\nde')
+
+    def test_lines_are_joined_from_chunks(self):
+        received = []
+        buf = ssh.OutputBuffer(received.append, lines=True)
+        self.write(buf, ['fir', 'st\nsec', 'ond\n', '\nthird\nla', 'st'])
+
+        self.assertEqual(received,
+                         ['first\n', 'second\n', '\n', 'third\n', 'last'])
+
+    def test_partial_line_is_not_passed_before_close(self):
+        received = []
+        buf = ssh.OutputBuffer(received.append, lines=True)
+        buf.write('no newline')
+        self.assertEqual(received, [])
+
+        buf.close()
+        self.assertEqual(received, ['no newline'])
+
+    def test_tail_keeps_last_bytes(self):
+        buf = ssh.OutputBuffer(tail=5)
+        self.write(buf, ['12345', '678', '9', '0abc'])
+
+        self.assertEqual(buf.getvalue(), '90abc')
+        self.assertLessEqual(buf._size, 5 + len('0abc'))
+
+    def test_tail_larger_than_output(self):
+        buf = ssh.OutputBuffer(tail=100)
+        self.write(buf, ['12', '34'])
+
+        self.assertEqual(buf.getvalue(), '1234')
+
+    def test_zero_tail_retains_nothing(self):
+        received = []
+        buf = ssh.OutputBuffer(received.append, lines=True, tail=0)
+        self.write(buf, ['a\nb', 'c\n'])
+
+        self.assertEqual(buf.getvalue(), '')
+        self.assertEqual(len(buf._chunks), 0)
+        self.assertEqual(received, ['a\n', 'bc\n'])
+
+
+class TestBatch(base.BaseUnitTest):
+
+    COMMANDS = collections.OrderedDict([
+        ('out', 'echo "$HOME" \'quoted\'; echo err >&2'),
+        ('status', 'exit 3'),
+        ('no_newline', 'printf "partial"'),
+        ('heredoc', 'cat <<EOF\nline\nEOF'),
+        ('slow', 'echo started; sleep 3; echo finished'),
+    ])
+
+    def run_script(self, script, deadline=None):
+        process = subprocess.Popen(['sh', '-c', script],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        out, err = process.communicate()
+        return process.returncode, out, err
+
+    def exec_batch(self, parallel=True, deadline=None):
+        client = ssh.Client('10.20.0.2', 'root', 'pass')
+        with mock.patch.object(client, 'stream_command',
+                               side_effect=self.run_script):
+            return client.exec_batch(self.COMMANDS, parallel=parallel,
+                                     deadline=deadline)
+
+    def check_finished(self, results):
+        self.assertEqual(results.keys(), self.COMMANDS.keys())
+        self.assertEqual(results['out'],
+                         (0, '{0} quoted\n'.format(os.environ['HOME']),
+                          'err\n'))
+        self.assertEqual(results['status'], (3, '', ''))
+        self.assertEqual(results['no_newline'], (0, 'partial', ''))
+        self.assertEqual(results['heredoc'], (0, 'line\n', ''))
+
+    def test_parallel_commands(self):
+        start = time.time()
+        results = self.exec_batch()
+
+        self.check_finished(results)
+        self.assertEqual(results['slow'], (0, 'started\nfinished\n', ''))
+        self.assertLess(time.time() - start, 6)
+
+    def test_unfinished_commands_on_deadline(self):
+        start = time.time()
+        results = self.exec_batch(deadline=time.time() + 2)
+
+        self.assertLess(time.time() - start, 2)
+        self.check_finished(results)
+        self.assertEqual(results['slow'], (None, 'started\n', ''))
+
+    def test_sequential_commands_on_deadline(self):
+        self.COMMANDS = collections.OrderedDict(
+            self.COMMANDS.items() + [('last', 'echo last')])
+        results = self.exec_batch(parallel=False, deadline=time.time() + 2)
+
+        self.check_finished(results)
+        self.assertEqual(results['slow'], (None, 'started\n', ''))
+        # commands after deadline are not started
+        self.assertEqual(results['last'], (None, '', ''))
+
+    def test_broken_output(self):
+        client = ssh.Client('10.20.0.2', 'root', 'pass')
+        with mock.patch.object(client, 'stream_command',
+                               return_value=(1, 'garbage', 'no tar')):
+            self.assertRaises(ssh.exceptions.SSHExecCommandFailed,
+                              client.exec_batch, self.COMMANDS)
+
+
+class TestReadChannel(base.BaseUnitTest):
+
+    def test_deadline_stops_command_with_steady_output(self):
+        client = ssh.Client('10.20.0.2', 'root', 'pass')
+        channel = mock.Mock(closed=False)
+        channel.recv_ready.return_value = True
+        channel.recv_stderr_ready.return_value = False
+        channel.recv.return_value = 'y\n'
+        stdout = ssh.OutputBuffer(tail=10)
+        stderr = ssh.OutputBuffer()
+
+        with mock.patch('select.select', return_value=([channel], [], [])):
+            self.assertRaises(
+                ssh.exceptions.TimeoutException, client._read_channel,
+                channel, 'yes', stdout, stderr, deadline=time.time() + 0.1)
+
+        self.assertTrue(channel.recv.called)
+
+
+class TestExecOnHosts(base.BaseUnitTest):
+
+    HOSTS = ['node-{0}'.format(i) for i in range(10)]
+
+    def run_command(self, client, cmd, get_pty=False, deadline=None):
+        index = self.HOSTS.index(client.host)
+        # hosts finish in reverse order
+        time.sleep(0.01 * (len(self.HOSTS) - index))
+        if index == 3:
+            raise ssh.exceptions.TimeoutException('no output')
+        if index == 5:
+            raise ValueError()
+        return index % 2, client.host, ''
+
+    def test_results_are_ordered_as_hosts(self):
+        with mock.patch.object(ssh.Client, 'run_command', autospec=True,
+                               side_effect=self.run_command):
+            results = ssh.exec_on_hosts(self.HOSTS, 'hostname', 'root',
+                                        max_workers=4, password='pass')
+
+        self.assertEqual(results.keys(), self.HOSTS)
+        for index, host in enumerate(self.HOSTS):
+            result = results[host]
+            if index in (3, 5):
+                continue
+            self.assertIsNone(result.error)
+            self.assertEqual(result.exit_status, index % 2)
+            self.assertEqual(result.stdout, host)
+
+    def test_errors_are_reported_per_host(self):
+        with mock.patch.object(ssh.Client, 'run_command', autospec=True,
+                               side_effect=self.run_command):
+            results = ssh.exec_on_hosts(self.HOSTS, 'hostname', 'root',
+                                        password='pass')
+
+        self.assertIn('no output', results['node-3'].error)
+        self.assertEqual(results['node-5'].error, 'ValueError')
+        for host in ('node-3', 'node-5'):
+            self.assertIsNone(results[host].exit_status)
+            self.assertIsNone(results[host].stdout)
+        self.assertEqual(
+            [host for host, result in results.items() if result.error],
+            ['node-3', 'node-5'])
+
+    def test_deadline_limits_connection_timeout(self):
+        with mock.patch.object(ssh.Client, 'run_command', autospec=True,
+                               return_value=(0, '', '')) as run_command:
+            ssh.exec_on_hosts(self.HOSTS[:1], 'true', 'root', deadline=5,
+                              timeout=300, password='pass')
+
+        client = run_command.call_args[0][0]
+        self.assertEqual(client.timeout, 5)
+        self.assertLessEqual(run_command.call_args[1]['deadline'],
+                             time.time() + 5)
@@ -0,0 +1,174 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+
+from mock import Mock
+
+from fuel_plugin.ostf_adapter.nose_plugin import nose_discovery
+from fuel_plugin.ostf_adapter.nose_plugin import static_discovery
+from fuel_plugin.testing.tests import base
+
+
+TEST_PATH = 'fuel_plugin/testing/fixture/dummy_tests'
+
+TEST_SET_FIELDS = ('id', 'description', 'test_path', 'driver',
+                   'deployment_tags', 'test_runs_ordering_priority',
+                   'exclusive_testsets', 'available_since_release')
+
+
+def _test_sets_data(test_sets):
+    return dict(
+        (test_set_id, [getattr(test_set, field)
+                       for field in TEST_SET_FIELDS])
+        for test_set_id, test_set in test_sets.items()
+    )
+
+
+def _tests_data(tests):
+    return dict(((test['test_set_id'], test['name']), test)
+                for test in tests)
+
+
+class TestStaticDiscoveryParity(base.BaseUnitTest):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nose_result = nose_discovery._run_discovery(Mock(), [TEST_PATH])
+        cls.static_result = nose_discovery._run_discovery(
+            Mock(), [TEST_PATH], engine='ast')
+
+    def test_test_sets(self):
+        self.assertEqual(len(self.static_result.test_sets), 10)
+        self.assertEqual(_test_sets_data(self.static_result.test_sets),
+                         _test_sets_data(self.nose_result.test_sets))
+
+    def test_modules_test_sets(self):
+        self.assertEqual(dict(self.static_result.modules_test_sets),
+                         dict(self.nose_result.modules_test_sets))
+
+    def test_tests(self):
+        self.assertEqual(len(self.static_result.tests), 29)
+        self.assertEqual(_tests_data(self.static_result.tests),
+                         _tests_data(self.nose_result.tests))
+
+    def test_modules_are_not_imported(self):
+        module_name = 'fuel_plugin.testing.fixture.dummy_tests.general_test'
+        sys.modules.pop(module_name, None)
+
+        static_discovery.StaticDiscovery().discover([TEST_PATH])
+
+        self.assertNotIn(module_name, sys.modules)
+
+
+class TestStaticDiscoveryClasses(base.BaseUnitTest):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        sys.path.insert(0, self.root)
+
+        self._write('static_pkg/__init__.py', '')
+        self._write('static_pkg/bases.py', '''
+            import unittest
+
+
+            class BaseTest(unittest.TestCase):
+
+                def test_base(self):
+                    """Base test
+                    Duration: 10 s
+                    """
+
+                def test_overridden(self):
+                    """Base docstring"""
+
+                def helper(self):
+                    pass
+        ''')
+        self._write('static_pkg/tests/__init__.py', '''
+            __profile__ = {
+                "id": "tests",
+                "driver": "nose",
+                "test_path": "static_pkg/tests",
+                "description": "Static tests",
+                "deployment_tags": ["Ha"],
+                "test_runs_ordering_priority": 1,
+                "exclusive_testsets": []
+            }
+        ''')
+        self._write('static_pkg/tests/test_child.py', '''
+            from static_pkg import bases as base_tests
+            from static_pkg.bases import BaseTest as Imported
+
+
+            class ChildTest(base_tests.BaseTest):
+
+                def test_overridden(self):
+                    """Child docstring"""
+
+
+            class _PrivateTest(Imported):
+                pass
+
+
+            class DisabledTest(Imported):
+                __test__ = False
+
+
+            class NotATest(object):
+
+                def test_nothing(self):
+                    pass
+        ''')
+
+    def tearDown(self):
+        sys.path.remove(self.root)
+        shutil.rmtree(self.root)
+
+    def _write(self, path, source):
+        filepath = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as f:
+            f.write(textwrap.dedent(source))
+
+    def test_inherited_and_imported_classes(self):
+        result = static_discovery.StaticDiscovery().discover(
+            [os.path.join(self.root, 'static_pkg', 'tests')])
+
+        self.assertEqual(result.test_sets['tests'].deployment_tags, ['ha'])
+        self.assertEqual(dict(result.modules_test_sets),
+                         {'static_pkg.tests': ['tests']})
+
+        tests = dict((test['name'], test) for test in result.tests)
+        prefix = 'static_pkg.tests.test_child.'
+        self.assertEqual(sorted(tests), [
+            prefix + 'BaseTest.test_base',
+            prefix + 'BaseTest.test_overridden',
+            prefix + 'ChildTest.test_base',
+            prefix + 'ChildTest.test_overridden',
+        ])
+
+        self.assertEqual(tests[prefix + 'ChildTest.test_base']['duration'],
+                         '10 s')
+        self.assertEqual(
+            tests[prefix + 'ChildTest.test_overridden']['title'],
+            'Child docstring')
+        self.assertEqual(
+            tests[prefix + 'BaseTest.test_overridden']['title'],
+            'Base docstring')
@@ -12,10 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 import requests_mock
 
 from fuel_plugin.ostf_adapter import config
 from fuel_plugin.ostf_adapter import mixins
+from fuel_plugin.ostf_adapter.storage import models
 from fuel_plugin.testing.tests import base
 
 
@@ -48,4 +50,168 @@ class TestDeplTagsGetter(base.BaseUnitTest):
                            json=cluster['cluster_node'])
             res = mixins._get_cluster_attrs(expected['cluster_id'])
 
+        responses = res.pop('responses')
         self.assertEqual(res, expected['attrs'])
+        self.assertEqual(sorted(responses), [
+            '/api/clusters/3',
+            '/api/clusters/3/attributes',
+            '/api/nodes?cluster_id=3',
+            '/api/releases/3',
+        ])
+
+
+class TestClusterAttrsCache(base.BaseUnitTest):
+
+    cluster_id = 3
+
+    def setUp(self):
+        config.init_config([])
+        mixins.invalidate_cluster_attrs()
+
+        self.fetch_patcher = mock.patch.object(
+            mixins, '_get_cluster_attrs',
+            return_value={'deployment_tags': set(['ha']),
+                          'release_version': '2015.2-1.0'})
+        self.m_fetch = self.fetch_patcher.start()
+
+    def tearDown(self):
+        self.fetch_patcher.stop()
+        mixins.invalidate_cluster_attrs()
+        config.cfg.CONF.clear_override('nailgun_cache_ttl', 'adapter')
+
+    def test_attrs_are_cached(self):
+        first = mixins.get_cluster_attrs(self.cluster_id)
+        second = mixins.get_cluster_attrs(str(self.cluster_id))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.m_fetch.call_count, 1)
+
+    def test_expired_attrs_are_refetched(self):
+        config.cfg.CONF.set_override('nailgun_cache_ttl', 10, 'adapter')
+
+        with mock.patch.object(mixins.time, 'time', return_value=100):
+            mixins.get_cluster_attrs(self.cluster_id)
+        with mock.patch.object(mixins.time, 'time', return_value=111):
+            mixins.get_cluster_attrs(self.cluster_id)
+
+        self.assertEqual(self.m_fetch.call_count, 2)
+
+    def test_caching_disabled(self):
+        config.cfg.CONF.set_override('nailgun_cache_ttl', 0, 'adapter')
+
+        mixins.get_cluster_attrs(self.cluster_id)
+        mixins.get_cluster_attrs(self.cluster_id)
+
+        self.assertEqual(self.m_fetch.call_count, 2)
+
+    def test_invalidate_cluster_attrs(self):
+        mixins.get_cluster_attrs(self.cluster_id)
+        mixins.invalidate_cluster_attrs(self.cluster_id)
+        mixins.get_cluster_attrs(self.cluster_id)
+
+        self.assertEqual(self.m_fetch.call_count, 2)
+
+    def test_failed_fetch_is_not_cached(self):
+        self.m_fetch.side_effect = [ValueError(), mock.DEFAULT]
+
+        self.assertRaises(ValueError,
+                          mixins.get_cluster_attrs, self.cluster_id)
+        mixins.get_cluster_attrs(self.cluster_id)
+
+        self.assertEqual(self.m_fetch.call_count, 2)
+
+
+class TestTestRepository(base.BaseUnitTest):
+
+    def make_set(self, test_set_id, tests_names, priority=None):
+        test_set = models.TestSet(id=test_set_id,
+                                  description=test_set_id,
+                                  deployment_tags=['ha'],
+                                  available_since_release='',
+                                  test_runs_ordering_priority=priority)
+        test_set.tests = [
+            models.Test(name=name, title=name, test_set_id=test_set_id,
+                        deployment_tags=[], available_since_release='')
+            for name in tests_names
+        ]
+        return test_set
+
+    def test_indexes(self):
+        repository = mixins.TestRepository([
+            self.make_set('first', ['a.A.test_1', 'a.A.test_2']),
+            self.make_set('second', ['b.B.test_1']),
+        ])
+
+        self.assertEqual(len(repository), 2)
+        self.assertEqual(
+            repository.get_test_set('second')['frontend'],
+            {'id': 'second', 'name': 'second'})
+        self.assertIsNone(repository.get_test_set('third'))
+
+        test = repository.get_test('first', 'a.A.test_2')
+        self.assertEqual(test['frontend']['id'], 'a.A.test_2')
+        self.assertEqual(test['frontend']['testset'], 'first')
+        self.assertIsNone(repository.get_test('second', 'a.A.test_2'))
+
+    def test_tests_of_test_runs_are_skipped(self):
+        test_set = self.make_set('first', ['a.A.test_1'])
+        test_set.tests.append(
+            models.Test(name='a.A.test_1', test_set_id='first',
+                        test_run_id=1, deployment_tags=[],
+                        available_since_release=''))
+
+        repository = mixins.TestRepository([test_set])
+
+        self.assertEqual(
+            len(repository.get_test_set('first')['tests']), 1)
+
+    def test_version(self):
+        first = mixins.TestRepository(
+            [self.make_set('first', ['a.A.test_1'])])
+        same = mixins.TestRepository(
+            [self.make_set('first', ['a.A.test_1'])])
+        changed = mixins.TestRepository(
+            [self.make_set('first', ['a.A.test_1', 'a.A.test_2'])])
+
+        self.assertEqual(first.version, same.version)
+        self.assertNotEqual(first.version, changed.version)
+
+    def test_version_does_not_depend_on_order(self):
+        first = mixins.TestRepository([
+            self.make_set('first', ['a.A.test_1', 'a.A.test_2']),
+            self.make_set('second', ['b.B.test_1']),
+        ])
+        reordered = mixins.TestRepository([
+            self.make_set('second', ['b.B.test_1']),
+            self.make_set('first', ['a.A.test_2', 'a.A.test_1']),
+        ])
+
+        self.assertEqual(first.version, reordered.version)
+
+    def test_empty_repository_is_built_once(self):
+        session = mock.Mock()
+        query = session.query.return_value.options.return_value
+        query.all.return_value = []
+
+        with mock.patch.object(mixins, 'TEST_REPOSITORY', None):
+            mixins.get_test_repository(session)
+            mixins.get_test_repository(session)
+
+        self.assertEqual(query.all.call_count, 1)
+
+    def test_cache_test_repository_replaces_repository(self):
+        session = mock.Mock()
+        query = session.query.return_value.options.return_value
+        query.all.return_value = [self.make_set('first', [])]
+
+        with mock.patch.object(mixins, 'TEST_REPOSITORY', None):
+            mixins.cache_test_repository(session)
+            old_repository = mixins.TEST_REPOSITORY
+
+            query.all.return_value = [self.make_set('second', [])]
+            mixins.cache_test_repository(session)
+
+            self.assertIsNot(mixins.TEST_REPOSITORY, old_repository)
+            self.assertIsNotNone(old_repository.get_test_set('first'))
+            self.assertIsNotNone(
+                mixins.TEST_REPOSITORY.get_test_set('second'))
@@ -0,0 +1,197 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+import os
+import signal
+import time
+
+import mock
+from sqlalchemy import orm
+
+from fuel_plugin.ostf_adapter.nose_plugin import worker_pool
+from fuel_plugin.testing.tests import base
+
+
+RESULTS = multiprocessing.Queue()
+RELEASE = multiprocessing.Event()
+
+
+def report_job(*args):
+    """Reports pid of worker which forked process of the job."""
+    if args[0] == 'wait':
+        RELEASE.wait(10)
+    elif args[0] == 'interrupt':
+        raise KeyboardInterrupt()
+
+    if args[0] == 'env':
+        RESULTS.put((os.getppid(), os.environ.get('WORKER_POOL_TEST')))
+        os.environ['WORKER_POOL_TEST'] = args[1]
+    elif args[0] == 'killed':
+        RESULTS.put((os.getppid(), worker_pool.kill_requested()))
+    else:
+        RESULTS.put((os.getppid(), args))
+
+    # process of job exits without flushing the queue
+    RESULTS.close()
+    RESULTS.join_thread()
+
+
+def wait_ready(pool, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pool.maintain()
+        if all(worker.ready for worker in pool.workers):
+            return
+        time.sleep(0.05)
+    raise AssertionError('Workers are not ready')
+
+
+class TestWorkerPool(base.BaseUnitTest):
+
+    def setUp(self):
+        RELEASE.clear()
+        self.pool = worker_pool.WorkerPool(report_job, 2, max_runs=2)
+        wait_ready(self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_job_is_executed_by_pool_worker(self):
+        pid = self.pool.submit(('a', 1))
+
+        self.assertIn(pid, [worker.pid for worker in self.pool.workers])
+        self.assertEqual(RESULTS.get(timeout=10), (pid, ('a', 1)))
+
+    def test_worker_is_reused(self):
+        pid = self.pool.submit(('a',))
+        RESULTS.get(timeout=10)
+        wait_ready(self.pool)
+
+        self.assertIn(pid, [worker.pid for worker in self.pool.workers])
+
+    def test_worker_is_recycled_after_max_runs(self):
+        workers = list(self.pool.workers)
+        for _ in range(4):
+            wait_ready(self.pool)
+            self.pool.submit(('a',))
+            RESULTS.get(timeout=10)
+
+        wait_ready(self.pool)
+        self.assertEqual(len(self.pool.workers), 2)
+        self.assertFalse(set(workers) & set(self.pool.workers))
+
+    def test_single_use_worker_when_pool_is_busy(self):
+        pids = [self.pool.submit(('wait', i)) for i in range(3)]
+
+        pool_pids = [worker.pid for worker in self.pool.workers]
+        self.assertEqual(len(set(pids)), 3)
+        self.assertNotIn(pids[2], pool_pids)
+
+        RELEASE.set()
+        results = dict(RESULTS.get(timeout=10) for _ in range(3))
+        self.assertEqual(results[pids[2]], ('wait', 2))
+
+    def test_job_is_sent_after_commit(self):
+        session = orm.Session()
+
+        pid = self.pool.submit(('a',), session=session)
+        time.sleep(0.2)
+        self.assertTrue(RESULTS.empty())
+
+        session.commit()
+        self.assertEqual(RESULTS.get(timeout=10), (pid, ('a',)))
+
+    def test_job_is_cancelled_on_rollback(self):
+        session = orm.Session()
+        on_cancel = mock.Mock()
+
+        self.pool.submit(('a',), session=session, on_cancel=on_cancel)
+        session.rollback()
+
+        on_cancel.assert_called_once_with()
+        self.assertTrue(RESULTS.empty())
+
+    def test_state_of_job_does_not_leak_to_next_job(self):
+        pid = self.pool.submit(('env', 'first'))
+        self.assertEqual(RESULTS.get(timeout=10), (pid, None))
+        wait_ready(self.pool)
+
+        worker = next(worker for worker in self.pool.workers
+                      if worker.pid == pid)
+        worker.ready = False
+        worker.send(('env', 'second'))
+        self.assertEqual(RESULTS.get(timeout=10), (pid, None))
+
+    def test_worker_survives_interrupted_job(self):
+        pid = self.pool.submit(('interrupt',))
+        wait_ready(self.pool)
+
+        self.assertIn(pid, [worker.pid for worker in self.pool.workers])
+
+    def test_kill_before_job_is_forked_is_not_lost(self):
+        worker = self.pool.reserve()
+        os.kill(worker.pid, signal.SIGUSR1)
+        time.sleep(0.2)
+        worker.send(('killed',))
+        self.assertEqual(RESULTS.get(timeout=10), (worker.pid, True))
+
+        wait_ready(self.pool)
+        worker.ready = False
+        worker.send(('killed',))
+        self.assertEqual(RESULTS.get(timeout=10), (worker.pid, False))
+
+
+class TestStartingWorkerPool(base.BaseUnitTest):
+
+    def setUp(self):
+        # workers preload modules for a while before they are ready
+        patcher = mock.patch.object(
+            worker_pool.importlib, 'import_module',
+            side_effect=lambda name: time.sleep(0.5))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = worker_pool.WorkerPool(
+            report_job, 2, max_runs=1, preload_modules=['slow'])
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_job_waits_for_starting_worker(self):
+        self.pool.maintain()
+        pid = self.pool.submit(('a',))
+
+        self.assertIn(pid, [worker.pid for worker in self.pool.workers])
+        self.assertEqual(RESULTS.get(timeout=10), (pid, ('a',)))
+
+    def test_job_waits_for_recycled_worker(self):
+        self.pool.maintain()
+        pids = [self.pool.submit(('a', i)) for i in range(2)]
+        for _ in pids:
+            RESULTS.get(timeout=10)
+
+        # both workers exit after their single run and are replaced
+        pid = self.pool.submit(('b',))
+
+        self.assertNotIn(pid, pids)
+        self.assertIn(pid, [worker.pid for worker in self.pool.workers])
+        self.assertEqual(RESULTS.get(timeout=10), (pid, ('b',)))
+
+    def test_single_use_worker_after_ready_timeout(self):
+        self.pool.ready_timeout = 0.1
+        self.pool.maintain()
+        pid = self.pool.submit(('a',))
+
+        self.assertNotIn(pid, [worker.pid for worker in self.pool.workers])
+        self.assertEqual(RESULTS.get(timeout=10), (pid, ('a',)))
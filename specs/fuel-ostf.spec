@@ -43,7 +43,7 @@ Requires:    python-argparse >= 1.2.1
 # fuel_ostf_reqs
 Requires:    python-keystonemiddleware >= 1.2.0
 Requires:    python-nose >= 1.3.0
-Requires:    python-sqlalchemy >= 0.7.8
+Requires:    python-sqlalchemy >= 1.0.0
 Requires:    python-alembic >= 0.5.0
 Requires:    python-gevent >= 0.13.8
 Requires:    python-pecan >= 0.3.0